@@ -35,7 +35,8 @@ import sys
 import numpy as np
 
 from glfwToolbox.advanced_shapes import AdvancedGPUShape
-from glfwToolbox.colors import color_hsv
+from glfwToolbox.colors import colormap_hsv
+from glfwToolbox.gl_state import get_gl_state
 from glfwToolbox.mathlib import Point3
 from glfwToolbox.opengl import clear_buffer
 import glfwToolbox.camera as cam
@@ -170,68 +171,23 @@ if __name__ == '__main__':
     gpuAxis = es.to_gpu_shape(shapes.create_axis(1))
     obj_axis = AdvancedGPUShape(gpuAxis, shader=colorShaderProgram)
 
-    # Create the grid of the system
-    vertex_grid = []
-    nx = 40
-    ny = 40
-    zlim = [0, 0]
-
-    for i in range(nx):  # x
-        for j in range(ny):  # y
-            xp = -1 + 2 / (nx - 1) * j
-            yp = -1 + 2 / (ny - 1) * i
-            zp = f(xp, yp, 4)  # Function number 4
-            zlim = [min(zp, zlim[0]), max(zp, zlim[1])]
-            vertex_grid.append([xp, yp, zp])
-
-    # Calculate the difference between max and min zvalue
-    dz = abs(zlim[1] - zlim[0])
-    zmean = (zlim[1] + zlim[0]) / 2
-    dzf = min(1.0, 1 / (dz + 0.001))  # Height factor
-
-    # Multiply all values for a factor, so the maximum height will be 1
-    # Also the plot is centered
-    for i in range(len(vertex_grid)):
-        vertex_grid[i][2] = (vertex_grid[i][2] - zmean) * dzf
-        zlim = [min(vertex_grid[i][2], zlim[0]), max(vertex_grid[i][2], zlim[1])]
-    dz = abs(zlim[1] - zlim[0])
-
     # Force the color
     color_plot = {
         'enabled': False,
         'color': [1, 1, 1]
     }
 
-    # Create the quads
-    quad_shapes = []
-    for i in range(nx - 1):  # x
-        for j in range(ny - 1):
-            # Select positions
-            a = i * ny + j
-            b = a + 1
-            c = (i + 1) * ny + j + 1
-            d = c - 1
-
-            # Select vertices
-            pa = vertex_grid[a]
-            pb = vertex_grid[b]
-            pc = vertex_grid[c]
-            pd = vertex_grid[d]
-
-            # Calculate color from interpolation
-            zval = (pa[2] + pb[2] + pc[2] + pd[2]) / 4  # Average height of quad
-            zf = (zval - zlim[0]) / (dz + 0.001)
-            if not color_plot['enabled']:
-                color = color_hsv(1 - zf)
-            else:
-                color = color_plot['color']
-
-            # Create the figure
-            quad_shapes.append(es.to_gpu_shape(shapes.create4_vertex_color_normal(pa, pb, pc, pd,
-                                                                                  color[0], color[1], color[2])))
+    # Create the surface, the function is evaluated over the whole grid at once.
+    # The surface is centered and scaled so the maximum height is 1
+    if not color_plot['enabled']:
+        surface = shapes.create_surface(lambda _x, _y: f(_x, _y, 4), 40, 40,  # Function number 4
+                                        colormap=lambda _z: colormap_hsv(1 - _z), normalize=True)
+    else:
+        surface = shapes.create_surface(lambda _x, _y: f(_x, _y, 4), 40, 40,
+                                        color=color_plot['color'], normalize=True)
 
     # Create main object
-    obj_main = AdvancedGPUShape(quad_shapes, shader=phongPipeline)
+    obj_main = AdvancedGPUShape(surface, shader=phongPipeline)
 
     # Create light
     obj_light = light.Light([0, 0, 6], [1, 1, 1], shader=phongPipeline)
@@ -242,15 +198,16 @@ if __name__ == '__main__':
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # Clearing the screen in both, color and depth
         clear_buffer()
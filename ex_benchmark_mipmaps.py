@@ -0,0 +1,132 @@
+# coding=utf-8
+"""
+EXAMPLE-BENCHMARK-MIPMAPS
+Measures the frame time of a large tiled floor seen at a grazing angle, with
+and without mipmaps.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+import glfw
+from OpenGL.GL import *
+import numpy as np
+import sys
+import time
+
+from glfwToolbox.advanced_shapes import AdvancedGPUShape
+from glfwToolbox.gl_state import get_gl_state
+from glfwToolbox.opengl import clear_buffer
+import glfwToolbox.easy_shaders as es
+import glfwToolbox.shapes as shapes
+import glfwToolbox.textures as textures
+import glfwToolbox.transformations as tr
+
+
+def measure(window, obj, view, projection, frames):
+    """
+    Return the mean frame time drawing the object.
+
+    :param window: Window
+    :param obj: Object to draw
+    :param view: View matrix
+    :param projection: Projection matrix
+    :param frames: Number of frames
+    :return: Frame time in seconds
+    :rtype: float
+    """
+    glFinish()
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        get_gl_state().begin_frame()
+        glfw.poll_events()
+        clear_buffer()
+        obj.draw(view, projection)
+        glfw.swap_buffers(window)
+        glFinish()
+    return (time.perf_counter() - t0) / frames
+
+
+if __name__ == '__main__':
+
+    # Number of frames measured by each configuration
+    frames = 300
+    if len(sys.argv) > 1:
+        frames = int(sys.argv[1])
+
+    # Initialize glfw
+    if not glfw.init():
+        sys.exit()
+
+    width = 1280
+    height = 720
+
+    window = glfw.create_window(width, height, 'Mipmaps benchmark', None, None)
+
+    if not window:
+        glfw.terminate()
+        sys.exit()
+
+    glfw.make_context_current(window)
+
+    # Frames are not limited by the screen refresh rate
+    glfw.swap_interval(0)
+
+    # Creating shader program
+    pipeline = es.SimpleTextureModelViewProjectionShaderProgram()
+
+    # Setting up the clear screen color
+    glClearColor(0.15, 0.15, 0.15, 1.0)
+    glEnable(GL_DEPTH_TEST)
+
+    # The floor repeats the texture 400 times on each axis
+    floor = shapes.create_texture_quad('example_data/bricks.jpg', 400, 400)
+    configs = [
+        ('GL_LINEAR', GL_LINEAR, 1),
+        ('GL_LINEAR_MIPMAP_LINEAR', GL_LINEAR_MIPMAP_LINEAR, 1),
+        ('GL_LINEAR_MIPMAP_LINEAR, anisotropy 16', GL_LINEAR_MIPMAP_LINEAR, 16)
+    ]
+
+    # Camera close to the floor, looking at the horizon
+    projection = tr.perspective(60, float(width) / float(height), 0.1, 500)
+    view = tr.look_at(
+        np.array([0, 0, 0.5]),
+        np.array([0, 100, 0]),
+        np.array([0, 0, 1])
+    )
+
+    print('Grazing view of a tiled floor, {0} frames each'.format(frames))
+    for name, filter_mode, anisotropy in configs:
+        textures.set_anisotropy(anisotropy)
+        obj_floor = AdvancedGPUShape(es.to_gpu_shape(floor, GL_REPEAT, filter_mode), shader=pipeline)
+        obj_floor.uniform_scale(400)
+
+        # The first frames are not measured
+        measure(window, obj_floor, view, projection, 10)
+        t = measure(window, obj_floor, view, projection, frames)
+        print('\t{0}: {1:.3f} ms/frame'.format(name, 1000 * t))
+        obj_floor.release()
+
+    glfw.terminate()
@@ -0,0 +1,96 @@
+# coding=utf-8
+"""
+EXAMPLE-BENCHMARK-TEXTURE
+Compares the texture decoding path against the per-pixel list decode.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+
+from glfwToolbox.textures import decode_image
+
+
+def decode_list(img_name):
+    """
+    Previous decoding path, creates one Python tuple per pixel.
+
+    :param img_name: Image file name
+    :return: Image data
+    """
+    image = Image.open(img_name)
+    img_data = np.array(list(image.getdata()), np.uint8)
+    return img_data[-1:0:-1, :]
+
+
+def benchmark(fun, img_name, repeat):
+    """
+    Return the best time of several decodes.
+
+    :param fun: Decoding function
+    :param img_name: Image file name
+    :param repeat: Number of runs
+    :return: Best time in seconds
+    :rtype: float
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fun(img_name)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == '__main__':
+
+    # Image size can be given as the first argument
+    size = 1024
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    repeat = 3
+
+    # Create a random image for each supported mode
+    rgba = np.random.randint(0, 256, (size, size, 4), dtype=np.uint8)
+    tmp = tempfile.mkdtemp()
+    images = []
+    for mode in ('RGB', 'RGBA'):
+        img_name = os.path.join(tmp, 'bench_{0}.png'.format(mode))
+        Image.fromarray(rgba).convert(mode).save(img_name)
+        images.append((mode, img_name))
+
+    print('Texture decode {0}x{0}, best of {1}'.format(size, repeat))
+    for mode, img_name in images:
+        t_list = benchmark(decode_list, img_name, repeat)
+        t_fast = benchmark(decode_image, img_name, repeat)
+        print('\t{0}: list {1:.3f}s, decode_image {2:.3f}s, speedup {3:.1f}x'.format(
+            mode, t_list, t_fast, t_list / t_fast))
+        os.remove(img_name)
+    os.rmdir(tmp)
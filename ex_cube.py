@@ -36,6 +36,7 @@ import glfwToolbox.transformations as tr
 import glfwToolbox.shapes as shapes
 import glfwToolbox.easy_shaders as es
 from glfwToolbox.advanced_shapes import AdvancedGPUShape
+from glfwToolbox.gl_state import get_gl_state
 
 # We will use 32 bits data, so an integer has 4 bytes
 # 1 byte = 8 bits
@@ -102,15 +103,16 @@ if __name__ == '__main__':
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
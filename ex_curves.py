@@ -35,6 +35,7 @@ import numpy as np
 import sys
 
 from glfwToolbox.advanced_shapes import AdvancedGPUShape
+from glfwToolbox.gl_state import get_gl_state
 from glfwToolbox.mathlib import Point3
 import glfwToolbox.camera as cam
 import glfwToolbox.catrom as catrom
@@ -127,7 +128,7 @@ def create_color_plane_from_curve(_curve, triangulate, r, g, b, center=None):
             x2, y2 = i[1]
             x3, y3 = i[2]
             shape = bs.create_triangle_color((x1, y1, 0), (x2, y2, 0), (x3, y3, 0), r, g, b)
-            shapes.append(es.to_gpu_shape(shape))
+            shapes.append(shape)
     else:
         if center is None:
             center = _curve[0]
@@ -136,7 +137,7 @@ def create_color_plane_from_curve(_curve, triangulate, r, g, b, center=None):
             x2, y2 = _curve[(i + 1) % len(_curve)]
             c1, c2 = center
             shape = bs.create_triangle_color((x1, y1, 0), (x2, y2, 0), (c1, c2, 0), r, g, b)
-            shapes.append(es.to_gpu_shape(shape))
+            shapes.append(shape)
     return AdvancedGPUShape(shapes)
 
 
@@ -215,15 +216,16 @@ if __name__ == '__main__':
 
     # Main loop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
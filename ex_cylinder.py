@@ -34,6 +34,7 @@ from OpenGL.GL import *
 import sys
 
 from glfwToolbox.advanced_shapes import AdvancedGPUShape
+from glfwToolbox.gl_state import get_gl_state
 from glfwToolbox.mathlib import Point3
 import glfwToolbox.camera as cam
 import glfwToolbox.easy_shaders as es
@@ -179,7 +180,7 @@ if __name__ == '__main__':
 
             # Create quad
             shape = shapes.create4_vertex_color_normal(a, b, c, d, color['r'], color['g'], color['b'])
-            cylinder_shape.append(es.to_gpu_shape(shape))
+            cylinder_shape.append(shape)
 
     # Add the two covers
     for j in range(lat):
@@ -190,16 +191,16 @@ if __name__ == '__main__':
         b = [r * np.cos(ang), r * np.sin(ang), 0]
         c = [r * np.cos(ang + dang), r * np.sin(ang + dang), 0]
         shape = shapes.create_triangle_color_normal(c, b, a, color['r'], color['g'], color['b'])
-        cylinder_shape.append(es.to_gpu_shape(shape))
+        cylinder_shape.append(shape)
 
         # Top
         a = [0, 0, h]
         b = [r * np.cos(ang), r * np.sin(ang), h]
         c = [r * np.cos(ang + dang), r * np.sin(ang + dang), h]
         shape = shapes.create_triangle_color_normal(c, b, a, color['r'], color['g'], color['b'])
-        cylinder_shape.append(es.to_gpu_shape(shape))
+        cylinder_shape.append(shape)
 
-    # Create cylinder object
+    # Create cylinder object, the quads and triangles are merged into a single GPUShape
     obj_cylinder = AdvancedGPUShape(cylinder_shape, shader=phongPipeline)
 
     # Create light
@@ -207,15 +208,16 @@ if __name__ == '__main__':
 
     # Main execution loop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
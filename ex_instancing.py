@@ -0,0 +1,157 @@
+# coding=utf-8
+"""
+EXAMPLE-INSTANCING
+Draws ten thousand cars, each piece of the car is a single instanced draw.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import glfw
+from OpenGL.GL import *
+import numpy as np
+import sys
+
+from glfwToolbox.frame_uniforms import get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state
+import glfwToolbox.transformations as tr
+import glfwToolbox.shapes as shapes
+import glfwToolbox.scene_graph as sg
+import glfwToolbox.easy_shaders as es
+
+
+# noinspection PyUnusedLocal,PyShadowingNames
+def on_key(window, key, scancode, action, mods):
+    if action != glfw.PRESS:
+        return
+
+    if key == glfw.KEY_ESCAPE:
+        sys.exit()
+
+
+def create_car():
+    """
+    Create car model, the chasis is white so it takes the instance color.
+
+    :return:
+    """
+    gpu_black_quad = es.to_gpu_shape(shapes.create_color_cube(0, 0, 0))
+    gpu_chasis_quad = es.to_gpu_shape(shapes.create_color_cube(1, 1, 1))
+
+    wheel = sg.SceneGraphNode('wheel')
+    wheel.transform = tr.scale(0.2, 0.8, 0.2)
+    wheel.childs += [gpu_black_quad]
+
+    front_wheel = sg.SceneGraphNode('front_wheel')
+    front_wheel.transform = tr.translate(0.3, 0, -0.3)
+    front_wheel.childs += [wheel]
+
+    back_wheel = sg.SceneGraphNode('back_wheel')
+    back_wheel.transform = tr.translate(-0.3, 0, -0.3)
+    back_wheel.childs += [wheel]
+
+    chasis = sg.SceneGraphNode('chasis')
+    chasis.transform = tr.scale(1, 0.7, 0.5)
+    chasis.childs += [gpu_chasis_quad]
+
+    car = sg.SceneGraphNode('car')
+    car.childs += [chasis]
+    car.childs += [front_wheel]
+    car.childs += [back_wheel]
+
+    return car
+
+
+if __name__ == '__main__':
+
+    # Initialize glfw
+    if not glfw.init():
+        sys.exit()
+
+    width = 800
+    height = 800
+
+    window = glfw.create_window(width, height, 'Ten thousand cars', None, None)
+
+    if not window:
+        glfw.terminate()
+        sys.exit()
+
+    glfw.make_context_current(window)
+    glfw.set_key_callback(window, on_key)
+
+    # Instanced shader program
+    pipeline = es.SimpleInstancedModelViewProjectionShaderProgram()
+    pipeline.use()
+
+    glClearColor(0.85, 0.85, 0.85, 1.0)
+    glEnable(GL_DEPTH_TEST)
+
+    # Cars are placed on a 100x100 grid, each one with its own color
+    n = 100
+    gx, gy = np.meshgrid(np.arange(n) * 2.0 - n, np.arange(n) * 1.5 - 0.75 * n)
+    gx = gx.ravel()
+    gy = gy.ravel()
+    phase = np.random.uniform(0, 2 * np.pi, n * n)
+    colors = np.random.uniform(0.2, 1.0, (n * n, 3))
+
+    models = np.zeros((n * n, 4, 4), dtype=np.float32)
+    models[:, 0, 0] = 1
+    models[:, 1, 1] = 1
+    models[:, 2, 2] = 1
+    models[:, 3, 3] = 1
+    models[:, 1, 3] = gy
+    models[:, 2, 3] = 0.5
+
+    carNode = create_car()
+    instances = es.to_gpu_instances(models, colors)
+
+    projection = tr.perspective(45, float(width) / float(height), 0.1, 500)
+    get_frame_uniforms().set_projection(projection)
+
+    view = tr.look_at(
+        np.array([0, -120, 60]),
+        np.array([0, 0, 0]),
+        np.array([0, 0, 1])
+    )
+    get_frame_uniforms().set_view(view)
+
+    # Mainloop
+    while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
+
+        glfw.poll_events()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        # All cars move back and forth, the instance matrices are updated at once
+        models[:, 0, 3] = gx + 0.5 * np.sin(glfw.get_time() + phase)
+        instances.update(models)
+
+        # Three draw calls, the chasis and both wheels
+        sg.draw_scene_graph_node_instanced(carNode, pipeline, instances)
+
+        glfw.swap_buffers(window)
+
+    instances.release()
+    glfw.terminate()
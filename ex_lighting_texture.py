@@ -33,9 +33,11 @@ from OpenGL.GL import *
 import numpy as np
 import sys
 
+from glfwToolbox.frame_uniforms import get_frame_uniforms
 import glfwToolbox.transformations as tr
 import glfwToolbox.shapes as shapes
 import glfwToolbox.easy_shaders as es
+from glfwToolbox.gl_state import get_gl_state
 from glfwToolbox.lights import Light
 
 LIGHT_FLAT = 0
@@ -124,6 +126,7 @@ if __name__ == '__main__':
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
@@ -156,18 +159,20 @@ if __name__ == '__main__':
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
+        # Camera data is shared by all the programs
+        get_frame_uniforms().set_projection(projection)
+        get_frame_uniforms().set_view(view)
+
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # The axis is drawn without lighting effects
         if controller.showAxis:
-            glUseProgram(colorPipeline.shaderProgram)
-            glUniformMatrix4fv(glGetUniformLocation(colorPipeline.shaderProgram, 'projection'), 1, GL_TRUE, projection)
-            glUniformMatrix4fv(glGetUniformLocation(colorPipeline.shaderProgram, 'view'), 1, GL_TRUE, view)
-            glUniformMatrix4fv(glGetUniformLocation(colorPipeline.shaderProgram, 'model'), 1, GL_TRUE, tr.identity())
+            colorPipeline.use()
+            colorPipeline.set_uniform_matrix4('model', tr.identity())
             colorPipeline.draw_shape(gpuAxis, GL_LINES)
 
         # Selecting the lighting shader program
@@ -181,11 +186,9 @@ if __name__ == '__main__':
             raise Exception()
 
         obj_light.set_shader(lightingPipeline)
-        glUseProgram(lightingPipeline.shaderProgram)
+        lightingPipeline.use()
 
-        glUniformMatrix4fv(glGetUniformLocation(lightingPipeline.shaderProgram, 'projection'), 1, GL_TRUE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(lightingPipeline.shaderProgram, 'view'), 1, GL_TRUE, view)
-        glUniformMatrix4fv(glGetUniformLocation(lightingPipeline.shaderProgram, 'model'), 1, GL_TRUE, model)
+        lightingPipeline.set_uniform_matrix4('model', model)
 
         # Setting all uniform shader variables
         obj_light.place()
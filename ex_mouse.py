@@ -37,6 +37,8 @@ import glfwToolbox.transformations as tr
 import glfwToolbox.shapes as shapes
 import glfwToolbox.easy_shaders as es
 from glfwToolbox.advanced_shapes import AdvancedGPUShape
+from glfwToolbox.bvh import SceneBVH
+from glfwToolbox.gl_state import get_gl_state
 
 # We will use 32 bits data, so an integer has 4 bytes
 # 1 byte = 8 bits
@@ -47,6 +49,7 @@ INT_BYTES = 4
 class Controller:
     def __init__(self):
         self.leftClickOn = False
+        self.pick = False
         self.theta = 0.0
         self.mousePos = (0.0, 0.0)
 
@@ -81,6 +84,7 @@ def mouse_button_callback(window, button, action, mods):
     if action == glfw.PRESS or action == glfw.REPEAT:
         if button == glfw.MOUSE_BUTTON_1:
             controller.leftClickOn = True
+            controller.pick = True
             print('Mouse click - button 1')
         if button == glfw.MOUSE_BUTTON_2:
             print('Mouse click - button 2:', glfw.get_cursor_pos(window))
@@ -138,22 +142,29 @@ if __name__ == '__main__':
 
     # Create objects
     obj_quad_blue = AdvancedGPUShape(es.to_gpu_shape(blueQuad), shader=basicShader)
-    obj_quad_red = AdvancedGPUShape(es.to_gpu_shape(redQuad), shader=basicShader)
+    gpuRedQuad = es.to_gpu_shape(redQuad, keep_triangles=True)
+    obj_quad_red = AdvancedGPUShape(gpuRedQuad, shader=basicShader)
     obj_quad_yellow = AdvancedGPUShape(es.to_gpu_shape(yellowQuad), shader=basicShader)
     obj_quad_green = AdvancedGPUShape(es.to_gpu_shape(greenQuad), shader=basicShader)
 
     # Apply permanent transforms
     obj_quad_red.translate(tx=0.5)
     obj_quad_red.uniform_scale(0.5)
+    redModel = np.matmul(tr.uniform_scale(0.5), tr.translate(0.5, 0, 0))
+
+    # The red quad can be picked with the mouse
+    scene = SceneBVH()
+    scene.add_instance(redModel, gpuRedQuad, 'red quad')
 
     # Polyfon fill mode
-    glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+    get_gl_state().polygon_mode(GL_FILL)
 
     # Get time
     t0 = glfw.get_time()
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Getting the time difference from the previous iteration
         t1 = glfw.get_time()
@@ -180,6 +191,14 @@ if __name__ == '__main__':
         mousePosX = 2 * (controller.mousePos[0] - width / 2) / width
         mousePosY = 2 * (height / 2 - controller.mousePos[1]) / height
 
+        # The quads are drawn without camera, so the view and projection are identities
+        if controller.pick:
+            controller.pick = False
+            scene.set_transform(0, np.matmul(tr.rotation_z(controller.theta), redModel))
+            hit = scene.pick(tr.identity(), tr.identity(), mousePosX, mousePosY)
+            if hit is not None:
+                print('Picked', hit.node, 'triangle', hit.triangle)
+
         # Draw green quad
         obj_quad_green.apply_temporal_transform(np.matmul(
             tr.uniform_scale(0.5),
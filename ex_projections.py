@@ -33,6 +33,8 @@ from OpenGL.GL import *
 import numpy as np
 import sys
 
+from glfwToolbox.frame_uniforms import get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state
 import glfwToolbox.transformations as tr2
 import glfwToolbox.shapes as bs
 import glfwToolbox.easy_shaders as es
@@ -99,7 +101,7 @@ if __name__ == '__main__':
     pipeline = es.SimpleModelViewProjectionShaderProgram()
 
     # Telling OpenGL to use our shader program
-    glUseProgram(pipeline.shaderProgram)
+    pipeline.use()
 
     # Setting up the clear screen color
     glClearColor(0.15, 0.15, 0.15, 1.0)
@@ -123,6 +125,7 @@ if __name__ == '__main__':
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
@@ -147,7 +150,7 @@ if __name__ == '__main__':
             np.array([0, 0, 0]),
             np.array([0, 0, 1])
         )
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'view'), 1, GL_TRUE, view)
+        get_frame_uniforms().set_view(view)
 
         # Setting up the projection transform
         if controller.projection == PROJECTION_ORTHOGRAPHIC:
@@ -158,37 +161,37 @@ if __name__ == '__main__':
             projection = tr2.perspective(60, float(width) / float(height), 0.1, 100)
         else:
             raise Exception()
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'projection'), 1, GL_TRUE, projection)
+        get_frame_uniforms().set_projection(projection)
 
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # Drawing shapes with different model transformations
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.translate(5, 0, 0))
+        pipeline.set_uniform_matrix4('model', tr2.translate(5, 0, 0))
         pipeline.draw_shape(gpuRedCube)
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.translate(-5, 0, 0))
+        pipeline.set_uniform_matrix4('model', tr2.translate(-5, 0, 0))
         pipeline.draw_shape(gpuGreenCube)
 
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.translate(0, 5, 0))
+        pipeline.set_uniform_matrix4('model', tr2.translate(0, 5, 0))
         pipeline.draw_shape(gpuBlueCube)
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.translate(0, -5, 0))
+        pipeline.set_uniform_matrix4('model', tr2.translate(0, -5, 0))
         pipeline.draw_shape(gpuYellowCube)
 
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.translate(0, 0, 5))
+        pipeline.set_uniform_matrix4('model', tr2.translate(0, 0, 5))
         pipeline.draw_shape(gpuCyanCube)
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.translate(0, 0, -5))
+        pipeline.set_uniform_matrix4('model', tr2.translate(0, 0, -5))
         pipeline.draw_shape(gpuPurpleCube)
 
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.identity())
+        pipeline.set_uniform_matrix4('model', tr2.identity())
         pipeline.draw_shape(gpuRainbowCube)
 
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, tr2.identity())
+        pipeline.set_uniform_matrix4('model', tr2.identity())
         pipeline.draw_shape(gpuAxis, GL_LINES)
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
@@ -33,6 +33,8 @@ from OpenGL.GL import *
 import numpy as np
 import sys
 
+from glfwToolbox.frame_uniforms import get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state
 import glfwToolbox.transformations as tr
 import glfwToolbox.shapes as shapes
 import glfwToolbox.scene_graph as sg
@@ -146,7 +148,7 @@ if __name__ == '__main__':
     pipeline = es.SimpleModelViewProjectionShaderProgram()
 
     # Telling OpenGL to use our shader program
-    glUseProgram(pipeline.shaderProgram)
+    pipeline.use()
 
     # Setting up the clear screen color
     glClearColor(0.85, 0.85, 0.85, 1.0)
@@ -154,21 +156,25 @@ if __name__ == '__main__':
     # Creating shapes on GPU memory
     cars = create_cars(5)
 
+    # The graph is flattened once, it is compiled again only if its nodes change
+    compiledCars = sg.compile_scene_graph(cars)
+
     # Our shapes here are always fully painted
-    glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+    get_gl_state().polygon_mode(GL_FILL)
 
     projection = tr.ortho(-1, 1, -1, 1, 0.1, 10)
-    glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'projection'), 1, GL_TRUE, projection)
+    get_frame_uniforms().set_projection(projection)
 
     view = tr.look_at(
         np.array([0, 0, 2]),
         np.array([0, 0, 0]),
         np.array([0, 1, 0])
     )
-    glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'view'), 1, GL_TRUE, view)
+    get_frame_uniforms().set_view(view)
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -188,7 +194,7 @@ if __name__ == '__main__':
         # print('car3_position =', sg.find_position(cars, 'scaled_car3'))
 
         # Drawing the Car
-        sg.draw_scene_graph_node(cars, pipeline)
+        compiledCars.draw(pipeline)
 
         # Once the render is done, buffers are swapped, showing only the complete scene.
         glfw.swap_buffers(window)
@@ -33,6 +33,9 @@ from OpenGL.GL import *
 import numpy as np
 import sys
 
+from glfwToolbox.bounds import Frustum
+from glfwToolbox.frame_uniforms import get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state
 import glfwToolbox.transformations as tr
 import glfwToolbox.shapes as shapes
 import glfwToolbox.scene_graph as sg
@@ -137,7 +140,7 @@ if __name__ == '__main__':
     mvcPipeline = es.SimpleModelViewProjectionShaderProgram()
 
     # Telling OpenGL to use our shader program
-    glUseProgram(mvcPipeline.shaderProgram)
+    mvcPipeline.use()
 
     # Setting up the clear screen color
     glClearColor(0.85, 0.85, 0.85, 1.0)
@@ -155,17 +158,18 @@ if __name__ == '__main__':
 
     # Using the same view and projection matrices in the whole application
     projection = tr.perspective(45, float(width) / float(height), 0.1, 100)
-    glUniformMatrix4fv(glGetUniformLocation(mvcPipeline.shaderProgram, "projection"), 1, GL_TRUE, projection)
+    get_frame_uniforms().set_projection(projection)
 
     view = tr.look_at(
         np.array([5, 5, 7]),
         np.array([0, 0, 0]),
         np.array([0, 0, 1])
     )
-    glUniformMatrix4fv(glGetUniformLocation(mvcPipeline.shaderProgram, 'view'), 1, GL_TRUE, view)
+    get_frame_uniforms().set_view(view)
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
@@ -175,12 +179,12 @@ if __name__ == '__main__':
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         if controller.showAxis:
-            glUniformMatrix4fv(glGetUniformLocation(mvcPipeline.shaderProgram, "model"), 1, GL_TRUE, tr.identity())
+            mvcPipeline.set_uniform_matrix4('model', tr.identity())
             mvcPipeline.draw_shape(gpuAxis, GL_LINES)
 
         # Moving the red car and rotating its wheels
@@ -191,9 +195,13 @@ if __name__ == '__main__':
         # Uncomment to print the red car position on every iteration
         # print(sg.find_position(redCarNode, 'car'))
 
-        # Drawing the Car
-        sg.draw_scene_graph_node(redCarNode, mvcPipeline)
-        sg.draw_scene_graph_node(blueCarNode, mvcPipeline)
+        # Drawing the Car, the shapes outside of the view are not drawn
+        frustum = Frustum(projection, view)
+        sg.draw_scene_graph_node(redCarNode, mvcPipeline, frustum=frustum)
+        sg.draw_scene_graph_node(blueCarNode, mvcPipeline, frustum=frustum)
+
+        # Uncomment to print the number of shapes culled on every iteration
+        # print(frustum.get_stats()['culled'])
 
         # Once the render is done, buffers are swapped, showing only the complete scene.
         glfw.swap_buffers(window)
@@ -37,6 +37,7 @@ import glfwToolbox.transformations as tr
 import glfwToolbox.shapes as shapes
 import glfwToolbox.easy_shaders as es
 from glfwToolbox.advanced_shapes import AdvancedGPUShape
+from glfwToolbox.gl_state import get_gl_state
 
 
 # A class to store the application control
@@ -88,7 +89,7 @@ if __name__ == '__main__':
     pipeline = es.SimpleTextureTransformShaderProgram()
 
     # Telling OpenGL to use our shader program
-    glUseProgram(pipeline.shaderProgram)
+    pipeline.use()
 
     # Setting up the clear screen color
     glClearColor(0.25, 0.25, 0.25, 1.0)
@@ -112,12 +113,13 @@ if __name__ == '__main__':
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
 
         # OpenGL polygon mode
-        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+        get_gl_state().polygon_mode(GL_FILL)
 
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT)
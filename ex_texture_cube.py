@@ -37,6 +37,7 @@ from glfwToolbox.advanced_shapes import AdvancedGPUShape
 import glfwToolbox.shapes as shapes
 import glfwToolbox.easy_shaders as es
 import glfwToolbox.transformations as tr
+from glfwToolbox.gl_state import get_gl_state
 from glfwToolbox.opengl import clear_buffer
 
 
@@ -114,15 +115,16 @@ if __name__ == '__main__':
 
     # Mainloop
     while not glfw.window_should_close(window):
+        get_gl_state().begin_frame()
 
         # Using GLFW to check for input events
         glfw.poll_events()
 
         # Filling or not the shapes depending on the controller state
         if controller.fillPolygon:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            get_gl_state().polygon_mode(GL_FILL)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            get_gl_state().polygon_mode(GL_LINE)
 
         # Clearing the screen in both, color and depth
         clear_buffer()
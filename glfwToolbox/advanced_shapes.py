@@ -30,37 +30,60 @@ SOFTWARE.
 
 # Library imports
 from glfwToolbox.easy_shaders import GPUShape as _GPUShape
+from glfwToolbox.easy_shaders import to_gpu_shape as _to_gpu_shape
+from glfwToolbox.frame_uniforms import get_frame_uniforms as _get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+from glfwToolbox.shapes import MeshBuilder as _MeshBuilder
+from glfwToolbox.shapes import Shape as _Shape
 from OpenGL.GL import GL_POLYGON as _GL_POLYGON
-from OpenGL.GL import glUniformMatrix4fv as _glUniformMatrix4fv
-from OpenGL.GL import glGetUniformLocation as _glGetUniformLocation
-from OpenGL.GL import GL_TRUE as _GL_TRUE
 from OpenGL.GL import GL_TRIANGLES as _GL_TRIANGLES
-from OpenGL.GL import glUseProgram as _glUseProgram
+import glfwToolbox.quaternion as _quat
 import glfwToolbox.transformations as _tr
+import numpy as _np
 
 
 class AdvancedGPUShape(object):
-    def __init__(self, shapes, model=_tr.identity(), enabled=True, shader=None, mode=None):
+    def __init__(self, shapes, model=_tr.identity(), enabled=True, shader=None, mode=None, wrap_mode=None,
+                 filter_mode=None):
         """
-        Constructor.
+        Constructor. Shape objects are merged by texture and vertex format, and
+        each group is uploaded as a single GPUShape.
 
-        :param shapes: List or GPUShape object
+        :param shapes: List, GPUShape or Shape object
         :param model: Basic model transformation matrix
         :param enabled: Indicates if the shape is enabled or not
         :param shader: Shader program
+        :param wrap_mode: Texture wrap mode of the merged Shape objects
+        :param filter_mode: Texture filter mode of the merged Shape objects
         """
         if not isinstance(shapes, list):
             shapes = [shapes]
+        gpu_shapes = []
+        meshes = {}
         for i in range(len(shapes)):
-            if not isinstance(shapes[i], _GPUShape):
-                raise Exception('Object {0} of shapes list is not GPUShape instance'.format(i))
+            if isinstance(shapes[i], _Shape):
+                key = (shapes[i].textureFileName, shapes[i].vertexFormat)
+                if key not in meshes:
+                    meshes[key] = _MeshBuilder()
+                meshes[key].add(shapes[i])
+            elif isinstance(shapes[i], _GPUShape):
+                gpu_shapes.append(shapes[i])
+            else:
+                raise Exception('Object {0} of shapes list is not GPUShape or Shape instance'.format(i))
+        for mesh in meshes.values():
+            gpu_shapes.append(_to_gpu_shape(mesh.build(), wrap_mode, filter_mode, shader))
         if mode is None:
             mode = _GL_TRIANGLES
 
-        self._shapes = shapes
-        self._model = model
-        self._modelPrev = None
+        self._shapes = gpu_shapes
         self._enabled = enabled
+
+        # The model is owned and transformed in place, the buffers are reused between frames
+        self._model = _np.array(model, dtype=_np.float32)
+        self._modelSaved = _np.empty((4, 4), dtype=_np.float32)
+        self._modelTemporal = False
+        self._transformStep = _np.empty((4, 4), dtype=_np.float32)
+        self._transformScratch = _np.empty((4, 4), dtype=_np.float32)
         self._shader = shader
         self._drawMode = mode
 
@@ -82,7 +105,7 @@ class AdvancedGPUShape(object):
         :param tz:
         :return:
         """
-        self._model = _tr.matmul([_tr.translate(tx, ty, tz), self._model])
+        self._transform(_tr.translate(tx, ty, tz, out=self._transformStep))
 
     def scale(self, sx=1, sy=1, sz=1):
         """
@@ -93,7 +116,7 @@ class AdvancedGPUShape(object):
         :param sz:
         :return:
         """
-        self._model = _tr.matmul([_tr.scale(sx, sy, sz), self._model])
+        self._transform(_tr.scale(sx, sy, sz, out=self._transformStep))
 
     def uniform_scale(self, s=1):
         """
@@ -102,7 +125,7 @@ class AdvancedGPUShape(object):
         :param s:
         :return:
         """
-        self._model = _tr.matmul([_tr.uniform_scale(s), self._model])
+        self._transform(_tr.uniform_scale(s, out=self._transformStep))
 
     def rotation_x(self, theta=0):
         """
@@ -111,7 +134,7 @@ class AdvancedGPUShape(object):
         :param theta:
         :return:
         """
-        self._model = _tr.matmul([_tr.rotation_x(theta), self._model])
+        self._transform(_tr.rotation_x(theta, out=self._transformStep))
 
     def rotation_y(self, theta=0):
         """
@@ -120,7 +143,7 @@ class AdvancedGPUShape(object):
         :param theta:
         :return:
         """
-        self._model = _tr.matmul([_tr.rotation_y(theta), self._model])
+        self._transform(_tr.rotation_y(theta, out=self._transformStep))
 
     def rotation_z(self, theta=0):
         """
@@ -129,7 +152,7 @@ class AdvancedGPUShape(object):
         :param theta:
         :return:
         """
-        self._model = _tr.matmul([_tr.rotation_z(theta), self._model])
+        self._transform(_tr.rotation_z(theta, out=self._transformStep))
 
     def rotation_a(self, theta, axis):
         """
@@ -139,7 +162,16 @@ class AdvancedGPUShape(object):
         :param axis:
         :return:
         """
-        self._model = _tr.matmul([_tr.rotation_a(theta, axis), self._model])
+        self._transform(_tr.rotation_a(theta, axis, out=self._transformStep))
+
+    def rotation_q(self, q):
+        """
+        Rotate model by a quaternion.
+
+        :param q: Unit quaternion
+        :return:
+        """
+        self._transform(_quat.to_matrix(q, out=self._transformStep))
 
     def shearing(self, xy=0, yx=0, xz=0, zx=0, yz=0, zy=0):
         """
@@ -153,7 +185,43 @@ class AdvancedGPUShape(object):
         :param zy:
         :return:
         """
-        self._model = _tr.matmul([_tr.shearing(xy, yx, xz, zx, yz, zy), self._model])
+        self._transform(_tr.shearing(xy, yx, xz, zx, yz, zy, out=self._transformStep))
+
+    def set_trs(self, translation=(0, 0, 0), rotation=None, scale=1):
+        """
+        Set the model from a translation, rotation and scale, written in place
+        without intermediate products.
+
+        :param translation: Translation vector
+        :param rotation: Rotation matrix or quaternion of shape (4,), None for no rotation
+        :param scale: Scalar or vector
+        :return:
+        """
+        if rotation is not None and _np.shape(rotation) == (4,):
+            _quat.compose_trs(translation, rotation, scale, out=self._model)
+        else:
+            _tr.compose_trs(translation, rotation, scale, out=self._model)
+
+    def _transform(self, t):
+        """
+        Apply a transformation to the model, the product is written into the
+        scratch buffer, which becomes the model.
+
+        :param t: Transformation matrix
+        :return:
+        """
+        _tr.matmul([t, self._model], out=self._transformScratch)
+        self._model, self._transformScratch = self._transformScratch, self._model
+
+    def _restore_model(self):
+        """
+        Restore the model saved before the temporal transforms.
+
+        :return:
+        """
+        if self._modelTemporal:
+            self._model[...] = self._modelSaved
+            self._modelTemporal = False
 
     def apply_temporal_transform(self, t):
         """
@@ -162,10 +230,12 @@ class AdvancedGPUShape(object):
         :param t:
         :return:
         """
-        self._modelPrev = self._model
-        self._model = _tr.matmul([t, self._model])
+        if not self._modelTemporal:
+            self._modelSaved[...] = self._model
+            self._modelTemporal = True
+        self._transform(t)
 
-    def draw(self, view=None, projection=None, mode=None, shader=None, usemodel=True):
+    def draw(self, view=None, projection=None, mode=None, shader=None, usemodel=True, instances=None, frustum=None):
         """
         Draw model.
 
@@ -174,6 +244,8 @@ class AdvancedGPUShape(object):
         :param mode:
         :param shader:
         :param usemodel:
+        :param instances: GPUInstances, if given each shape is drawn once for all instances with an instanced shader
+        :param frustum: bounds.Frustum, if given the shapes outside of it are not drawn
         :return:
         """
         if not self._enabled:
@@ -187,19 +259,64 @@ class AdvancedGPUShape(object):
             if self._shader is None:
                 raise Exception('MergedShape shader is not set')
             shader = self._shader
-        _glUseProgram(shader.shaderProgram)
+        shader.use()
         if usemodel and shader.keyModel != '':
-            _glUniformMatrix4fv(_glGetUniformLocation(shader.shaderProgram, shader.keyModel), 1, _GL_TRUE, self._model)
+            _get_gl_state().uniform_matrix4(shader.get_uniform_location(shader.keyModel), self._model)
+        # View and projection are shared by all programs, they are uploaded only if changed
         if projection is not None and shader.keyProjection != '':
-            _glUniformMatrix4fv(_glGetUniformLocation(shader.shaderProgram, shader.keyProjection), 1, _GL_TRUE,
-                                projection)
+            _get_frame_uniforms().set_projection(projection)
         if view is not None and shader.keyView != '':
-            _glUniformMatrix4fv(_glGetUniformLocation(shader.shaderProgram, shader.keyView), 1, _GL_TRUE, view)
+            _get_frame_uniforms().set_view(view)
+        if instances is not None:
+            for i in self._shapes:
+                shader.draw_shape_instanced(i, instances, mode)
+        else:
+            for i in self._shapes:
+                if frustum is None or self._is_visible(i, frustum):
+                    shader.draw_shape(i, mode)
+        self._restore_model()
+
+    def submit(self, queue, mode=None, shader=None, transparent=False, instances=None, frustum=None):
+        """
+        Submit the model to a render queue instead of drawing it.
+
+        :param queue: RenderQueue
+        :param mode:
+        :param shader:
+        :param transparent: Transparent shapes are drawn back to front after the opaque ones
+        :param instances: GPUInstances
+        :param frustum: bounds.Frustum, if given the shapes outside of it are not submitted
+        :return:
+        """
+        if not self._enabled:
+            return
+        if mode is None:
+            if self._drawMode is None:
+                mode = _GL_POLYGON
+            else:
+                mode = self._drawMode
+        if shader is None:
+            if self._shader is None:
+                raise Exception('MergedShape shader is not set')
+            shader = self._shader
+        # The queue keeps the matrix until flushed, while the model is modified in place
+        model = self._model.copy()
         for i in self._shapes:
-            shader.draw_shape(i, mode)
-        if self._modelPrev is not None:
-            self._model = self._modelPrev
-            self._modelPrev = None
+            if frustum is None or instances is not None or self._is_visible(i, frustum):
+                queue.submit(shader, i, model, mode, transparent, instances)
+        self._restore_model()
+
+    def _is_visible(self, shape, frustum):
+        """
+        Check if a shape of the model is within the frustum, the bounds are
+        tested in model space without allocating arrays.
+
+        :param shape: GPUShape
+        :param frustum: Frustum
+        :return:
+        :rtype: bool
+        """
+        return frustum.is_visible_local(shape.bounds, self._model)
 
     def disable(self):
         """
@@ -217,6 +334,17 @@ class AdvancedGPUShape(object):
         """
         self._enabled = True
 
+    def release(self):
+        """
+        Release the GPU resources of the shapes. Clones share the shapes, so
+        they must not be drawn afterwards.
+
+        :return:
+        """
+        for i in self._shapes:
+            i.release()
+        self._shapes = []
+
     def clone(self):
         """
         Clone the model.
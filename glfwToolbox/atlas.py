@@ -0,0 +1,221 @@
+# coding=utf-8
+"""
+ATLAS
+Texture atlas, packs many small images into a few large textures.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+import json as _json
+import os as _os
+
+from PIL import Image as _Image
+import numpy as _np
+
+from glfwToolbox.shapes import Shape as _Shape
+from glfwToolbox.shapes import VERTEX_TEXTURE as _VERTEX_TEXTURE
+
+# Constants
+_ATLAS_MAPPING_VERSION = 1
+
+
+class TextureAtlas(object):
+    """
+    Texture atlas. Images are packed on shelves, sorted by height, into square
+    pages that are saved as image files together with a mapping file. The
+    mapping is loaded instead of packing again while the images, the page size
+    and the padding do not change.
+
+    Textured shapes are remapped to the page holding their image, so shapes
+    from many images can be merged and drawn with one texture bind.
+    """
+
+    def __init__(self, img_names, directory, size=2048, padding=2, name='atlas'):
+        """
+        Constructor.
+
+        :param img_names: List of image file names
+        :param directory: Directory where the pages and the mapping are stored
+        :param size: Width and height of each page in pixels
+        :param padding: Pixels around each image filled with its border, avoids bleeding between images
+        :param name: Name of the page and mapping files
+        """
+        self._directory = directory
+        self._name = name
+        self._padding = padding
+        self._size = size
+        self._pages = []  # Page file names
+        self._rects = {}  # path: (page, x, y, width, height), y from the top of the page
+        self._sources = {}  # path: mtime
+        for img_name in img_names:
+            path = _os.path.abspath(img_name)
+            self._sources[path] = _os.path.getmtime(path)
+        if not self._load():
+            self._build()
+
+    def _get_mapping_file(self):
+        """
+        Return the mapping file name.
+
+        :return: File name
+        :rtype: str
+        """
+        return _os.path.join(self._directory, '{0}.json'.format(self._name))
+
+    def _load(self):
+        """
+        Load the mapping file if it matches the images and options.
+
+        :return: True if loaded
+        :rtype: bool
+        """
+        mapping_file = self._get_mapping_file()
+        if not _os.path.isfile(mapping_file):
+            return False
+        with open(mapping_file, 'r') as f:
+            mapping = _json.load(f)
+        if mapping.get('version') != _ATLAS_MAPPING_VERSION or mapping['size'] != self._size or \
+                mapping['padding'] != self._padding or mapping['sources'] != self._sources:
+            return False
+        pages = [_os.path.join(self._directory, page) for page in mapping['pages']]
+        for page in pages:
+            if not _os.path.isfile(page):
+                return False
+        self._pages = pages
+        self._rects = {}
+        for path in mapping['rects'].keys():
+            self._rects[path] = tuple(mapping['rects'][path])
+        return True
+
+    def _build(self):
+        """
+        Pack the images and save the pages and the mapping file.
+
+        :return:
+        """
+        images = {}
+        for path in self._sources.keys():
+            image = _Image.open(path)
+            if image.mode != 'RGBA':
+                image = image.convert('RGBA')
+            w, h = image.size
+            if w + 2 * self._padding > self._size or h + 2 * self._padding > self._size:
+                raise Exception('Image {0} does not fit in an atlas page of size {1}'.format(path, self._size))
+            images[path] = image
+
+        # Shelf packing, the tallest images are placed first
+        order = sorted(images.keys(), key=lambda k: (images[k].size[1], images[k].size[0]), reverse=True)
+        rects = {}
+        page, x, y, shelf_height = 0, 0, 0, 0
+        for path in order:
+            w, h = images[path].size
+            pw, ph = w + 2 * self._padding, h + 2 * self._padding
+            if x + pw > self._size:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            if y + ph > self._size:
+                page, x, y, shelf_height = page + 1, 0, 0, 0
+            rects[path] = (page, x + self._padding, y + self._padding, w, h)
+            x += pw
+            shelf_height = max(shelf_height, ph)
+
+        # Images are copied into the pages, padding repeats the image border
+        pages = [_np.zeros((self._size, self._size, 4), dtype=_np.uint8) for _ in range(page + 1)]
+        p = self._padding
+        for path in order:
+            page, x, y, w, h = rects[path]
+            data = _np.asarray(images[path], dtype=_np.uint8)
+            if p > 0:
+                data = _np.pad(data, ((p, p), (p, p), (0, 0)), mode='edge')
+            pages[page][y - p:y + h + p, x - p:x + w + p] = data
+
+        if not _os.path.isdir(self._directory):
+            _os.makedirs(self._directory)
+        page_names = []
+        for i in range(len(pages)):
+            page_name = '{0}_{1}.png'.format(self._name, i)
+            _Image.fromarray(pages[i]).save(_os.path.join(self._directory, page_name))
+            page_names.append(page_name)
+        with open(self._get_mapping_file(), 'w') as f:
+            _json.dump({
+                'version': _ATLAS_MAPPING_VERSION,
+                'size': self._size,
+                'padding': self._padding,
+                'pages': page_names,
+                'sources': self._sources,
+                'rects': rects
+            }, f)
+        self._pages = [_os.path.join(self._directory, page) for page in page_names]
+        self._rects = rects
+
+    def get_pages(self):
+        """
+        Return the page file names.
+
+        :return: List of file names
+        :rtype: list
+        """
+        return list(self._pages)
+
+    def get_rect(self, img_name):
+        """
+        Return the page and the rectangle of an image in texture coordinates.
+
+        :param img_name: Image file name
+        :return: Page file name, (u0, v0, u1, v1)
+        :rtype: tuple
+        """
+        path = _os.path.abspath(img_name)
+        if path not in self._rects:
+            raise Exception('Image {0} is not in the atlas'.format(img_name))
+        page, x, y, w, h = self._rects[path]
+
+        # Textures are uploaded with the first row at the bottom
+        s = float(self._size)
+        return self._pages[page], (x / s, (s - y - h) / s, (x + w) / s, (s - y) / s)
+
+    def remap_shape(self, shape):
+        """
+        Return a copy of a textured shape using the atlas page. The texture
+        coordinates must be within [0, 1], as the image cannot repeat inside the
+        atlas.
+
+        :param shape: Shape
+        :return: Remapped shape
+        :rtype: Shape
+        """
+        assert isinstance(shape, _Shape)
+        if shape.textureFileName is None or shape.vertexFormat is None or \
+                not shape.vertexFormat.has(_VERTEX_TEXTURE):
+            raise Exception('Shape does not have a texture')
+        page, (u0, v0, u1, v1) = self.get_rect(shape.textureFileName)
+        vertices = shape.vertices.copy().reshape(-1, shape.vertexFormat.components)
+        offset = shape.vertexFormat.get_offset(_VERTEX_TEXTURE)
+        uv = vertices[:, offset:offset + 2]
+        if uv.size > 0 and (uv.min() < 0 or uv.max() > 1):
+            raise Exception('Texture coordinates of the shape repeat the image, it cannot be remapped')
+        uv[:, 0] = u0 + uv[:, 0] * (u1 - u0)
+        uv[:, 1] = v0 + uv[:, 1] * (v1 - v0)
+        return _Shape(vertices, shape.indices, page, shape.vertexFormat)
@@ -0,0 +1,313 @@
+# coding=utf-8
+"""
+BOUNDS
+Bounding volumes of shapes and view frustum culling.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+import numpy as _np
+
+# Frustum plane names, in the order they are extracted
+_BOUNDS_PLANES = ('left', 'right', 'bottom', 'top', 'near', 'far')
+
+
+class Bounds(object):
+    """
+    Axis aligned bounding box and bounding sphere of a set of points.
+    """
+
+    def __init__(self, aabb_min, aabb_max, center=None, radius=None):
+        """
+        Constructor. If the sphere is not given, it encloses the box.
+
+        :param aabb_min: Minimum corner
+        :param aabb_max: Maximum corner
+        :param center: Sphere center
+        :param radius: Sphere radius
+        """
+        self.aabbMin = _np.array(aabb_min, dtype=_np.float32).reshape(3)
+        self.aabbMax = _np.array(aabb_max, dtype=_np.float32).reshape(3)
+        if center is None:
+            center = (self.aabbMin + self.aabbMax) / 2
+            radius = float(_np.linalg.norm(self.aabbMax - self.aabbMin)) / 2
+        self.center = _np.array(center, dtype=_np.float32).reshape(3)
+        self.radius = float(radius)
+
+        # Box center as a point and extent as a vector in homogeneous coordinates, read by the frustum tests
+        self._boxCenter = _np.ones(4, dtype=_np.float32)
+        self._boxCenter[0:3] = (self.aabbMin + self.aabbMax) / 2
+        self._boxExtent = _np.zeros(4, dtype=_np.float32)
+        self._boxExtent[0:3] = (self.aabbMax - self.aabbMin) / 2
+
+    def get_extent(self):
+        """
+        Return the half size of the box.
+
+        :return: Extent
+        :rtype: numpy.ndarray
+        """
+        return (self.aabbMax - self.aabbMin) / 2
+
+    def transform(self, matrix):
+        """
+        Return the bounds of the points transformed by a 4x4 matrix. The box
+        encloses the transformed box, the sphere is scaled by the largest axis
+        scale of the matrix.
+
+        :param matrix: Transform matrix
+        :return: Transformed bounds
+        :rtype: Bounds
+        """
+        matrix = _np.asarray(matrix, dtype=_np.float32)
+        linear = matrix[0:3, 0:3]
+        center = _np.dot(linear, (self.aabbMin + self.aabbMax) / 2) + matrix[0:3, 3]
+        extent = _np.dot(_np.abs(linear), self.get_extent())
+        sphere_center = _np.dot(linear, self.center) + matrix[0:3, 3]
+        scale = float(_np.sqrt(_np.max(_np.sum(linear * linear, axis=0))))
+        return Bounds(center - extent, center + extent, sphere_center, self.radius * scale)
+
+    def merge(self, other):
+        """
+        Return the bounds enclosing these bounds and another.
+
+        :param other: Bounds
+        :type other: Bounds
+        :return: Merged bounds
+        :rtype: Bounds
+        """
+        return merge_bounds([self, other])
+
+    def __repr__(self):
+        return 'Bounds(min={0}, max={1}, center={2}, radius={3})'.format(
+            self.aabbMin.tolist(), self.aabbMax.tolist(), self.center.tolist(), self.radius)
+
+
+def compute_bounds(vertices, vertex_format):
+    """
+    Compute the bounds of interleaved vertex data, the position must be the
+    first attribute of the format.
+
+    :param vertices: Vertex data
+    :param vertex_format: shapes.VertexFormat of the data
+    :return: Bounds, None if the data has no vertices or the format is unknown
+    :rtype: Bounds
+    """
+    if vertex_format is None or vertex_format.get_offset('position') != 0:
+        return None
+    vertices = _np.asarray(vertices, dtype=_np.float32)
+    count = vertices.size // vertex_format.components
+    if count == 0:
+        return None
+    positions = vertices[0:count * vertex_format.components].reshape(count, vertex_format.components)[:, 0:3]
+    aabb_min = positions.min(axis=0)
+    aabb_max = positions.max(axis=0)
+    center = (aabb_min + aabb_max) / 2
+    radius = float(_np.sqrt(_np.max(_np.sum((positions - center) ** 2, axis=1))))
+    return Bounds(aabb_min, aabb_max, center, radius)
+
+
+def merge_bounds(bounds):
+    """
+    Return the bounds enclosing a list of bounds, None bounds are skipped.
+
+    :param bounds: List of bounds
+    :return: Merged bounds, None if the list has no bounds
+    :rtype: Bounds
+    """
+    bounds = [b for b in bounds if b is not None]
+    if len(bounds) == 0:
+        return None
+    if len(bounds) == 1:
+        return bounds[0]
+    aabb_min = _np.min([b.aabbMin for b in bounds], axis=0)
+    aabb_max = _np.max([b.aabbMax for b in bounds], axis=0)
+
+    # The sphere encloses the spheres of the bounds, centered at the box center
+    center = (aabb_min + aabb_max) / 2
+    radius = max(float(_np.linalg.norm(b.center - center)) + b.radius for b in bounds)
+    radius = min(radius, float(_np.linalg.norm(aabb_max - aabb_min)) / 2)
+    return Bounds(aabb_min, aabb_max, center, radius)
+
+
+class Frustum(object):
+    """
+    View frustum planes, extracted from a projection and a view matrix. The
+    frustum counts the objects tested and culled, a new frustum is created each
+    frame from the camera matrices.
+    """
+
+    def __init__(self, projection, view=None):
+        """
+        Constructor.
+
+        :param projection: Projection matrix, or the projection @ view matrix if the view is not given
+        :param view: View matrix
+        """
+        matrix = _np.asarray(projection, dtype=_np.float64)
+        if view is not None:
+            matrix = _np.dot(matrix, _np.asarray(view, dtype=_np.float64))
+
+        # Each plane is a row combination of the clip matrix, points inside have n . p + d >= 0
+        planes = _np.array([
+            matrix[3] + matrix[0],
+            matrix[3] - matrix[0],
+            matrix[3] + matrix[1],
+            matrix[3] - matrix[1],
+            matrix[3] + matrix[2],
+            matrix[3] - matrix[2]
+        ])
+        planes /= _np.linalg.norm(planes[:, 0:3], axis=1)[:, None]
+        self.planes = planes.astype(_np.float32)
+
+        # Buffers of the tests in model space, reused so testing does not allocate arrays
+        self._localPlanes = _np.empty((6, 4), dtype=_np.float32)
+        self._absPlanes = _np.empty((6, 4), dtype=_np.float32)
+        self._distances = _np.empty(6, dtype=_np.float32)
+        self._radii = _np.empty(6, dtype=_np.float32)
+        self._inside = _np.empty(6, dtype=bool)
+        self._stats = {
+            'tested': 0,
+            'culled': 0
+        }
+
+    def get_plane(self, name):
+        """
+        Return a plane as (nx, ny, nz, d).
+
+        :param name: left, right, bottom, top, near or far
+        :return: Plane
+        :rtype: numpy.ndarray
+        """
+        return self.planes[_BOUNDS_PLANES.index(name)]
+
+    def test_sphere(self, center, radius):
+        """
+        Check if a sphere intersects the frustum.
+
+        :param center: Sphere center
+        :param radius: Sphere radius
+        :return: True if visible
+        :rtype: bool
+        """
+        distances = _np.dot(self.planes[:, 0:3], center) + self.planes[:, 3]
+        return bool(_np.all(distances >= -radius))
+
+    def test_aabb(self, aabb_min, aabb_max):
+        """
+        Check if a box intersects the frustum. Boxes near the frustum corners
+        may be reported as visible.
+
+        :param aabb_min: Minimum corner
+        :param aabb_max: Maximum corner
+        :return: True if visible
+        :rtype: bool
+        """
+        center = (aabb_min + aabb_max) / 2
+        extent = (aabb_max - aabb_min) / 2
+        distances = _np.dot(self.planes[:, 0:3], center) + self.planes[:, 3]
+        return bool(_np.all(distances >= -_np.dot(_np.abs(self.planes[:, 0:3]), extent)))
+
+    def test_boxes(self, centers, extents):
+        """
+        Check if many boxes intersect the frustum.
+
+        :param centers: Box centers, (N, 3) array
+        :param extents: Box extents, (N, 3) array
+        :return: Visibility of each box, (N,) bool array
+        :rtype: numpy.ndarray
+        """
+        distances = _np.dot(centers, self.planes[:, 0:3].T) + self.planes[:, 3]
+        radii = _np.dot(extents, _np.abs(self.planes[:, 0:3]).T)
+        return _np.all(distances >= -radii, axis=1)
+
+    def is_visible(self, bounds, objects=1):
+        """
+        Check if world space bounds are visible and count the objects culled.
+        Shapes without bounds are always visible.
+
+        :param bounds: World space bounds
+        :type bounds: Bounds
+        :param objects: Number of objects within the bounds
+        :type objects: int
+        :return: True if visible
+        :rtype: bool
+        """
+        if bounds is None:
+            return True
+        visible = self.test_sphere(bounds.center, bounds.radius) and self.test_aabb(bounds.aabbMin, bounds.aabbMax)
+        self.count(1, 0 if visible else objects)
+        return visible
+
+    def is_visible_local(self, bounds, matrix, objects=1):
+        """
+        Check if bounds given in the space of a model matrix are visible and
+        count the objects culled. The planes are moved to the model space
+        instead of transforming the bounds, and the box is tested as oriented
+        by the matrix, so no array is allocated. Shapes without bounds are
+        always visible.
+
+        :param bounds: Model space bounds
+        :type bounds: Bounds
+        :param matrix: Model matrix, float32
+        :param objects: Number of objects within the bounds
+        :type objects: int
+        :return: True if visible
+        :rtype: bool
+        """
+        if bounds is None:
+            return True
+
+        # A plane (n, d) of the world is the plane (n, d) @ matrix of the model space
+        _np.matmul(self.planes, matrix, out=self._localPlanes)
+        _np.matmul(self._localPlanes, bounds._boxCenter, out=self._distances)
+        _np.abs(self._localPlanes, out=self._absPlanes)
+        _np.matmul(self._absPlanes, bounds._boxExtent, out=self._radii)
+        _np.add(self._distances, self._radii, out=self._distances)
+        _np.greater_equal(self._distances, 0, out=self._inside)
+        visible = bool(self._inside.all())
+        self.count(1, 0 if visible else objects)
+        return visible
+
+    def count(self, tested, culled):
+        """
+        Count bounds tested elsewhere.
+
+        :param tested: Number of bounds tested
+        :param culled: Number of objects culled
+        :return:
+        """
+        self._stats['tested'] += int(tested)
+        self._stats['culled'] += int(culled)
+
+    def get_stats(self):
+        """
+        Return the number of bounds tested and of objects culled.
+
+        :return: Statistics
+        :rtype: dict
+        """
+        return dict(self._stats)
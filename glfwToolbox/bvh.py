@@ -0,0 +1,566 @@
+# coding=utf-8
+"""
+BVH
+Bounding volume hierarchies over triangles and shape instances, used to cast
+rays and pick objects under the mouse.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+import numpy as _np
+
+import glfwToolbox.transformations as _tr
+
+# Default build parameters, primitives per leaf and SAH bins
+_BVH_LEAF_SIZE = 8
+_BVH_BINS = 16
+
+# Rays parallel to an axis use this inverse direction component
+_BVH_INV_MAX = 1e30
+
+# Levels skipped by each traversal step, the tree is traversed as a 2^n wide tree
+_BVH_WIDE_LEVELS = 3
+
+
+def _box_area(aabb_min, aabb_max):
+    """
+    Surface area of boxes, the last axis holds the coordinates.
+
+    :param aabb_min: Minimum corners
+    :param aabb_max: Maximum corners
+    :return: Areas
+    :rtype: numpy.ndarray
+    """
+    d = aabb_max - aabb_min
+    return 2 * (d[..., 0] * d[..., 1] + d[..., 1] * d[..., 2] + d[..., 2] * d[..., 0])
+
+
+def _segment_offsets(starts, counts):
+    """
+    Positions covered by a list of segments, concatenated.
+
+    :param starts: First position of each segment
+    :param counts: Length of each segment
+    :return: Positions
+    :rtype: numpy.ndarray
+    """
+    excl = _np.cumsum(counts) - counts
+    return _np.arange(int(counts.sum())) + _np.repeat(starts - excl, counts)
+
+
+class BVH(object):
+    """
+    Bounding volume hierarchy over axis aligned boxes. The tree is built top
+    down with binned SAH along the largest axis of each node, one level at a
+    time, splitting all the nodes of a level together. The nodes are stored in
+    flat arrays, the two childs of a node are consecutive.
+    """
+
+    def __init__(self, aabb_min, aabb_max, leaf_size=_BVH_LEAF_SIZE, bins=_BVH_BINS):
+        """
+        Constructor.
+
+        :param aabb_min: Minimum corner of each primitive, (N, 3) array
+        :param aabb_max: Maximum corner of each primitive, (N, 3) array
+        :param leaf_size: Maximum number of primitives of a leaf
+        :param bins: Number of SAH bins
+        """
+        aabb_min = _np.asarray(aabb_min, dtype=_np.float32).reshape(-1, 3)
+        aabb_max = _np.asarray(aabb_max, dtype=_np.float32).reshape(-1, 3)
+        n = len(aabb_min)
+        if n == 0:
+            raise Exception('BVH requires at least one primitive')
+        leaf_size = max(int(leaf_size), 1)
+
+        size = 2 * n - 1
+        self.nodeBounds = _np.empty((size, 2, 3), dtype=_np.float32)  # Minimum and maximum corners
+        self.nodeMin = self.nodeBounds[:, 0]
+        self.nodeMax = self.nodeBounds[:, 1]
+        self.nodeLeft = _np.full(size, -1, dtype=_np.int64)  # First child, -1 for leaves
+        self.nodeStart = _np.zeros(size, dtype=_np.int64)  # First primitive of the node
+        self.nodeCount = _np.zeros(size, dtype=_np.int64)
+        self.primitives = _np.arange(n)  # Primitives sorted by node
+        self._build(aabb_min, aabb_max, leaf_size, bins)
+
+    def _build(self, aabb_min, aabb_max, leaf_size, bins):
+        """
+        Build the tree.
+
+        :param aabb_min: Minimum corner of each primitive
+        :param aabb_max: Maximum corner of each primitive
+        :param leaf_size: Maximum number of primitives of a leaf
+        :param bins: Number of SAH bins
+        :return:
+        """
+        centroids = (aabb_min + aabb_max) / 2
+        order = self.primitives
+        starts = _np.zeros(1, dtype=_np.int64)
+        counts = _np.array([len(order)], dtype=_np.int64)
+        ids = _np.zeros(1, dtype=_np.int64)
+        used = 1
+        axes = _np.arange(3)
+
+        while len(ids) > 0:
+            excl = _np.cumsum(counts) - counts
+            prims = order[_segment_offsets(starts, counts)]
+            self.nodeMin[ids] = _np.minimum.reduceat(aabb_min[prims], excl)
+            self.nodeMax[ids] = _np.maximum.reduceat(aabb_max[prims], excl)
+            self.nodeStart[ids] = starts
+            self.nodeCount[ids] = counts
+
+            split = counts > leaf_size
+            if not split.any():
+                break
+
+            # Only the primitives of the nodes that are split
+            seg = _np.repeat(_np.cumsum(split) - 1, counts)[_np.repeat(split, counts)]
+            prims = prims[_np.repeat(split, counts)]
+            starts, counts = starts[split], counts[split]
+            excl = _np.cumsum(counts) - counts
+            segments = len(counts)
+
+            # Each centroid is binned along the largest axis of the centroid bounds of its node
+            c = centroids[prims]
+            cmin = _np.minimum.reduceat(c, excl)
+            extent = _np.maximum.reduceat(c, excl) - cmin
+            axis = _np.argmax(extent, axis=1)
+            width = extent[_np.arange(segments), axis]
+            scale = _np.where(width > 0, bins / _np.where(width > 0, width, 1), 0)
+            seg_axis = axis[seg]
+            point = _np.arange(len(prims))
+            b = _np.minimum(((c[point, seg_axis] - cmin[seg, seg_axis]) * scale[seg]).astype(_np.int64), bins - 1)
+            key = seg * bins + b
+            bin_count = _np.bincount(key, minlength=segments * bins).reshape(segments, bins)
+
+            # The bin bounds are reduced one coordinate at a time, ufunc.at is much faster on flat arrays
+            key = (key[:, None] * 3 + axes).ravel()
+            bin_min = _np.full(segments * bins * 3, _np.inf, dtype=_np.float32)
+            bin_max = _np.full(segments * bins * 3, -_np.inf, dtype=_np.float32)
+            _np.minimum.at(bin_min, key, aabb_min[prims].ravel())
+            _np.maximum.at(bin_max, key, aabb_max[prims].ravel())
+            bin_min = bin_min.reshape(segments, bins, 3)
+            bin_max = bin_max.reshape(segments, bins, 3)
+
+            # SAH cost of splitting after each bin, both sides must have primitives
+            left_count = _np.cumsum(bin_count, axis=1)[:, :-1]
+            right_count = _np.cumsum(bin_count[:, ::-1], axis=1)[:, ::-1][:, 1:]
+            with _np.errstate(invalid='ignore', over='ignore'):
+                left_area = _box_area(_np.minimum.accumulate(bin_min, axis=1),
+                                      _np.maximum.accumulate(bin_max, axis=1))[:, :-1]
+                right_area = _box_area(_np.minimum.accumulate(bin_min[:, ::-1], axis=1)[:, ::-1],
+                                       _np.maximum.accumulate(bin_max[:, ::-1], axis=1)[:, ::-1])[:, 1:]
+                cost = left_area * left_count + right_area * right_count
+            cost[(left_count == 0) | (right_count == 0)] = _np.inf
+            best = _np.argmin(cost, axis=1)
+            left = b <= best[seg]
+
+            # Nodes whose centroids fall in a single bin are split in halves
+            rank = point - excl[seg]
+            degenerate = ~_np.isfinite(cost[_np.arange(segments), best])
+            left = _np.where(degenerate[seg], rank < (counts // 2)[seg], left)
+
+            # Stable partition of each node, the left primitives first
+            left_counts = _np.bincount(seg, weights=left, minlength=segments).astype(_np.int64)
+            left_before = _np.cumsum(left) - left - (_np.cumsum(left_counts) - left_counts)[seg]
+            position = _np.where(left, starts[seg] + left_before, starts[seg] + left_counts[seg] + rank - left_before)
+            order[position] = prims
+
+            childs = used + 2 * _np.arange(segments)
+            self.nodeLeft[ids[split]] = childs
+            used += 2 * segments
+            ids = _np.stack([childs, childs + 1], axis=1).ravel()
+            starts = _np.stack([starts, starts + left_counts], axis=1).ravel()
+            counts = _np.stack([left_counts, counts - left_counts], axis=1).ravel()
+
+        self.nodeBounds = self.nodeBounds[0:used]
+        self.nodeMin = self.nodeBounds[:, 0]
+        self.nodeMax = self.nodeBounds[:, 1]
+        self.nodeLeft = self.nodeLeft[0:used]
+        self.nodeStart = self.nodeStart[0:used]
+        self.nodeCount = self.nodeCount[0:used]
+
+        # Descendants some levels below each node, padded with -1. Leaves stand for themselves
+        wide = _np.arange(used)[:, None]
+        for _ in range(_BVH_WIDE_LEVELS):
+            left = _np.where(wide >= 0, self.nodeLeft[wide], -1)
+            inner = left >= 0
+            wide = _np.stack([_np.where(inner, left, wide), _np.where(inner, left + 1, -1)], axis=2).reshape(used, -1)
+        self.nodeWide = wide.astype(_np.int32)
+
+    def get_node_count(self):
+        """
+        Return the number of nodes.
+
+        :return:
+        :rtype: int
+        """
+        return len(self.nodeLeft)
+
+    def get_bounds(self):
+        """
+        Return the bounds of the root.
+
+        :return: Minimum and maximum corners
+        :rtype: tuple
+        """
+        return self.nodeMin[0], self.nodeMax[0]
+
+    def traverse(self, origin, direction, test, tmax=_np.inf):
+        """
+        Find the leaves hit by a ray. The tree is traversed some levels at a
+        time, testing all the nodes of a step at once, and the primitives of
+        the leaves hit are tested together.
+
+        :param origin: Ray origin
+        :param direction: Ray direction
+        :param test: Function called with the sorted positions of the primitives of the leaves hit and the maximum
+            distance, it returns the distance of the nearest hit or the maximum distance
+        :param tmax: Maximum distance, in units of the direction length
+        :return: Distance returned by the test
+        :rtype: float
+        """
+        origin = _np.asarray(origin, dtype=_np.float64)
+        direction = _np.asarray(direction, dtype=_np.float64)
+        with _np.errstate(divide='ignore'):
+            inv = _np.clip(1 / direction, -_BVH_INV_MAX, _BVH_INV_MAX)
+        leaves = []
+        frontier = _np.zeros(1, dtype=_np.int32)
+        while len(frontier) > 0:
+            t = (self.nodeBounds[frontier] - origin) * inv
+            tnear = _np.minimum(t[:, 0], t[:, 1]).max(axis=1)
+            tfar = _np.maximum(t[:, 0], t[:, 1]).min(axis=1)
+            frontier = frontier[(tnear <= tfar) & (tfar >= 0) & (tnear < tmax)]
+            inner = self.nodeLeft[frontier] >= 0
+            leaves.append(frontier[~inner])
+            frontier = self.nodeWide[frontier[inner]].ravel()
+            frontier = frontier[frontier >= 0]
+        leaves = _np.concatenate(leaves)
+        if len(leaves) == 0:
+            return tmax
+        return test(_segment_offsets(self.nodeStart[leaves], self.nodeCount[leaves]), tmax)
+
+
+def intersect_triangles(origin, direction, v0, e1, e2, tmax=_np.inf):
+    """
+    Intersect a ray with triangles, Moller-Trumbore test.
+
+    :param origin: Ray origin
+    :param direction: Ray direction
+    :param v0: First vertex of each triangle, (N, 3) array
+    :param e1: Second minus first vertex, (N, 3) array
+    :param e2: Third minus first vertex, (N, 3) array
+    :param tmax: Maximum distance
+    :return: Distances, infinite if missed, and the u, v barycentric coordinates of the second and third vertices
+    :rtype: tuple
+    """
+    dx, dy, dz = float(direction[0]), float(direction[1]), float(direction[2])
+
+    # Cross products written by component, numpy.cross is slow on small arrays
+    px = dy * e2[:, 2] - dz * e2[:, 1]
+    py = dz * e2[:, 0] - dx * e2[:, 2]
+    pz = dx * e2[:, 1] - dy * e2[:, 0]
+    det = e1[:, 0] * px + e1[:, 1] * py + e1[:, 2] * pz
+    s = origin - v0
+    qx = s[:, 1] * e1[:, 2] - s[:, 2] * e1[:, 1]
+    qy = s[:, 2] * e1[:, 0] - s[:, 0] * e1[:, 2]
+    qz = s[:, 0] * e1[:, 1] - s[:, 1] * e1[:, 0]
+    with _np.errstate(divide='ignore', invalid='ignore'):
+        inv_det = 1 / det
+        u = (s[:, 0] * px + s[:, 1] * py + s[:, 2] * pz) * inv_det
+        v = (dx * qx + dy * qy + dz * qz) * inv_det
+        t = (e2[:, 0] * qx + e2[:, 1] * qy + e2[:, 2] * qz) * inv_det
+        hit = (_np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0) & (t < tmax)
+    return _np.where(hit, t, _np.inf), u, v
+
+
+class MeshBVH(BVH):
+    """
+    BVH over the triangles of a mesh, the triangles are stored in the order of
+    the leaves.
+    """
+
+    def __init__(self, triangles, leaf_size=_BVH_LEAF_SIZE, bins=_BVH_BINS):
+        """
+        Constructor.
+
+        :param triangles: Triangle vertices, (N, 3, 3) array
+        :param leaf_size: Maximum number of triangles of a leaf
+        :param bins: Number of SAH bins
+        """
+        triangles = _np.asarray(triangles, dtype=_np.float32).reshape(-1, 3, 3)
+        super(MeshBVH, self).__init__(triangles.min(axis=1), triangles.max(axis=1), leaf_size, bins)
+        triangles = triangles[self.primitives]
+        self._v0 = triangles[:, 0]
+        self._e1 = triangles[:, 1] - triangles[:, 0]
+        self._e2 = triangles[:, 2] - triangles[:, 0]
+
+    def get_triangle_count(self):
+        """
+        Return the number of triangles.
+
+        :return:
+        :rtype: int
+        """
+        return len(self.primitives)
+
+    def intersect(self, origin, direction, tmax=_np.inf):
+        """
+        Return the nearest hit of a ray.
+
+        :param origin: Ray origin
+        :param direction: Ray direction
+        :param tmax: Maximum distance, in units of the direction length
+        :return: Distance, triangle index and barycentric coordinates, None if the ray misses
+        :rtype: tuple
+        """
+        origin = _np.asarray(origin, dtype=_np.float64)
+        direction = _np.asarray(direction, dtype=_np.float64)
+        nearest = []
+
+        def test(positions, t_max):
+            t, u, v = intersect_triangles(origin, direction, self._v0[positions], self._e1[positions],
+                                          self._e2[positions], t_max)
+            i = int(_np.argmin(t))
+            if t[i] < t_max:
+                nearest[:] = [float(t[i]), int(self.primitives[positions[i]]), float(u[i]), float(v[i])]
+                return t[i]
+            return t_max
+
+        self.traverse(origin, direction, test, tmax)
+        if len(nearest) == 0:
+            return None
+        t, triangle, u, v = nearest
+        return t, triangle, _np.array([1 - u - v, u, v])
+
+
+def get_mesh_bvh(shape):
+    """
+    Return the BVH of a GPUShape, built on first use. The shape must keep its
+    triangles on the CPU, see easy_shaders.to_gpu_shape.
+
+    :param shape: GPUShape
+    :return: BVH, None if the shape has no CPU triangles
+    :rtype: MeshBVH
+    """
+    if shape.bvh is None:
+        triangles = shape.get_triangles()
+        if triangles is None or len(triangles) == 0:
+            return None
+        shape.bvh = MeshBVH(triangles)
+    return shape.bvh
+
+
+class RayHit(object):
+    """
+    Nearest hit of a ray.
+    """
+
+    def __init__(self, distance, position, node, shape, triangle, barycentric):
+        """
+        Constructor.
+
+        :param distance: Distance along the ray, in units of the direction length
+        :param position: World position
+        :param node: Scene graph node that draws the shape hit, or the payload of the instance
+        :param shape: GPUShape hit
+        :param triangle: Triangle index within the shape
+        :param barycentric: Barycentric coordinates of the hit within the triangle
+        """
+        self.distance = distance
+        self.position = position
+        self.node = node
+        self.shape = shape
+        self.triangle = triangle
+        self.barycentric = barycentric
+
+    def __repr__(self):
+        return 'RayHit(node={0}, triangle={1}, barycentric={2}, distance={3})'.format(
+            getattr(self.node, 'name', self.node), self.triangle, self.barycentric.tolist(), self.distance)
+
+
+class SceneBVH(object):
+    """
+    Top level BVH over shape instances, each instance is a shape with a world
+    transform and a mesh BVH. The top level tree is rebuilt when the instances
+    change, rays are transformed to the frame of each instance hit.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._instances = []  # [matrix, inverse, mesh bvh, shape, payload]
+        self._bvh = None
+
+    def add_instance(self, matrix, shape, payload=None):
+        """
+        Add a shape instance, shapes without CPU triangles are skipped.
+
+        :param matrix: World transform
+        :param shape: GPUShape
+        :param payload: Object returned by the hits of the instance
+        :return: Instance index, -1 if skipped
+        :rtype: int
+        """
+        mesh = get_mesh_bvh(shape)
+        if mesh is None:
+            return -1
+        matrix = _np.array(matrix, dtype=_np.float64)
+        self._instances.append([matrix, _np.linalg.inv(matrix), mesh, shape, payload])
+        self._bvh = None
+        return len(self._instances) - 1
+
+    def add_scene_graph(self, node, parent_transform=_tr.identity()):
+        """
+        Add the shapes of a scene graph, the payload of each instance is the
+        node that draws the shape.
+
+        :param node: Root node
+        :param parent_transform: Transform applied to the whole graph
+        :return:
+        """
+        # Imported here, the scene graph module imports the shaders
+        from glfwToolbox.scene_graph import compile_scene_graph
+        graph = compile_scene_graph(node)
+        graph.update(parent_transform)
+        for leaf_node, shape, matrix in graph.get_leaves():
+            self.add_instance(matrix, shape, leaf_node)
+
+    def set_transform(self, index, matrix):
+        """
+        Move an instance.
+
+        :param index: Instance index
+        :param matrix: World transform
+        :return:
+        """
+        matrix = _np.array(matrix, dtype=_np.float64)
+        self._instances[index][0] = matrix
+        self._instances[index][1] = _np.linalg.inv(matrix)
+        self._bvh = None
+
+    def clear(self):
+        """
+        Remove all the instances.
+
+        :return:
+        """
+        self._instances = []
+        self._bvh = None
+
+    def __len__(self):
+        return len(self._instances)
+
+    def build(self):
+        """
+        Build the top level tree, called by the ray queries if the instances
+        changed. It must be called if the vertices of a shape are updated.
+
+        :return:
+        """
+        aabb_min = _np.empty((len(self._instances), 3))
+        aabb_max = _np.empty((len(self._instances), 3))
+        for i in range(len(self._instances)):
+            matrix, shape = self._instances[i][0], self._instances[i][3]
+            mesh = get_mesh_bvh(shape)
+            self._instances[i][2] = mesh
+            local_min, local_max = mesh.get_bounds()
+            center = _np.dot(matrix[0:3, 0:3], (local_min + local_max) / 2) + matrix[0:3, 3]
+            extent = _np.dot(_np.abs(matrix[0:3, 0:3]), (local_max - local_min) / 2)
+            aabb_min[i] = center - extent
+            aabb_max[i] = center + extent
+        self._bvh = BVH(aabb_min, aabb_max, leaf_size=2)
+
+    def intersect(self, origin, direction, tmax=_np.inf):
+        """
+        Return the nearest hit of a world space ray.
+
+        :param origin: Ray origin
+        :param direction: Ray direction
+        :param tmax: Maximum distance, in units of the direction length
+        :return: Hit, None if the ray misses
+        :rtype: RayHit
+        """
+        if len(self._instances) == 0:
+            return None
+        if self._bvh is None:
+            self.build()
+        origin = _np.asarray(origin, dtype=_np.float64)
+        direction = _np.asarray(direction, dtype=_np.float64)
+        nearest = []
+
+        def test(positions, t_max):
+            for i in self._bvh.primitives[positions]:
+                matrix, inverse, mesh, shape, payload = self._instances[i]
+
+                # The distance is kept by affine transforms if the direction is not normalized
+                hit = mesh.intersect(_np.dot(inverse[0:3, 0:3], origin) + inverse[0:3, 3],
+                                     _np.dot(inverse[0:3, 0:3], direction), t_max)
+                if hit is not None and hit[0] < t_max:
+                    t_max = hit[0]
+                    nearest[:] = [hit, shape, payload]
+            return t_max
+
+        self._bvh.traverse(origin, direction, test, tmax)
+        if len(nearest) == 0:
+            return None
+        (t, triangle, barycentric), shape, payload = nearest
+        return RayHit(t, origin + t * direction, payload, shape, triangle, barycentric)
+
+    def pick(self, camera, projection, x, y):
+        """
+        Return the nearest object under a screen position.
+
+        :param camera: Camera, or view matrix
+        :param projection: Projection matrix
+        :param x: Horizontal position in normalized device coordinates, from -1 (left) to 1 (right)
+        :param y: Vertical position in normalized device coordinates, from -1 (bottom) to 1 (top)
+        :return: Hit, None if there is no object
+        :rtype: RayHit
+        """
+        origin, direction = unproject(camera, projection, x, y)
+        return self.intersect(origin, direction)
+
+
+def unproject(camera, projection, x, y):
+    """
+    Return the world space ray through a screen position. The ray starts at
+    the near plane and its direction reaches the far plane.
+
+    :param camera: Camera, or view matrix
+    :param projection: Projection matrix
+    :param x: Horizontal position in normalized device coordinates
+    :param y: Vertical position in normalized device coordinates
+    :return: Ray origin and direction
+    :rtype: tuple
+    """
+    view = camera.get_view() if hasattr(camera, 'get_view') else camera
+    inverse = _np.linalg.inv(_np.dot(_np.asarray(projection, dtype=_np.float64), _np.asarray(view, dtype=_np.float64)))
+    near = _np.dot(inverse, [x, y, -1, 1])
+    far = _np.dot(inverse, [x, y, 1, 1])
+    near = near[0:3] / near[3]
+    far = far[0:3] / far[3]
+    return near, far - near
@@ -29,9 +29,11 @@ SOFTWARE.
 """
 
 # Library imports
+from glfwToolbox.bounds import Frustum as _Frustum
 from glfwToolbox.mathlib import _cos, _sin, _xyz_to_spr, _spr_to_xyz
 from glfwToolbox.mathlib import Point3 as _Point3
 from glfwToolbox.mathlib import Vector3 as _Vector3
+import glfwToolbox.quaternion as _quat
 import glfwToolbox.transformations as tr
 
 from OpenGL.GL import glLoadIdentity as _glLoadIdentity
@@ -80,6 +82,46 @@ class _Camera(object):
             _np.array([self.get_up_x(), self.get_up_y(), self.get_up_z()])
         )
 
+    def get_frustum(self, projection):
+        """
+        Get the view frustum of the camera.
+
+        :param projection: Projection matrix
+        :return: Frustum
+        :rtype: glfwToolbox.bounds.Frustum
+        """
+        return _Frustum(projection, self.get_view())
+
+    def get_orientation(self):
+        """
+        Get the rotation from camera to world coordinates, the camera looks
+        along its -z axis with y up.
+
+        :return: Unit quaternion (x, y, z, w)
+        :rtype: array
+        """
+        return _quat.from_matrix(self.get_view()[0:3, 0:3].T)
+
+    def rotate(self, q):
+        """
+        Rotate eye position and up vector by a quaternion.
+
+        :param q: Unit quaternion (x, y, z, w)
+        :type q: array
+        """
+        pass
+
+    def set_orientation(self, q):
+        """
+        Place the eye around the center, at the same distance, so that the
+        camera has the given orientation. Orientations of two cameras can be
+        interpolated with quaternion.slerp.
+
+        :param q: Unit quaternion (x, y, z, w), as returned by get_orientation
+        :type q: array
+        """
+        pass
+
     def get_pos_x(self):
         """
         Returns x position.
@@ -540,6 +582,44 @@ class CameraXYZ(_Camera):
         self._pos.set_y(y)
         self._pos.set_z(z)
 
+    def rotate(self, q):
+        """
+        Rotate eye position and up vector by a quaternion.
+
+        :param q: Unit quaternion (x, y, z, w)
+        :type q: array
+        """
+        q = _np.asarray(q)
+        x, y, z = _quat.rotate(q, [self._pos.get_x(), self._pos.get_y(), self._pos.get_z()])
+        self._pos.set_x(float(x))
+        self._pos.set_y(float(y))
+        self._pos.set_z(float(z))
+        x, y, z = _quat.rotate(q, [self._up.get_x(), self._up.get_y(), self._up.get_z()])
+        self._up.set_x(float(x))
+        self._up.set_y(float(y))
+        self._up.set_z(float(z))
+
+    def set_orientation(self, q):
+        """
+        Place the eye around the center, at the same distance, so that the
+        camera has the given orientation. Orientations of two cameras can be
+        interpolated with quaternion.slerp.
+
+        :param q: Unit quaternion (x, y, z, w), as returned by get_orientation
+        :type q: array
+        """
+        q = _np.asarray(q)
+        center = _np.array([self._center.get_x(), self._center.get_y(), self._center.get_z()])
+        pos = _np.array([self._pos.get_x(), self._pos.get_y(), self._pos.get_z()])
+        x, y, z = center + _quat.rotate(q, [0, 0, _np.linalg.norm(pos - center)])
+        self._pos.set_x(float(x))
+        self._pos.set_y(float(y))
+        self._pos.set_z(float(z))
+        x, y, z = _quat.rotate(q, [0, 1, 0])
+        self._up.set_x(float(x))
+        self._up.set_y(float(y))
+        self._up.set_z(float(z))
+
     def move_center_x(self, dist):
         """
         Moves center x coordinate.
@@ -853,6 +933,48 @@ class CameraR(_Camera):
         """
         self._theta = min(max(self._theta + angle, _CAMERA_MIN_THETA_VALUE), 180)
 
+    def rotate(self, q):
+        """
+        Rotate eye position and up vector by a quaternion, the rotated position
+        is converted back to spheric coordinates.
+
+        :param q: Unit quaternion (x, y, z, w)
+        :type q: array
+        """
+        q = _np.asarray(q)
+        x, y, z = _quat.rotate(q, [self.get_pos_x(), self.get_pos_y(), self.get_pos_z()])
+        self._r, self._phi, self._theta = _xyz_to_spr(float(x), float(y), float(z))
+        self._rotate_up(q)
+
+    def set_orientation(self, q):
+        """
+        Place the eye around the center, at the same distance, so that the
+        camera has the given orientation. The eye is converted back to
+        spheric coordinates.
+
+        :param q: Unit quaternion (x, y, z, w), as returned by get_orientation
+        :type q: array
+        """
+        q = _np.asarray(q)
+        relpos = _np.array(self._relpos.export_to_list())
+        center = _np.array([self.get_center_x(), self.get_center_y(), self.get_center_z()])
+        eye = _np.array([self.get_pos_x(), self.get_pos_y(), self.get_pos_z()]) + relpos
+        x, y, z = center + _quat.rotate(q, [0, 0, _np.linalg.norm(eye - center)]) - relpos
+        self._r, self._phi, self._theta = _xyz_to_spr(float(x), float(y), float(z))
+        self._up = _Vector3(0, 1, 0)
+        self._rotate_up(q)
+
+    def _rotate_up(self, q):
+        """
+        Rotate the up vector, a new vector is created as the default one is
+        shared by all cameras.
+
+        :param q: Unit quaternion (x, y, z, w)
+        :type q: array
+        """
+        x, y, z = _quat.rotate(q, [self._up.get_x(), self._up.get_y(), self._up.get_z()])
+        self._up = _Vector3(float(x), float(y), float(z))
+
     def convert_to_xyz(self):
         """
         Convert spheric to cartesian.
@@ -79,3 +79,18 @@ def color_hsv(x):
     for i in range(len(_COLOR_COLORMAP_R)):
         if x <= _COLOR_COLORMAP_R[i]:
             return _COLOR_COLORMAP_HSV[i]
+
+
+def colormap_hsv(x):
+    """
+    Return the colors of an array of values from colormap, vectorized version
+    of color_hsv.
+
+    :param x: Values from 0 to 1
+    :return: RGBA colors, one row for each value
+    :rtype: numpy.ndarray
+    """
+    x = _np.asarray(x)
+    if _np.any(x < 0) or _np.any(x > 1):
+        raise Exception('x must be numerical bewteen 0 and 1')
+    return _COLOR_COLORMAP_HSV[_np.searchsorted(_COLOR_COLORMAP_R, x, side='left')]
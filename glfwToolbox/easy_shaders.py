@@ -31,14 +31,22 @@ SOFTWARE.
 from OpenGL.GL import *
 import OpenGL.GL.shaders
 import numpy as np
-from PIL import Image
 
+from glfwToolbox.frame_uniforms import FRAME_UNIFORMS_BINDING, FRAME_UNIFORMS_BLOCK, get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state
+from glfwToolbox.textures import texture_simple_setup  # Kept for compatibility
+import glfwToolbox.bounds as bounds
+import glfwToolbox.resources as resources
 import glfwToolbox.shapes as shapes
+import glfwToolbox.textures as textures
 
 # We will use 32 bits data, so an integer has 4 bytes
 # 1 byte = 8 bits
 INT_BYTES = 4
 
+# Number of location queries sent to the driver
+_LOCATION_QUERIES = [0]
+
 
 # A simple class container to reference a shape on GPU memory
 class GPUShape:
@@ -48,74 +56,554 @@ class GPUShape:
         self.ebo = 0
         self.texture = 0
         self.size = 0
+        self.indexType = GL_UNSIGNED_INT
+        self.usage = GL_STATIC_DRAW
+        self.vboCapacity = 0  # Size of the vertex buffer storage in bytes
+        self.vboSize = 0  # Size of the vertex data in bytes
+        self.vertexFormat = None  # shapes.VertexFormat of the vertex buffer
+        self.layout = None  # Attribute locations recorded within the VAO
+        self.layoutLocations = []  # Enabled attribute arrays
+        self.instanceLayout = None  # Instance buffers and locations recorded within the VAO
+        self.bounds = None  # bounds.Bounds of the vertex positions, used to cull the shape
+        self.cpuVertices = None  # Vertex positions kept on the CPU for ray queries, (V, 3) array
+        self.cpuIndices = None  # Triangle indices kept on the CPU, (T, 3) array
+        self.bvh = None  # bvh.MeshBVH of the CPU triangles, built on first use
+
+    def get_triangles(self):
+        """
+        Return the triangles kept on the CPU.
+
+        :return: Triangle vertices, (T, 3, 3) array, None if the shape does not keep them
+        :rtype: numpy.ndarray
+        """
+        if self.cpuVertices is None:
+            return None
+        return self.cpuVertices[self.cpuIndices]
+
+    def update_vertices(self, vertices, offset=0):
+        """
+        Rewrite a range of the vertex buffer in place. The shape should be
+        created with GL_DYNAMIC_DRAW or GL_STREAM_DRAW usage.
+
+        :param vertices: Vertex data, interleaved with the format of the shape
+        :param offset: First vertex to update
+        :type offset: int
+        :return:
+        """
+        data = np.ascontiguousarray(vertices, dtype=np.float32)
+        byte_offset = offset * self.vertexFormat.stride
+        rewrite = byte_offset == 0 and data.nbytes >= self.vboSize
+
+        if byte_offset + data.nbytes > self.vboCapacity:
+            if not rewrite:
+                raise Exception('Vertex data exceeds the vertex buffer capacity')
+            self.vboCapacity = resources.capacity_class(data.nbytes)
+            resources.get_registry().resize_buffer(GL_ARRAY_BUFFER, self.vbo, self.vboCapacity, self.usage)
+        else:
+            get_gl_state().bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+
+            # If the whole buffer is rewritten the old storage is orphaned, so the
+            # driver does not wait for the previous frame draws to finish
+            if rewrite:
+                glBufferData(GL_ARRAY_BUFFER, self.vboCapacity, None, self.usage)
+        glBufferSubData(GL_ARRAY_BUFFER, byte_offset, data.nbytes, data)
+
+        if self.cpuVertices is not None:
+            positions = data.reshape(-1, self.vertexFormat.components)[:, 0:3]
+            if rewrite:
+                self.cpuVertices = positions.copy()
+            else:
+                self.cpuVertices[offset:offset + len(positions)] = positions
+            self.bvh = None
+
+        # Partial updates can only grow the bounds
+        new_bounds = bounds.compute_bounds(data, self.vertexFormat)
+        if rewrite:
+            self.vboSize = data.nbytes
+            self.bounds = new_bounds
+        else:
+            self.vboSize = max(self.vboSize, byte_offset + data.nbytes)
+            self.bounds = bounds.merge_bounds([self.bounds, new_bounds])
+
+    def release(self):
+        """
+        Release the GPU resources of the shape. The buffers are returned to the
+        resource pool, the VAO is deleted and the texture is released to the
+        texture manager.
+
+        :return:
+        """
+        if self.vao == 0:
+            return
+        registry = resources.get_registry()
+        registry.delete_vao(self.vao)
+        registry.release_buffer(self.vbo)
+        registry.release_buffer(self.ebo)
+        if self.texture != 0:
+            textures.get_texture_manager().release(self.texture)
+        self.vao = 0
+        self.vbo = 0
+        self.ebo = 0
+        self.texture = 0
+        self.size = 0
+        self.vboCapacity = 0
+        self.vboSize = 0
+        self.layout = None
+        self.layoutLocations = []
+        self.instanceLayout = None
+        self.bounds = None
+        self.cpuVertices = None
+        self.cpuIndices = None
+        self.bvh = None
 
+    def __enter__(self):
+        return self
 
-def texture_simple_setup(texture, img_name, wrap_mode, filter_mode):
-    # wrap_mode: GL_REPEAT, GL_CLAMP_TO_EDGE
-    # filter_mode: GL_LINEAR, GL_NEAREST
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
 
-    glBindTexture(GL_TEXTURE_2D, texture)
 
-    # texture wrapping params
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap_mode)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap_mode)
+# Per-instance model matrices and colors, drawn with draw_shape_instanced
+class GPUInstances:
+    def __init__(self):
+        self.vbo = 0  # Model matrices, 16 floats per instance
+        self.cbo = 0  # Colors, 3 floats per instance, 0 if instances are not colored
+        self.count = 0
+        self.usage = GL_DYNAMIC_DRAW
+        self.vboCapacity = 0
+        self.cboCapacity = 0
+
+    def update(self, models, colors=None):
+        """
+        Rewrite the instances. The buffers grow if required, colors can only be
+        given if the instances were created with colors.
+
+        :param models: Model matrices (N, 4, 4)
+        :param colors: Colors (N, 3)
+        :return:
+        """
+        models = np.ascontiguousarray(models, dtype=np.float32).reshape(-1, 16)
+        if colors is not None:
+            if self.cbo == 0:
+                raise Exception('Instances were created without colors')
+            colors = np.ascontiguousarray(colors, dtype=np.float32).reshape(-1, 3)
+            if len(colors) != len(models):
+                raise Exception('Number of colors does not match the number of models')
+        self.vboCapacity = _rewrite_buffer(self.vbo, self.vboCapacity, models, self.usage)
+        if colors is not None:
+            self.cboCapacity = _rewrite_buffer(self.cbo, self.cboCapacity, colors, self.usage)
+        self.count = len(models)
+
+    def release(self):
+        """
+        Return the buffers to the resource pool.
+
+        :return:
+        """
+        if self.vbo == 0:
+            return
+        registry = resources.get_registry()
+        registry.release_buffer(self.vbo)
+        if self.cbo != 0:
+            registry.release_buffer(self.cbo)
+        self.vbo = 0
+        self.cbo = 0
+        self.count = 0
+        self.vboCapacity = 0
+        self.cboCapacity = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def _rewrite_buffer(buffer, capacity, data, usage):
+    """
+    Rewrite the whole content of a vertex buffer, orphaning the old storage.
+
+    :param buffer: Buffer name
+    :param capacity: Buffer capacity in bytes
+    :param data: Data
+    :param usage: Buffer usage
+    :return: New capacity
+    :rtype: int
+    """
+    if data.nbytes > capacity:
+        capacity = resources.capacity_class(data.nbytes)
+        resources.get_registry().resize_buffer(GL_ARRAY_BUFFER, buffer, capacity, usage)
+    else:
+        get_gl_state().bind_buffer(GL_ARRAY_BUFFER, buffer)
+        glBufferData(GL_ARRAY_BUFFER, capacity, None, usage)
+    glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+    return capacity
+
+
+def to_gpu_instances(models, colors=None, usage=GL_DYNAMIC_DRAW):
+    """
+    Upload the per-instance data of an instanced draw to GPU memory.
+
+    :param models: Model matrices (N, 4, 4)
+    :param colors: Colors (N, 3), if None instances are drawn with the shape colors
+    :param usage: Buffer usage, GL_STATIC_DRAW if instances do not move
+    :return: GPUInstances
+    """
+    models = np.ascontiguousarray(models, dtype=np.float32).reshape(-1, 16)
+    instances = GPUInstances()
+    instances.count = len(models)
+    instances.usage = usage
+    registry = resources.get_registry()
+    instances.vbo, instances.vboCapacity = registry.create_buffer(GL_ARRAY_BUFFER, models, usage)
+    if colors is not None:
+        colors = np.ascontiguousarray(colors, dtype=np.float32).reshape(-1, 3)
+        if len(colors) != len(models):
+            raise Exception('Number of colors does not match the number of models')
+        instances.cbo, instances.cboCapacity = registry.create_buffer(GL_ARRAY_BUFFER, colors, usage)
+    return instances
+
+
+def get_location_queries():
+    """
+    Return the number of attribute and uniform location queries sent to the driver.
+
+    :return: Number of queries
+    :rtype: int
+    """
+    return _LOCATION_QUERIES[0]
+
+
+def reset_location_queries():
+    """
+    Reset the location queries counter.
+
+    :return:
+    """
+    _LOCATION_QUERIES[0] = 0
+
+
+def _query_location(query, program, name):
+    """
+    Query an attribute or uniform location to the driver.
+
+    :param query: glGetAttribLocation or glGetUniformLocation
+    :param program: Shader program
+    :param name: Attribute or uniform name
+    :return: Location
+    :rtype: int
+    """
+    _LOCATION_QUERIES[0] += 1
+    return query(program, name)
+
+
+def _active_name(name):
+    """
+    Return the name of an active attribute or uniform as string. Arrays are
+    reported as "name[0]", the suffix is removed.
+
+    :param name: Name as returned by glGetActiveAttrib/glGetActiveUniform
+    :return:
+    :rtype: str
+    """
+    if isinstance(name, bytes):
+        name = name.decode()
+    if name.endswith('[0]'):
+        name = name[:-3]
+    return name
+
+
+class _ShaderProgram(object):
+    """
+    Base shader program. After compiling, the active attributes and uniforms are
+    introspected once and their locations are stored in a location table, so
+    drawing does not query the driver.
+    """
+
+    # Per-instance attributes, only used by instanced programs
+    keyInstanceModel = ''
+    keyInstanceColor = ''
+
+    def _compile(self, vertex_shader, fragment_shader):
+        """
+        Compile the program and build the location table.
+
+        :param vertex_shader: Vertex shader source
+        :param fragment_shader: Fragment shader source
+        :return:
+        """
+        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
+            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
+            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
 
-    # texture filtering params
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filter_mode)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filter_mode)
+        self.attribLocations = {}
+        for i in range(int(glGetProgramiv(self.shaderProgram, GL_ACTIVE_ATTRIBUTES))):
+            name = _active_name(glGetActiveAttrib(self.shaderProgram, i)[0])
+            self.attribLocations[name] = _query_location(glGetAttribLocation, self.shaderProgram, name)
+
+        self.uniformLocations = {}
+        for i in range(int(glGetProgramiv(self.shaderProgram, GL_ACTIVE_UNIFORMS))):
+            name = _active_name(glGetActiveUniform(self.shaderProgram, i)[0])
+            self.uniformLocations[name] = _query_location(glGetUniformLocation, self.shaderProgram, name)
+
+        # Camera and light data are read from the frame uniform buffer
+        block = glGetUniformBlockIndex(self.shaderProgram, 'FrameData')
+        if block != GL_INVALID_INDEX:
+            glUniformBlockBinding(self.shaderProgram, block, FRAME_UNIFORMS_BINDING)
+            get_frame_uniforms().bind()
+
+        self._build_layout()
+
+    def use(self):
+        """
+        Bind the program, the call is skipped if it is already bound.
+
+        :return:
+        """
+        get_gl_state().use_program(self.shaderProgram)
+
+    def set_uniform_matrix4(self, name, matrix):
+        """
+        Bind the program and upload a 4x4 matrix to an uniform, the upload is
+        skipped if the uniform already holds the matrix.
+
+        :param name: Uniform name
+        :param matrix: Row major matrix
+        :return:
+        """
+        self.use()
+        get_gl_state().uniform_matrix4(self.get_uniform_location(name), matrix)
+
+    def get_attrib_location(self, name):
+        """
+        Return the location of an attribute. Inactive attributes return -1.
+
+        :param name: Attribute name
+        :return: Location
+        :rtype: int
+        """
+        return self.attribLocations.get(name, -1)
+
+    def get_uniform_location(self, name):
+        """
+        Return the location of an uniform. Inactive uniforms return -1, so the
+        upload is silently ignored by OpenGL.
+
+        :param name: Uniform name
+        :return: Location
+        :rtype: int
+        """
+        return self.uniformLocations.get(name, -1)
+
+    def _build_layout(self):
+        """
+        Build the layout key, which identifies the attribute locations used by
+        the program. Programs sharing a layout can draw the same VAO.
+
+        :return:
+        """
+        self.layout = (
+            (shapes.VERTEX_POSITION, self.get_attrib_location(self.keyPosition)),
+            (shapes.VERTEX_COLOR, self.get_attrib_location(self.keyColor)),
+            (shapes.VERTEX_TEXTURE, self.get_attrib_location(self.keyTexture)),
+            (shapes.VERTEX_NORMAL, self.get_attrib_location(self.keyNormal))
+        )
+
+    def setup_vao(self, shape):
+        """
+        Record the attribute layout of the shape within its VAO, using the
+        attribute locations of this program. The VAO must be bound.
+
+        :param shape: GPUShape
+        :return:
+        """
+        assert isinstance(shape, GPUShape)
 
-    image = Image.open(img_name)
-    img_data = np.array(list(image.getdata()), np.uint8)
+        # Shapes without format store the vertices expected by the program
+        if shape.vertexFormat is None:
+            shape.vertexFormat = self.vertexFormat
+        vertex_format = shape.vertexFormat
+
+        get_gl_state().bind_buffer(GL_ARRAY_BUFFER, shape.vbo)
+        for location in shape.layoutLocations:
+            glDisableVertexAttribArray(location)
+
+        locations = dict(self.layout)
+        shape.layoutLocations = []
+        for attribute, components, offset in vertex_format.attributes:
+            location = locations.get(attribute, -1)
+            if location < 0:
+                continue
+            glVertexAttribPointer(location, components, GL_FLOAT, GL_FALSE, vertex_format.stride,
+                                  ctypes.c_void_p(offset))
+            glEnableVertexAttribArray(location)
+            if shape.instanceLayout is not None:
+                glVertexAttribDivisor(location, 0)
+            shape.layoutLocations.append(location)
+        shape.layout = self.layout
+        shape.instanceLayout = None
+
+    def setup_instances(self, shape, instances):
+        """
+        Record the per-instance attributes within the VAO of the shape. Each
+        model matrix takes four consecutive locations. The VAO must be bound.
+
+        :param shape: GPUShape
+        :param instances: GPUInstances
+        :return:
+        """
+        model_location = self.get_attrib_location(self.keyInstanceModel)
+        color_location = self.get_attrib_location(self.keyInstanceColor)
+
+        get_gl_state().bind_buffer(GL_ARRAY_BUFFER, instances.vbo)
+        for i in range(4):
+            glVertexAttribPointer(model_location + i, 4, GL_FLOAT, GL_FALSE, 16 * INT_BYTES,
+                                  ctypes.c_void_p(4 * INT_BYTES * i))
+            glVertexAttribDivisor(model_location + i, 1)
+            glEnableVertexAttribArray(model_location + i)
+            shape.layoutLocations.append(model_location + i)
+
+        if color_location >= 0:
+            if instances.cbo != 0:
+                get_gl_state().bind_buffer(GL_ARRAY_BUFFER, instances.cbo)
+                glVertexAttribPointer(color_location, 3, GL_FLOAT, GL_FALSE, 3 * INT_BYTES, ctypes.c_void_p(0))
+                glVertexAttribDivisor(color_location, 1)
+                glEnableVertexAttribArray(color_location)
+                shape.layoutLocations.append(color_location)
+            else:
+                glDisableVertexAttribArray(color_location)
+        shape.instanceLayout = (self.layout, instances.vbo, instances.cbo)
+
+    def draw_shape_instanced(self, shape, instances, mode=GL_TRIANGLES):
+        """
+        Draw all the instances of a shape with a single draw call. Requires an
+        instanced program.
+
+        :param shape: GPUShape
+        :param instances: GPUInstances
+        :param mode: Draw mode
+        :return:
+        """
+        assert isinstance(shape, GPUShape)
+        assert isinstance(instances, GPUInstances)
+        if self.get_attrib_location(self.keyInstanceModel) < 0:
+            raise Exception('Shader program does not support instancing')
 
-    # The image data is read with the rows reverted, this is fixed here.
-    img_data = img_data[-1:0:-1, :]
+        if shape.vao == 0 or instances.count == 0:
+            return
 
-    if image.mode == 'RGB':
-        internal_format = GL_RGB
-        formatf = GL_RGB
-    elif image.mode == 'RGBA':
-        internal_format = GL_RGBA
-        formatf = GL_RGBA
-    else:
-        print('Image mode not supported.')
-        raise Exception()
+        get_gl_state().bind_vertex_array(shape.vao)
+        if shape.layout != self.layout:
+            self.setup_vao(shape)
+        if shape.instanceLayout != (self.layout, instances.vbo, instances.cbo):
+            self.setup_instances(shape, instances)
+        if self.keyTexture != '':
+            get_gl_state().bind_texture(GL_TEXTURE_2D, shape.texture)
 
-    glTexImage2D(GL_TEXTURE_2D, 0, internal_format, image.size[0], image.size[1], 0, formatf, GL_UNSIGNED_BYTE,
-                 img_data)
+        # Instances without colors keep the shape colors
+        if instances.cbo == 0:
+            color_location = self.get_attrib_location(self.keyInstanceColor)
+            if color_location >= 0:
+                glVertexAttrib3f(color_location, 1.0, 1.0, 1.0)
 
+        glDrawElementsInstanced(mode, shape.size, shape.indexType, None, instances.count)
+
+    def draw_shape(self, shape, mode=GL_TRIANGLES):
+        """
+        Draw a shape. The VAO stores the buffers and attribute layout, these are
+        only recorded again if the shape was last configured by a program with
+        different attribute locations.
+
+        :param shape: GPUShape
+        :param mode: Draw mode
+        :return:
+        """
+        assert isinstance(shape, GPUShape)
 
-def to_gpu_shape(shape, wrap_mode=None, filter_mode=None):
+        # Placeholders of shapes still being loaded are not drawn
+        if shape.vao == 0:
+            return
+
+        get_gl_state().bind_vertex_array(shape.vao)
+        if shape.layout != self.layout:
+            self.setup_vao(shape)
+        if self.keyTexture != '':
+            get_gl_state().bind_texture(GL_TEXTURE_2D, shape.texture)
+
+        # Render the active element buffer with the active shader program
+        glDrawElements(mode, shape.size, shape.indexType, None)
+
+
+def to_gpu_shape(shape, wrap_mode=None, filter_mode=None, shader=None, usage=GL_STATIC_DRAW, gpu_shape=None,
+                 keep_triangles=False):
+    """
+    Upload a shape to GPU memory.
+
+    :param shape: Shape
+    :param wrap_mode: Texture wrap mode
+    :param filter_mode: Texture filter mode
+    :param shader: If provided, the attribute layout of the VAO is recorded against this program
+    :param usage: Vertex buffer usage, GL_DYNAMIC_DRAW or GL_STREAM_DRAW if vertices are updated
+    :param gpu_shape: If provided, the shape is uploaded into this empty GPUShape
+    :param keep_triangles: Keep the vertex positions and triangles on the CPU, required to pick the shape
+    :return: GPUShape
+    """
     assert isinstance(shape, shapes.Shape)
 
-    vertex_data = np.array(shape.vertices, dtype=np.float32)
-    indices = np.array(shape.indices, dtype=np.uint32)
+    # Shape data is already contiguous, it is handed to OpenGL without copies
+    vertex_data = shape.vertices
+    indices = shape.indices
 
     # Here the new shape will be stored
-    gpu_shape = GPUShape()
-
-    gpu_shape.size = len(shape.indices)
-    gpu_shape.vao = glGenVertexArrays(1)
-    gpu_shape.vbo = glGenBuffers(1)
-    gpu_shape.ebo = glGenBuffers(1)
+    if gpu_shape is None:
+        gpu_shape = GPUShape()
+    elif gpu_shape.vao != 0:
+        raise Exception('GPUShape has already been uploaded')
+
+    gpu_shape.size = len(indices)
+    gpu_shape.usage = usage
+    gpu_shape.vboSize = vertex_data.nbytes
+    if indices.dtype == np.uint16:
+        gpu_shape.indexType = GL_UNSIGNED_SHORT
+    gpu_shape.vertexFormat = shape.vertexFormat
+    gpu_shape.bounds = bounds.compute_bounds(vertex_data, shape.vertexFormat)
+    if keep_triangles:
+        if shape.vertexFormat is None:
+            raise Exception('Shape triangles can not be kept, the shape has no vertex format')
+        if shape.vertexFormat.get_offset(shapes.VERTEX_POSITION) != 0:
+            raise Exception('Shape triangles can not be kept, the vertex format must start with the position')
+        if len(indices) % 3 != 0:
+            raise Exception('Shape triangles can not be kept, the number of indices {0} is not a multiple of '
+                            '3'.format(len(indices)))
+        gpu_shape.cpuVertices = vertex_data.reshape(-1, shape.vertexFormat.components)[:, 0:3].copy()
+        gpu_shape.cpuIndices = indices.reshape(-1, 3).astype(np.int64)
+
+    # Buffers are created by the resource registry, which reuses released buffers
+    registry = resources.get_registry()
+    gpu_shape.vao = registry.create_vao()
+
+    # The VAO records the element buffer binding
+    get_gl_state().bind_vertex_array(gpu_shape.vao)
 
     # Vertex data must be attached to a Vertex Buffer Object (VBO)
-    glBindBuffer(GL_ARRAY_BUFFER, gpu_shape.vbo)
-    glBufferData(GL_ARRAY_BUFFER, len(vertex_data) * INT_BYTES, vertex_data, GL_STATIC_DRAW)
+    gpu_shape.vbo, gpu_shape.vboCapacity = registry.create_buffer(GL_ARRAY_BUFFER, vertex_data, usage)
 
     # Connections among vertices are stored in the Elements Buffer Object (EBO)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpu_shape.ebo)
-    glBufferData(GL_ELEMENT_ARRAY_BUFFER, len(indices) * INT_BYTES, indices, GL_STATIC_DRAW)
+    gpu_shape.ebo = registry.create_buffer(GL_ELEMENT_ARRAY_BUFFER, indices, GL_STATIC_DRAW)[0]
+
+    if shader is not None:
+        shader.setup_vao(gpu_shape)
+    get_gl_state().bind_vertex_array(0)
 
     if shape.textureFileName is not None:
         assert wrap_mode is not None and filter_mode is not None
 
-        gpu_shape.texture = glGenTextures(1)
-        texture_simple_setup(gpu_shape.texture, shape.textureFileName, wrap_mode, filter_mode)
+        # Shapes using the same image share the texture
+        gpu_shape.texture = textures.get_texture_manager().acquire(shape.textureFileName, wrap_mode, filter_mode)
 
     return gpu_shape
 
 
-class SimpleShaderProgram:
+class SimpleShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -148,33 +636,13 @@ class SimpleShaderProgram:
         self.keyModel = ''
         self.keyColor = 'color'
         self.keyTexture = ''
+        self.keyNormal = ''
         self.keyProjection = ''
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
+        self.vertexFormat = shapes.FORMAT_COLOR
+        self._compile(vertex_shader, fragment_shader)
 
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
 
-        # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, self.keyPosition)
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-
-        color = glGetAttribLocation(self.shaderProgram, self.keyColor)
-        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimpleTextureShaderProgram:
+class SimpleTextureShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -212,34 +680,13 @@ class SimpleTextureShaderProgram:
         self.keyModel = ''
         self.keyColor = ''
         self.keyTexture = 'texCoords'
+        self.keyNormal = ''
         self.keyProjection = ''
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-        glBindTexture(GL_TEXTURE_2D, shape.texture)
+        self.vertexFormat = shapes.FORMAT_TEXTURE
+        self._compile(vertex_shader, fragment_shader)
 
-        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, self.keyPosition)
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
 
-        tex_coords = glGetAttribLocation(self.shaderProgram, self.keyTexture)
-        glVertexAttribPointer(tex_coords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(tex_coords)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimpleTransformShaderProgram:
+class SimpleTransformShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -276,33 +723,13 @@ class SimpleTransformShaderProgram:
         self.keyModel = 'transform'
         self.keyColor = 'color'
         self.keyTexture = ''
+        self.keyNormal = ''
         self.keyProjection = ''
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-
-        # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, self.keyPosition)
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-
-        color = glGetAttribLocation(self.shaderProgram, self.keyColor)
-        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
+        self.vertexFormat = shapes.FORMAT_COLOR
+        self._compile(vertex_shader, fragment_shader)
 
 
-class SimpleTextureTransformShaderProgram:
+class SimpleTextureTransformShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -342,41 +769,18 @@ class SimpleTextureTransformShaderProgram:
         self.keyModel = 'transform'
         self.keyColor = ''
         self.keyTexture = 'texCoords'
+        self.keyNormal = ''
         self.keyProjection = ''
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.vertexFormat = shapes.FORMAT_TEXTURE
+        self._compile(vertex_shader, fragment_shader)
 
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-        glBindTexture(GL_TEXTURE_2D, shape.texture)
-
-        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, self.keyPosition)
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-
-        tex_coords = glGetAttribLocation(self.shaderProgram, self.keyTexture)
-        glVertexAttribPointer(tex_coords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(tex_coords)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
 
-
-class SimpleModelViewProjectionShaderProgram:
+class SimpleModelViewProjectionShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
-            #version 130
-            
-            uniform mat4 projection;
-            uniform mat4 view;
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
             uniform mat4 model;
 
             in vec3 position;
@@ -391,7 +795,7 @@ class SimpleModelViewProjectionShaderProgram:
             """
 
         fragment_shader = """
-            #version 130
+            #version 330 core
             in vec3 newColor;
 
             out vec4 outColor;
@@ -406,40 +810,18 @@ class SimpleModelViewProjectionShaderProgram:
         self.keyModel = 'model'
         self.keyColor = 'color'
         self.keyTexture = ''
+        self.keyNormal = ''
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
+        self.vertexFormat = shapes.FORMAT_COLOR
+        self._compile(vertex_shader, fragment_shader)
 
-        # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, self.keyPosition)
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
 
-        color = glGetAttribLocation(self.shaderProgram, self.keyColor)
-        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimpleTextureModelViewProjectionShaderProgram:
+class SimpleTextureModelViewProjectionShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
-            #version 130
-            
-            uniform mat4 projection;
-            uniform mat4 view;
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
             uniform mat4 model;
 
             in vec3 position;
@@ -455,7 +837,7 @@ class SimpleTextureModelViewProjectionShaderProgram:
             """
 
         fragment_shader = """
-            #version 130
+            #version 330 core
 
             uniform sampler2D samplerTex;
 
@@ -474,38 +856,18 @@ class SimpleTextureModelViewProjectionShaderProgram:
         self.keyModel = 'model'
         self.keyColor = ''
         self.keyTexture = 'texCoords'
+        self.keyNormal = ''
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-        glBindTexture(GL_TEXTURE_2D, shape.texture)
-
-        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, self.keyPosition)
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-
-        tex_coords = glGetAttribLocation(self.shaderProgram, self.keyTexture)
-        glVertexAttribPointer(tex_coords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(tex_coords)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
+        self.vertexFormat = shapes.FORMAT_TEXTURE
+        self._compile(vertex_shader, fragment_shader)
 
 
-class SimpleFlatShaderProgram:
+class SimpleFlatShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
             #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
             in vec3 aPos;
             in vec3 aColor;
             in vec3 aNormal;
@@ -513,17 +875,7 @@ class SimpleFlatShaderProgram:
             flat out vec4 Color;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
-
-            uniform vec3 lightPos; 
-            uniform vec3 viewPos; 
-            uniform vec3 lightColor;
-            uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
-            
+
             void main()
             {
                 vec3 vertexPos = vec3(model * vec4(aPos, 1.0));
@@ -570,46 +922,22 @@ class SimpleFlatShaderProgram:
             """
 
         self.keyView = 'view'
-        self.keyPosition = ''
+        self.keyPosition = 'aPos'
         self.keyModel = 'model'
-        self.keyColor = ''
+        self.keyColor = 'aColor'
         self.keyTexture = ''
+        self.keyNormal = 'aNormal'
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
+        self.vertexFormat = shapes.FORMAT_COLOR_NORMAL
+        self._compile(vertex_shader, fragment_shader)
 
-        # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, 'aPos')
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
 
-        color = glGetAttribLocation(self.shaderProgram, 'aColor')
-        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        normal = glGetAttribLocation(self.shaderProgram, 'aNormal')
-        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
-        glEnableVertexAttribArray(normal)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimpleTextureFlatShaderProgram:
+class SimpleTextureFlatShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
-            #version 130
-
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
             in vec3 aPos;
             in vec2 texCoords;
             in vec3 aNormal;
@@ -618,17 +946,7 @@ class SimpleTextureFlatShaderProgram:
             flat out vec4 finalLightColor;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
-
-            uniform vec3 lightPos; 
-            uniform vec3 viewPos; 
-            uniform vec3 lightColor;
-            uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
-            
+
             void main()
             {
                 vec3 vertexPos = vec3(model * vec4(aPos, 1.0));
@@ -666,7 +984,7 @@ class SimpleTextureFlatShaderProgram:
             """
 
         fragment_shader = """
-            #version 130
+            #version 330 core
 
             flat in vec4 finalLightColor;
             in vec2 outTexCoords;
@@ -683,46 +1001,22 @@ class SimpleTextureFlatShaderProgram:
             """
 
         self.keyView = 'view'
-        self.keyPosition = ''
+        self.keyPosition = 'aPos'
         self.keyModel = 'model'
         self.keyColor = ''
         self.keyTexture = 'texCoords'
+        self.keyNormal = 'aNormal'
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-
-        # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, 'aPos')
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-
-        color = glGetAttribLocation(self.shaderProgram, self.keyTexture)
-        glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        normal = glGetAttribLocation(self.shaderProgram, 'aNormal')
-        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
-        glEnableVertexAttribArray(normal)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
+        self.vertexFormat = shapes.FORMAT_TEXTURE_NORMAL
+        self._compile(vertex_shader, fragment_shader)
 
 
-class SimpleGouraudShaderProgram:
+class SimpleGouraudShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
-            #version 130
-
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
             in vec3 aPos;
             in vec3 aColor;
             in vec3 aNormal;
@@ -730,17 +1024,7 @@ class SimpleGouraudShaderProgram:
             out vec4 Color;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
-
-            uniform vec3 lightPos; 
-            uniform vec3 viewPos; 
-            uniform vec3 lightColor;
-            uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
-            
+
             void main()
             {
                 vec3 vertexPos = vec3(model * vec4(aPos, 1.0));
@@ -776,7 +1060,7 @@ class SimpleGouraudShaderProgram:
             """
 
         fragment_shader = """
-            #version 130
+            #version 330 core
 
             in vec4 Color;
             out vec4 FragColor;
@@ -788,46 +1072,22 @@ class SimpleGouraudShaderProgram:
             """
 
         self.keyView = 'view'
-        self.keyPosition = ''
+        self.keyPosition = 'aPos'
         self.keyModel = 'model'
-        self.keyColor = ''
+        self.keyColor = 'aColor'
         self.keyTexture = ''
+        self.keyNormal = 'aNormal'
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-
-        # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, 'aPos')
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-
-        color = glGetAttribLocation(self.shaderProgram, 'aColor')
-        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
+        self.vertexFormat = shapes.FORMAT_COLOR_NORMAL
+        self._compile(vertex_shader, fragment_shader)
 
-        normal = glGetAttribLocation(self.shaderProgram, 'aNormal')
-        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
-        glEnableVertexAttribArray(normal)
 
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimpleTextureGouraudShaderProgram:
+class SimpleTextureGouraudShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
-            #version 130
-
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
             in vec3 aPos;
             in vec2 texCoords;
             in vec3 aNormal;
@@ -836,17 +1096,7 @@ class SimpleTextureGouraudShaderProgram:
             out vec4 finalLightColor;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
-
-            uniform vec3 lightPos; 
-            uniform vec3 viewPos; 
-            uniform vec3 lightColor;
-            uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
-            
+
             void main()
             {
                 vec3 vertexPos = vec3(model * vec4(aPos, 1.0));
@@ -884,7 +1134,7 @@ class SimpleTextureGouraudShaderProgram:
             """
 
         fragment_shader = """
-            #version 130
+            #version 330 core
 
             in vec4 finalLightColor;
             in vec2 outTexCoords;
@@ -901,46 +1151,22 @@ class SimpleTextureGouraudShaderProgram:
             """
 
         self.keyView = 'view'
-        self.keyPosition = ''
+        self.keyPosition = 'aPos'
         self.keyModel = 'model'
         self.keyColor = ''
         self.keyTexture = 'texCoords'
+        self.keyNormal = 'aNormal'
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.vertexFormat = shapes.FORMAT_TEXTURE_NORMAL
+        self._compile(vertex_shader, fragment_shader)
 
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
-
-        # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, 'aPos')
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
 
-        color = glGetAttribLocation(self.shaderProgram, self.keyTexture)
-        glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        normal = glGetAttribLocation(self.shaderProgram, 'aNormal')
-        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
-        glEnableVertexAttribArray(normal)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimplePhongShaderProgram:
+class SimplePhongShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
             #version 330 core
-
+            """ + FRAME_UNIFORMS_BLOCK + """
             layout (location = 0) in vec3 aPos;
             layout (location = 1) in vec3 aColor;
             layout (location = 2) in vec3 aNormal;
@@ -950,8 +1176,6 @@ class SimplePhongShaderProgram:
             out vec3 Normal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
 
             void main()
             {
@@ -965,20 +1189,12 @@ class SimplePhongShaderProgram:
 
         fragment_shader = """
             #version 330 core
-
+            """ + FRAME_UNIFORMS_BLOCK + """
             out vec4 FragColor;
 
             in vec3 Normal;
             in vec3 FragPos;
             in vec3 Color;
-            
-            uniform vec3 lightPos; 
-            uniform vec3 viewPos; 
-            uniform vec3 lightColor;
-            uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             void main()
             {
@@ -1012,46 +1228,22 @@ class SimplePhongShaderProgram:
             """
 
         self.keyView = 'view'
-        self.keyPosition = ''
+        self.keyPosition = 'aPos'
         self.keyModel = 'model'
-        self.keyColor = ''
+        self.keyColor = 'aColor'
         self.keyTexture = ''
+        self.keyNormal = 'aNormal'
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
-
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
-
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
+        self.vertexFormat = shapes.FORMAT_COLOR_NORMAL
+        self._compile(vertex_shader, fragment_shader)
 
-        # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, 'aPos')
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
 
-        color = glGetAttribLocation(self.shaderProgram, 'aColor')
-        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(color)
-
-        normal = glGetAttribLocation(self.shaderProgram, 'aNormal')
-        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
-        glEnableVertexAttribArray(normal)
-
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
-
-
-class SimpleTexturePhongShaderProgram:
+class SimpleTexturePhongShaderProgram(_ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
             #version 330 core
-            
+            """ + FRAME_UNIFORMS_BLOCK + """
             in vec3 aPos;
             in vec2 texCoords;
             in vec3 aNormal;
@@ -1061,8 +1253,6 @@ class SimpleTexturePhongShaderProgram:
             out vec3 Normal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
 
             void main()
             {
@@ -1076,20 +1266,12 @@ class SimpleTexturePhongShaderProgram:
 
         fragment_shader = """
             #version 330 core
-
+            """ + FRAME_UNIFORMS_BLOCK + """
             in vec3 Normal;
             in vec3 FragPos;
             in vec2 outTexCoords;
 
             out vec4 FragColor;
-            
-            uniform vec3 lightPos; 
-            uniform vec3 viewPos; 
-            uniform vec3 lightColor;
-            uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             uniform sampler2D samplerTex;
 
@@ -1127,35 +1309,290 @@ class SimpleTexturePhongShaderProgram:
             """
 
         self.keyView = 'view'
-        self.keyPosition = ''
+        self.keyPosition = 'aPos'
         self.keyModel = 'model'
         self.keyColor = ''
         self.keyTexture = 'texCoords'
+        self.keyNormal = 'aNormal'
         self.keyProjection = 'projection'
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.vertexFormat = shapes.FORMAT_TEXTURE_NORMAL
+        self._compile(vertex_shader, fragment_shader)
 
-    def draw_shape(self, shape, mode=GL_TRIANGLES):
-        assert isinstance(shape, GPUShape)
 
-        # Binding the proper buffers
-        glBindVertexArray(shape.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, shape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, shape.ebo)
+class SimpleInstancedModelViewProjectionShaderProgram(_ShaderProgram):
+
+    def __init__(self):
+        vertex_shader = """
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
+            uniform mat4 model;
+
+            in vec3 position;
+            in vec3 color;
+            in mat4 instanceModel;
+            in vec3 instanceColor;
 
-        # 3d vertices + 2d texture coordinates + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
-        position = glGetAttribLocation(self.shaderProgram, 'aPos')
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
+            out vec3 newColor;
+            void main()
+            {
+                // Instance matrices are stored by rows, model places the shape within the instance
+                gl_Position = projection * view * transpose(instanceModel) * model * vec4(position, 1.0f);
+                newColor = color * instanceColor;
+            }
+            """
 
-        tex_coords = glGetAttribLocation(self.shaderProgram, self.keyTexture)
-        glVertexAttribPointer(tex_coords, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(tex_coords)
+        fragment_shader = """
+            #version 330 core
+            in vec3 newColor;
 
-        normal = glGetAttribLocation(self.shaderProgram, 'aNormal')
-        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
-        glEnableVertexAttribArray(normal)
+            out vec4 outColor;
+            void main()
+            {
+                outColor = vec4(newColor, 1.0f);
+            }
+            """
 
-        # Render the active element buffer with the active shader program
-        glDrawElements(mode, shape.size, GL_UNSIGNED_INT, None)
+        self.keyView = 'view'
+        self.keyPosition = 'position'
+        self.keyModel = 'model'
+        self.keyColor = 'color'
+        self.keyTexture = ''
+        self.keyNormal = ''
+        self.keyProjection = 'projection'
+        self.keyInstanceModel = 'instanceModel'
+        self.keyInstanceColor = 'instanceColor'
+        self.vertexFormat = shapes.FORMAT_COLOR
+        self._compile(vertex_shader, fragment_shader)
+
+
+class SimpleInstancedGouraudShaderProgram(_ShaderProgram):
+
+    def __init__(self):
+        vertex_shader = """
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
+            in vec3 aPos;
+            in vec3 aColor;
+            in vec3 aNormal;
+            in mat4 instanceModel;
+            in vec3 instanceColor;
+
+            out vec4 Color;
+
+            uniform mat4 model;
+
+            void main()
+            {
+                // Instance matrices are stored by rows, model places the shape within the instance
+                mat4 worldModel = transpose(instanceModel) * model;
+                vec3 vertexPos = vec3(worldModel * vec4(aPos, 1.0));
+                gl_Position = projection * view * vec4(vertexPos, 1.0);
+
+                // ambient
+                float ambientStrength = 0.3;
+                vec3 ambient = ambientStrength * lightColor;
+                
+                // diffuse 
+                vec3 norm = normalize(mat3(transpose(inverse(worldModel))) * aNormal);
+                vec3 toLight = lightPos - vertexPos;
+                vec3 lightDir = normalize(toLight);
+                float diff = max(dot(norm, lightDir), 0.0);
+                vec3 diffuse = diff * lightColor;
+                
+                // specular
+                float specularStrength = 0.5;
+                vec3 viewDir = normalize(viewPos - vertexPos);
+                vec3 reflectDir = reflect(-lightDir, norm);  
+                float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
+                vec3 specular = specularStrength * spec * lightColor;
+
+                // attenuation
+                float distToLight = length(toLight);
+                float attenuation = constantAttenuation
+                    + linearAttenuation * distToLight
+                    + quadraticAttenuation * distToLight * distToLight;
+                    
+                vec3 result = (ambient + diffuse + specular) * aColor * instanceColor / attenuation;
+                Color = vec4(result, 1.0);
+            }
+            """
+
+        fragment_shader = """
+            #version 330 core
+
+            in vec4 Color;
+            out vec4 FragColor;
+
+            void main()
+            {
+                FragColor = Color;
+            }
+            """
+
+        self.keyView = 'view'
+        self.keyPosition = 'aPos'
+        self.keyModel = 'model'
+        self.keyColor = 'aColor'
+        self.keyTexture = ''
+        self.keyNormal = 'aNormal'
+        self.keyProjection = 'projection'
+        self.keyInstanceModel = 'instanceModel'
+        self.keyInstanceColor = 'instanceColor'
+        self.vertexFormat = shapes.FORMAT_COLOR_NORMAL
+        self._compile(vertex_shader, fragment_shader)
+
+
+class SimpleInstancedPhongShaderProgram(_ShaderProgram):
+
+    def __init__(self):
+        vertex_shader = """
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
+            layout (location = 0) in vec3 aPos;
+            layout (location = 1) in vec3 aColor;
+            layout (location = 2) in vec3 aNormal;
+            layout (location = 3) in mat4 instanceModel;
+            layout (location = 7) in vec3 instanceColor;
+
+            out vec3 FragPos;
+            out vec3 Color;
+            out vec3 Normal;
+
+            uniform mat4 model;
+
+            void main()
+            {
+                // Instance matrices are stored by rows, model places the shape within the instance
+                mat4 worldModel = transpose(instanceModel) * model;
+                FragPos = vec3(worldModel * vec4(aPos, 1.0));
+                Color = aColor * instanceColor;
+                Normal = mat3(transpose(inverse(worldModel))) * aNormal;  
+                
+                gl_Position = projection * view * vec4(FragPos, 1.0);
+            }
+            """
+
+        fragment_shader = """
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
+            out vec4 FragColor;
+
+            in vec3 Normal;
+            in vec3 FragPos;
+            in vec3 Color;
+
+            void main()
+            {
+                // ambient
+                float ambientStrength = 0.3;
+                vec3 ambient = ambientStrength * lightColor;
+                
+                // diffuse 
+                vec3 norm = normalize(Normal);
+                vec3 toLight = lightPos - FragPos;
+                vec3 lightDir = normalize(toLight);
+                float diff = max(dot(norm, lightDir), 0.0);
+                vec3 diffuse = diff * lightColor;
+                
+                // specular
+                float specularStrength = 0.5;
+                vec3 viewDir = normalize(viewPos - FragPos);
+                vec3 reflectDir = reflect(-lightDir, norm);  
+                float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
+                vec3 specular = specularStrength * spec * lightColor;
+
+                // attenuation
+                float distToLight = length(toLight);
+                float attenuation = constantAttenuation
+                    + linearAttenuation * distToLight
+                    + quadraticAttenuation * distToLight * distToLight;
+                    
+                vec3 result = (ambient + diffuse + specular) * Color / attenuation;
+                FragColor = vec4(result, 1.0);
+            }
+            """
+
+        self.keyView = 'view'
+        self.keyPosition = 'aPos'
+        self.keyModel = 'model'
+        self.keyColor = 'aColor'
+        self.keyTexture = ''
+        self.keyNormal = 'aNormal'
+        self.keyProjection = 'projection'
+        self.keyInstanceModel = 'instanceModel'
+        self.keyInstanceColor = 'instanceColor'
+        self.vertexFormat = shapes.FORMAT_COLOR_NORMAL
+        self._compile(vertex_shader, fragment_shader)
+
+
+class SimpleIdShaderProgram(_ShaderProgram):
+    """
+    Writes an integer object id, used by the picking pass. Only the position is
+    read, so VAOs set up by other programs are drawn as they are if their
+    position attribute has the same location.
+    """
+
+    def __init__(self):
+        vertex_shader = """
+            #version 330 core
+            """ + FRAME_UNIFORMS_BLOCK + """
+            uniform mat4 model;
+
+            layout(location = 0) in vec3 position;
+
+            void main()
+            {
+                gl_Position = projection * view * model * vec4(position, 1.0f);
+            }
+            """
+
+        fragment_shader = """
+            #version 330 core
+            uniform uint objectId;
+
+            out uint outId;
+            void main()
+            {
+                outId = objectId;
+            }
+            """
+
+        self.keyView = 'view'
+        self.keyPosition = 'position'
+        self.keyModel = 'model'
+        self.keyColor = ''
+        self.keyTexture = ''
+        self.keyNormal = ''
+        self.keyProjection = 'projection'
+        self.keyObjectId = 'objectId'
+        self.vertexFormat = shapes.FORMAT_COLOR
+        self._compile(vertex_shader, fragment_shader)
+
+    def set_object_id(self, object_id):
+        """
+        Bind the program and set the id written by the next draws.
+
+        :param object_id: Object id, 0 is reserved for the background
+        :return:
+        """
+        self.use()
+        glUniform1ui(self.get_uniform_location(self.keyObjectId), object_id)
+
+    def draw_shape(self, shape, mode=GL_TRIANGLES):
+        """
+        Draw a shape, its VAO is only set up again if the position attribute is
+        at another location.
+
+        :param shape: GPUShape
+        :param mode: Draw mode
+        :return:
+        """
+        assert isinstance(shape, GPUShape)
+        if shape.vao == 0:
+            return
+        if shape.layout is None or dict(shape.layout).get(shapes.VERTEX_POSITION) != \
+                self.get_attrib_location(self.keyPosition):
+            super(SimpleIdShaderProgram, self).draw_shape(shape, mode)
+            return
+        get_gl_state().bind_vertex_array(shape.vao)
+        glDrawElements(mode, shape.size, shape.indexType, None)
@@ -0,0 +1,195 @@
+# coding=utf-8
+"""
+FRAME UNIFORMS
+Uniform buffer with the camera and light data of the frame, shared by all
+shader programs.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from OpenGL.GL import GL_DYNAMIC_DRAW as _GL_DYNAMIC_DRAW
+from OpenGL.GL import GL_UNIFORM_BUFFER as _GL_UNIFORM_BUFFER
+from OpenGL.GL import glBindBufferBase as _glBindBufferBase
+from OpenGL.GL import glBufferData as _glBufferData
+from OpenGL.GL import glBufferSubData as _glBufferSubData
+from OpenGL.GL import glGenBuffers as _glGenBuffers
+import numpy as _np
+
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+
+# Binding point of the frame uniform block
+FRAME_UNIFORMS_BINDING = 0
+
+# Uniform block declared by the shader programs. The members are global, so
+# the shaders read them as plain uniforms. Matrices are row major, as numpy.
+FRAME_UNIFORMS_BLOCK = """
+            layout (std140, row_major) uniform FrameData
+            {
+                mat4 projection;
+                mat4 view;
+                vec3 viewPos;
+                float shininess;
+                vec3 lightPos;
+                float constantAttenuation;
+                vec3 lightColor;
+                float linearAttenuation;
+                float quadraticAttenuation;
+            };
+"""
+
+# std140 offsets of the block members, in floats
+_FRAME_PROJECTION = 0
+_FRAME_VIEW = 16
+_FRAME_VIEW_POS = 32
+_FRAME_SHININESS = 35
+_FRAME_LIGHT_POS = 36
+_FRAME_CONSTANT_ATTENUATION = 39
+_FRAME_LIGHT_COLOR = 40
+_FRAME_LINEAR_ATTENUATION = 43
+_FRAME_QUADRATIC_ATTENUATION = 44
+_FRAME_FLOATS = 48  # Block size rounded to vec4
+
+
+class FrameUniforms(object):
+    """
+    Uniform buffer holding the frame camera and light data. Values are kept in
+    a host copy, and only the members that change are uploaded, so setting the
+    same matrices for every drawn object costs a comparison.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._ubo = 0
+        self._data = _np.zeros(_FRAME_FLOATS, dtype=_np.float32)
+        self._data[_FRAME_PROJECTION:_FRAME_PROJECTION + 16] = _np.identity(4).ravel()
+        self._data[_FRAME_VIEW:_FRAME_VIEW + 16] = _np.identity(4).ravel()
+        self._data[_FRAME_LIGHT_COLOR:_FRAME_LIGHT_COLOR + 3] = 1
+        self._data[_FRAME_SHININESS] = 100
+        self._data[_FRAME_CONSTANT_ATTENUATION] = 1
+        self._uploads = 0
+
+    def bind(self):
+        """
+        Create the buffer if required and bind it to the frame binding point.
+        Requires an OpenGL context.
+
+        :return:
+        """
+        if self._ubo == 0:
+            self._ubo = _glGenBuffers(1)
+            _get_gl_state().bind_buffer(_GL_UNIFORM_BUFFER, self._ubo)
+            _glBufferData(_GL_UNIFORM_BUFFER, self._data.nbytes, self._data, _GL_DYNAMIC_DRAW)
+        # Binding to the indexed point also binds the generic target
+        _get_gl_state().bind_buffer(_GL_UNIFORM_BUFFER, self._ubo)
+        _glBindBufferBase(_GL_UNIFORM_BUFFER, FRAME_UNIFORMS_BINDING, self._ubo)
+
+    def _set(self, offset, values):
+        """
+        Write values into the block, uploading them only if they changed.
+
+        :param offset: Offset in floats
+        :param values: Values
+        :return:
+        """
+        values = _np.asarray(values, dtype=_np.float32).ravel()
+        end = offset + len(values)
+        if _np.array_equal(self._data[offset:end], values):
+            return
+        self._data[offset:end] = values
+        if self._ubo == 0:
+            self.bind()
+            return
+        _get_gl_state().bind_buffer(_GL_UNIFORM_BUFFER, self._ubo)
+        _glBufferSubData(_GL_UNIFORM_BUFFER, offset * 4, values.nbytes, self._data[offset:end])
+        self._uploads += 1
+
+    def set_projection(self, projection):
+        """
+        Set the projection matrix.
+
+        :param projection: Projection matrix
+        :return:
+        """
+        self._set(_FRAME_PROJECTION, projection)
+
+    def set_view(self, view):
+        """
+        Set the view matrix, the view position is computed from it.
+
+        :param view: View matrix
+        :return:
+        """
+        view = _np.asarray(view, dtype=_np.float32)
+        if _np.array_equal(self._data[_FRAME_VIEW:_FRAME_VIEW + 16], view.ravel()):
+            return
+        self._set(_FRAME_VIEW, view)
+        self._set(_FRAME_VIEW_POS, _np.linalg.inv(view)[0:3, 3])
+
+    def set_light(self, position, color, shininess, constant_attenuation, linear_attenuation,
+                  quadratic_attenuation):
+        """
+        Set the light parameters.
+
+        :param position: Light position
+        :param color: Light color
+        :param shininess: Shininess
+        :param constant_attenuation: Constant attenuation
+        :param linear_attenuation: Linear attenuation
+        :param quadratic_attenuation: Quadratic attenuation
+        :return:
+        """
+        data = _np.empty(_FRAME_QUADRATIC_ATTENUATION - _FRAME_SHININESS + 1, dtype=_np.float32)
+        data[0] = shininess
+        data[_FRAME_LIGHT_POS - _FRAME_SHININESS:_FRAME_LIGHT_POS - _FRAME_SHININESS + 3] = position
+        data[_FRAME_CONSTANT_ATTENUATION - _FRAME_SHININESS] = constant_attenuation
+        data[_FRAME_LIGHT_COLOR - _FRAME_SHININESS:_FRAME_LIGHT_COLOR - _FRAME_SHININESS + 3] = color
+        data[_FRAME_LINEAR_ATTENUATION - _FRAME_SHININESS] = linear_attenuation
+        data[_FRAME_QUADRATIC_ATTENUATION - _FRAME_SHININESS] = quadratic_attenuation
+        self._set(_FRAME_SHININESS, data)
+
+    def get_uploads(self):
+        """
+        Return the number of uploads made to the buffer.
+
+        :return: Number of uploads
+        :rtype: int
+        """
+        return self._uploads
+
+
+_FRAME_UNIFORMS = FrameUniforms()
+
+
+def get_frame_uniforms():
+    """
+    Return the frame uniforms.
+
+    :return: Frame uniforms
+    :rtype: FrameUniforms
+    """
+    return _FRAME_UNIFORMS
@@ -0,0 +1,285 @@
+# coding=utf-8
+"""
+GL STATE
+Tracks the OpenGL state set by the toolbox, so redundant calls are skipped.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from OpenGL.GL import GL_ELEMENT_ARRAY_BUFFER as _GL_ELEMENT_ARRAY_BUFFER
+from OpenGL.GL import GL_FRONT_AND_BACK as _GL_FRONT_AND_BACK
+from OpenGL.GL import GL_TEXTURE0 as _GL_TEXTURE0
+from OpenGL.GL import GL_TRUE as _GL_TRUE
+from OpenGL.GL import glActiveTexture as _glActiveTexture
+from OpenGL.GL import glBindBuffer as _glBindBuffer
+from OpenGL.GL import glBindTexture as _glBindTexture
+from OpenGL.GL import glBindVertexArray as _glBindVertexArray
+from OpenGL.GL import glPolygonMode as _glPolygonMode
+from OpenGL.GL import glUniformMatrix4fv as _glUniformMatrix4fv
+from OpenGL.GL import glUseProgram as _glUseProgram
+import numpy as _np
+
+# Tracked calls
+_GL_STATE_CALLS = ('useProgram', 'bindVertexArray', 'bindBuffer', 'activeTexture', 'bindTexture', 'polygonMode',
+                   'uniformMatrix4')
+
+
+class GLState(object):
+    """
+    Shadow of the OpenGL state changed through the toolbox. Each call is only
+    sent to the driver if the value differs from the shadowed one, and the
+    issued and filtered calls are counted per frame.
+
+    The shadow is only valid while the tracked state is changed through this
+    object, invalidate must be called after changing it with direct OpenGL calls.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._program = None
+        self._vao = None
+        self._buffers = {}  # target: buffer
+        self._unit = None
+        self._textures = {}  # (unit, target): texture
+        self._polygonMode = None
+        self._uniforms = {}  # (program, location): value
+        self._uniformEqual = _np.empty((4, 4), dtype=bool)
+        self._frame = {}
+        self._lastFrame = {}
+        for call in _GL_STATE_CALLS:
+            self._frame[call] = [0, 0]
+            self._lastFrame[call] = [0, 0]
+
+    def _count(self, call, issued):
+        """
+        Count a call.
+
+        :param call: Call name
+        :param issued: True if the call was sent to the driver
+        :return:
+        """
+        if issued:
+            self._frame[call][0] += 1
+        else:
+            self._frame[call][1] += 1
+
+    def invalidate(self):
+        """
+        Forget the shadowed state, the next calls are always issued.
+
+        :return:
+        """
+        self._program = None
+        self._vao = None
+        self._buffers = {}
+        self._unit = None
+        self._textures = {}
+        self._polygonMode = None
+        self._uniforms = {}
+
+    def use_program(self, program):
+        """
+        Bind a shader program.
+
+        :param program: Program name
+        :return:
+        """
+        issued = self._program != program
+        if issued:
+            _glUseProgram(program)
+            self._program = program
+        self._count('useProgram', issued)
+
+    def bind_vertex_array(self, vao):
+        """
+        Bind a vertex array. The element buffer binding belongs to the vertex
+        array, so it is forgotten if the vertex array changes.
+
+        :param vao: Vertex array name
+        :return:
+        """
+        issued = self._vao != vao
+        if issued:
+            _glBindVertexArray(vao)
+            self._vao = vao
+            self._buffers.pop(_GL_ELEMENT_ARRAY_BUFFER, None)
+        self._count('bindVertexArray', issued)
+
+    def bind_buffer(self, target, buffer):
+        """
+        Bind a buffer.
+
+        :param target: Buffer target
+        :param buffer: Buffer name
+        :return:
+        """
+        issued = self._buffers.get(target) != buffer
+        if issued:
+            _glBindBuffer(target, buffer)
+            self._buffers[target] = buffer
+        self._count('bindBuffer', issued)
+
+    def active_texture(self, unit):
+        """
+        Select the active texture unit.
+
+        :param unit: Texture unit number, starting from 0
+        :return:
+        """
+        issued = self._unit != unit
+        if issued:
+            _glActiveTexture(_GL_TEXTURE0 + unit)
+            self._unit = unit
+        self._count('activeTexture', issued)
+
+    def bind_texture(self, target, texture, unit=0):
+        """
+        Bind a texture to a texture unit.
+
+        :param target: Texture target
+        :param texture: Texture name
+        :param unit: Texture unit number
+        :return:
+        """
+        key = (unit, target)
+        issued = self._textures.get(key) != texture
+        if issued:
+            self.active_texture(unit)
+            _glBindTexture(target, texture)
+            self._textures[key] = texture
+        self._count('bindTexture', issued)
+
+    def polygon_mode(self, mode):
+        """
+        Set the polygon mode of front and back faces.
+
+        :param mode: GL_FILL, GL_LINE or GL_POINT
+        :return:
+        """
+        issued = self._polygonMode != mode
+        if issued:
+            _glPolygonMode(_GL_FRONT_AND_BACK, mode)
+            self._polygonMode = mode
+        self._count('polygonMode', issued)
+
+    def uniform_matrix4(self, location, matrix):
+        """
+        Upload a 4x4 row major matrix to an uniform of the bound program. The
+        upload is skipped if the uniform already holds the same matrix.
+
+        :param location: Uniform location
+        :param matrix: Matrix
+        :return:
+        """
+        if location < 0:
+            return
+        key = (self._program, location)
+        value = self._uniforms.get(key)
+
+        # The comparison and the shadow copy reuse their buffers, so no array is allocated
+        issued = value is None or not _np.equal(value, matrix, out=self._uniformEqual).all()
+        if issued:
+            _glUniformMatrix4fv(location, 1, _GL_TRUE, matrix)
+            if value is None:
+                value = _np.empty((4, 4), dtype=_np.float32)
+                self._uniforms[key] = value
+            value[...] = matrix
+        self._count('uniformMatrix4', issued)
+
+    def forget_vertex_array(self, vao):
+        """
+        Forget a deleted vertex array, OpenGL unbinds it.
+
+        :param vao: Vertex array name
+        :return:
+        """
+        if self._vao == vao:
+            self._vao = 0
+            self._buffers.pop(_GL_ELEMENT_ARRAY_BUFFER, None)
+
+    def forget_buffer(self, buffer):
+        """
+        Forget a deleted buffer, OpenGL unbinds it from all the targets.
+
+        :param buffer: Buffer name
+        :return:
+        """
+        for target in list(self._buffers.keys()):
+            if self._buffers[target] == buffer:
+                self._buffers[target] = 0
+
+    def forget_texture(self, texture):
+        """
+        Forget a deleted texture, OpenGL unbinds it from all the texture units.
+
+        :param texture: Texture name
+        :return:
+        """
+        for key in list(self._textures.keys()):
+            if self._textures[key] == texture:
+                self._textures[key] = 0
+
+    def begin_frame(self):
+        """
+        Start a new frame, the counters of the previous frame are kept.
+
+        :return:
+        """
+        for call in _GL_STATE_CALLS:
+            self._lastFrame[call] = self._frame[call]
+            self._frame[call] = [0, 0]
+
+    def get_stats(self):
+        """
+        Return the issued and filtered calls of the last complete frame.
+
+        :return: Statistics, for each call a dict with issued and filtered counts, and the totals
+        :rtype: dict
+        """
+        stats = {}
+        issued, filtered = 0, 0
+        for call in _GL_STATE_CALLS:
+            stats[call] = {'issued': self._lastFrame[call][0], 'filtered': self._lastFrame[call][1]}
+            issued += self._lastFrame[call][0]
+            filtered += self._lastFrame[call][1]
+        stats['issued'] = issued
+        stats['filtered'] = filtered
+        return stats
+
+
+_GL_STATE = GLState()
+
+
+def get_gl_state():
+    """
+    Return the OpenGL state tracker.
+
+    :return: State tracker
+    :rtype: GLState
+    """
+    return _GL_STATE
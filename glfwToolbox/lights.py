@@ -28,11 +28,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from OpenGL.GL import glUseProgram as _glUseProgram
-from OpenGL.GL import glUniform3f as _glUniform3f
-from OpenGL.GL import glGetUniformLocation as _glGetUniformLocation
-from OpenGL.GL import glUniform1ui as _glUniform1ui
-from OpenGL.GL import glUniform1f as _glUniform1f
+from glfwToolbox.frame_uniforms import get_frame_uniforms as _get_frame_uniforms
 
 
 class Light(object):
@@ -41,7 +37,7 @@ class Light(object):
         """
         Constructor.
 
-        :param shader: Shader class
+        :param shader: Shader class, not required as all programs share the light data
         :param position: Light position
         :type position: list
         :param color: Color of the light
@@ -125,7 +121,8 @@ class Light(object):
 
     def set_shader(self, shader):
         """
-        Change the light shader.
+        Change the light shader. Programs share the light data, so the shader
+        is not required to place the light.
 
         :param shader: Shader program
         :return:
@@ -134,18 +131,12 @@ class Light(object):
 
     def place(self):
         """
-        Place light on engine.
+        Place light on engine. The light is written to the frame uniform buffer
+        read by all the programs.
 
         :return:
         """
-        if not self._enabled or self._shader is None:
+        if not self._enabled:
             return
-        _glUseProgram(self._shader.shaderProgram)
-        _glUniform3f(_glGetUniformLocation(self._shader.shaderProgram, 'lightColor'),
-                     self._color[0], self._color[1], self._color[2])
-        _glUniform3f(_glGetUniformLocation(self._shader.shaderProgram, 'lightPos'),
-                     self._position[0], self._position[1], self._position[2])
-        _glUniform1ui(_glGetUniformLocation(self._shader.shaderProgram, 'shininess'), self._shininess)
-        _glUniform1f(_glGetUniformLocation(self._shader.shaderProgram, 'constantAttenuation'), self._cAtt)
-        _glUniform1f(_glGetUniformLocation(self._shader.shaderProgram, 'linearAttenuation'), self._lAtt)
-        _glUniform1f(_glGetUniformLocation(self._shader.shaderProgram, 'quadraticAttenuation'), self._qAtt)
+        _get_frame_uniforms().set_light(self._position, self._color, self._shininess, self._cAtt, self._lAtt,
+                                        self._qAtt)
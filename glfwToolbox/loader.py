@@ -0,0 +1,284 @@
+# coding=utf-8
+"""
+LOADER
+Asynchronous shape loading, decoding runs on a thread pool and the uploads
+are done on the OpenGL thread.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+import queue as _queue
+import time as _time
+
+from OpenGL.GL import GL_STATIC_DRAW as _GL_STATIC_DRAW
+
+from glfwToolbox.easy_shaders import GPUShape as _GPUShape
+from glfwToolbox.easy_shaders import to_gpu_shape as _to_gpu_shape
+from glfwToolbox.shapes import Shape as _Shape
+from glfwToolbox.textures import decode_image as _decode_image
+from glfwToolbox.textures import get_texture_manager as _get_texture_manager
+
+# Constants
+_LOADER_MAX_PENDING = 16  # Default number of decoded shapes waiting to be uploaded
+_LOADER_TIME_BUDGET = 0.004  # Default seconds spent uploading each frame
+
+
+class LoadHandle(object):
+    """
+    Handle of a shape being loaded. The placeholder GPUShape can be drawn while
+    loading, it is filled once the shape is uploaded.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.gpuShape = _GPUShape()
+        self._done = False
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """
+        Return true if the shape has been uploaded or the loading failed.
+
+        :return: True if done
+        :rtype: bool
+        """
+        return self._done
+
+    def exception(self):
+        """
+        Return the exception raised while loading the shape.
+
+        :return: Exception, None if the loading succeeded or is not done
+        """
+        return self._exception
+
+    def result(self):
+        """
+        Return the uploaded GPUShape.
+
+        :return: GPUShape
+        :rtype: GPUShape
+        """
+        if not self._done:
+            raise Exception('Shape has not been uploaded yet')
+        if self._exception is not None:
+            raise self._exception
+        return self.gpuShape
+
+    def add_done_callback(self, fn):
+        """
+        Add a function called on the OpenGL thread with the handle once done.
+
+        :param fn: Function
+        :return:
+        """
+        if self._done:
+            fn(self)
+        else:
+            self._callbacks.append(fn)
+
+    def _finish(self, exception=None):
+        """
+        Mark the handle as done and run the callbacks.
+
+        :param exception: Exception raised while loading
+        :return:
+        """
+        self._done = True
+        self._exception = exception
+        for fn in self._callbacks:
+            fn(self)
+        self._callbacks = []
+
+
+def _check_texture_modes(shape, wrap_mode, filter_mode):
+    """
+    Check a textured shape is loaded with its texture modes.
+
+    :param shape: Shape
+    :param wrap_mode: Texture wrap mode
+    :param filter_mode: Texture filter mode
+    :return:
+    """
+    if shape.textureFileName is not None and (wrap_mode is None or filter_mode is None):
+        raise Exception('Shape texture {0} requires wrap_mode and filter_mode to be loaded'.format(
+            shape.textureFileName))
+
+
+class AsyncLoader(object):
+    """
+    Builds shapes and decodes their textures on a thread pool. The decoded data
+    is kept in a bounded queue, workers wait while the queue is full. Only
+    process_uploads, called once per frame on the OpenGL thread, touches the
+    context.
+    """
+
+    def __init__(self, max_workers=None, max_pending=_LOADER_MAX_PENDING):
+        """
+        Constructor.
+
+        :param max_workers: Number of worker threads, if None the executor default is used
+        :param max_pending: Number of decoded shapes waiting to be uploaded
+        """
+        self._executor = _ThreadPoolExecutor(max_workers=max_workers)
+        self._uploads = _queue.Queue(maxsize=max_pending)
+        self._loading = 0
+        self._closed = False
+
+    def load_shape(self, shape, wrap_mode=None, filter_mode=None, shader=None, usage=_GL_STATIC_DRAW):
+        """
+        Load a shape asynchronously.
+
+        :param shape: Shape, or a function returning a Shape that is called on a worker thread
+        :param wrap_mode: Texture wrap mode
+        :param filter_mode: Texture filter mode
+        :param shader: If provided, the attribute layout of the VAO is recorded against this program
+        :param usage: Vertex buffer usage
+        :return: Handle
+        :rtype: LoadHandle
+        """
+        if isinstance(shape, _Shape):
+            _check_texture_modes(shape, wrap_mode, filter_mode)
+        handle = LoadHandle()
+        self._loading += 1
+        self._executor.submit(self._decode, handle, shape, (wrap_mode, filter_mode, shader, usage))
+        return handle
+
+    def _decode(self, handle, shape, options):
+        """
+        Build the shape and decode its texture, runs on a worker thread.
+
+        :param handle: Handle
+        :param shape: Shape or function
+        :param options: Upload options
+        :return:
+        """
+        if self._closed:
+            return
+        image = None
+        try:
+            if not isinstance(shape, _Shape):
+                shape = shape()
+            if not isinstance(shape, _Shape):
+                raise Exception('Loaded object is not a Shape instance')
+            _check_texture_modes(shape, options[0], options[1])
+            if shape.textureFileName is not None and \
+                    not _get_texture_manager().has(shape.textureFileName, options[0], options[1]):
+                image = _decode_image(shape.textureFileName)
+        except Exception as e:
+            self._put((handle, None, None, options, e))
+            return
+        self._put((handle, shape, image, options, None))
+
+    def _put(self, item):
+        """
+        Add an item to the upload queue, waits while the queue is full.
+
+        :param item: Upload item
+        :return:
+        """
+        while not self._closed:
+            try:
+                self._uploads.put(item, timeout=0.1)
+                return
+            except _queue.Full:
+                pass
+
+    def process_uploads(self, time_budget=_LOADER_TIME_BUDGET):
+        """
+        Upload decoded shapes until the time budget is spent, at least one shape
+        is uploaded if available. Must be called on the OpenGL thread.
+
+        :param time_budget: Seconds
+        :return: Number of handles finished
+        :rtype: int
+        """
+        t0 = _time.perf_counter()
+        finished = 0
+        while finished == 0 or _time.perf_counter() - t0 < time_budget:
+            try:
+                handle, shape, image, options, exception = self._uploads.get_nowait()
+            except _queue.Empty:
+                break
+            self._loading -= 1
+            finished += 1
+            if exception is None:
+                try:
+                    self._upload(handle, shape, image, options)
+                except Exception as e:
+                    exception = e
+            handle._finish(exception)
+        return finished
+
+    @staticmethod
+    def _upload(handle, shape, image, options):
+        """
+        Upload a decoded shape into the placeholder of the handle.
+
+        :param handle: Handle
+        :param shape: Shape
+        :param image: Decoded texture, None if cached or not textured
+        :param options: Upload options
+        :return:
+        """
+        wrap_mode, filter_mode, shader, usage = options
+        manager = _get_texture_manager()
+        texture = 0
+        if image is not None:
+            # The texture is cached, so the shape takes it without decoding again
+            texture = manager.acquire(shape.textureFileName, wrap_mode, filter_mode, image)
+        try:
+            _to_gpu_shape(shape, wrap_mode, filter_mode, shader, usage, handle.gpuShape)
+        finally:
+            if texture != 0:
+                manager.release(texture)
+
+    def get_pending(self):
+        """
+        Return the number of shapes being decoded or waiting to be uploaded.
+
+        :return: Number of shapes
+        :rtype: int
+        """
+        return self._loading
+
+    def shutdown(self):
+        """
+        Stop the worker threads, shapes not uploaded are discarded.
+
+        :return:
+        """
+        self._closed = True
+        while True:
+            try:
+                self._uploads.get_nowait()
+            except _queue.Empty:
+                break
+        self._executor.shutdown(wait=False)
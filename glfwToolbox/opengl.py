@@ -34,6 +34,8 @@ from __future__ import print_function
 # noinspection PyPep8Naming
 import OpenGL.GL as _gl
 
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+
 # Constants
 _OPENGL_DEFAULT_AMBIENT_COLOR = [0.2, 0.2, 0.2, 1.0]
 _OPENGL_DEFAULT_BGCOLOR = [0.0, 0.0, 0.0, 1.0]
@@ -183,7 +185,7 @@ def init_gl(antialiasing=True, bgcolor=None, bgdepth=_OPENGL_DEFAULT_BGDEPTH, de
     # Polygon fill mode
     if polyfonfillmode:
         log('Enabled polygoon fill by both sides')
-        _gl.glPolygonMode(_gl.GL_FRONT_AND_BACK, _gl.GL_FILL)
+        _get_gl_state().polygon_mode(_gl.GL_FILL)
 
     # Enable color material
     if materialcolor:
@@ -0,0 +1,424 @@
+# coding=utf-8
+"""
+PICKING
+Offscreen picking pass, objects are drawn with integer ids and the id under
+the cursor is read back asynchronously.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from OpenGL.GL import GL_ALREADY_SIGNALED as _GL_ALREADY_SIGNALED
+from OpenGL.GL import GL_COLOR as _GL_COLOR
+from OpenGL.GL import GL_COLOR_ATTACHMENT0 as _GL_COLOR_ATTACHMENT0
+from OpenGL.GL import GL_CONDITION_SATISFIED as _GL_CONDITION_SATISFIED
+from OpenGL.GL import GL_DEPTH_ATTACHMENT as _GL_DEPTH_ATTACHMENT
+from OpenGL.GL import GL_DEPTH_BUFFER_BIT as _GL_DEPTH_BUFFER_BIT
+from OpenGL.GL import GL_DEPTH_COMPONENT24 as _GL_DEPTH_COMPONENT24
+from OpenGL.GL import GL_DEPTH_TEST as _GL_DEPTH_TEST
+from OpenGL.GL import GL_FRAMEBUFFER as _GL_FRAMEBUFFER
+from OpenGL.GL import GL_FRAMEBUFFER_BINDING as _GL_FRAMEBUFFER_BINDING
+from OpenGL.GL import GL_FRAMEBUFFER_COMPLETE as _GL_FRAMEBUFFER_COMPLETE
+from OpenGL.GL import GL_PIXEL_PACK_BUFFER as _GL_PIXEL_PACK_BUFFER
+from OpenGL.GL import GL_R32UI as _GL_R32UI
+from OpenGL.GL import GL_RED_INTEGER as _GL_RED_INTEGER
+from OpenGL.GL import GL_RENDERBUFFER as _GL_RENDERBUFFER
+from OpenGL.GL import GL_SCISSOR_TEST as _GL_SCISSOR_TEST
+from OpenGL.GL import GL_STREAM_READ as _GL_STREAM_READ
+from OpenGL.GL import GL_SYNC_FLUSH_COMMANDS_BIT as _GL_SYNC_FLUSH_COMMANDS_BIT
+from OpenGL.GL import GL_SYNC_GPU_COMMANDS_COMPLETE as _GL_SYNC_GPU_COMMANDS_COMPLETE
+from OpenGL.GL import GL_TRIANGLES as _GL_TRIANGLES
+from OpenGL.GL import GL_UNSIGNED_INT as _GL_UNSIGNED_INT
+from OpenGL.GL import GL_VIEWPORT as _GL_VIEWPORT
+from OpenGL.GL import glBindFramebuffer as _glBindFramebuffer
+from OpenGL.GL import glBindRenderbuffer as _glBindRenderbuffer
+from OpenGL.GL import glBufferData as _glBufferData
+from OpenGL.GL import glCheckFramebufferStatus as _glCheckFramebufferStatus
+from OpenGL.GL import glClear as _glClear
+from OpenGL.GL import glClearBufferuiv as _glClearBufferuiv
+from OpenGL.GL import glClientWaitSync as _glClientWaitSync
+from OpenGL.GL import glDeleteBuffers as _glDeleteBuffers
+from OpenGL.GL import glDeleteFramebuffers as _glDeleteFramebuffers
+from OpenGL.GL import glDeleteRenderbuffers as _glDeleteRenderbuffers
+from OpenGL.GL import glDeleteSync as _glDeleteSync
+from OpenGL.GL import glDisable as _glDisable
+from OpenGL.GL import glEnable as _glEnable
+from OpenGL.GL import glFenceSync as _glFenceSync
+from OpenGL.GL import glFramebufferRenderbuffer as _glFramebufferRenderbuffer
+from OpenGL.GL import glGenBuffers as _glGenBuffers
+from OpenGL.GL import glGenFramebuffers as _glGenFramebuffers
+from OpenGL.GL import glGenRenderbuffers as _glGenRenderbuffers
+from OpenGL.GL import glGetBufferSubData as _glGetBufferSubData
+from OpenGL.GL import glGetIntegerv as _glGetIntegerv
+from OpenGL.GL import glIsEnabled as _glIsEnabled
+from OpenGL.GL import glReadPixels as _glReadPixels
+from OpenGL.GL import glRenderbufferStorage as _glRenderbufferStorage
+from OpenGL.GL import glScissor as _glScissor
+from OpenGL.GL import glViewport as _glViewport
+import ctypes as _ctypes
+import numpy as _np
+import time as _time
+
+from glfwToolbox.easy_shaders import SimpleIdShaderProgram as _SimpleIdShaderProgram
+from glfwToolbox.frame_uniforms import get_frame_uniforms as _get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+import glfwToolbox.transformations as _tr
+
+# Number of pixel buffers, readbacks older than this are still in flight when a new one is requested
+_PICKING_BUFFERS = 3
+
+
+class PickResult(object):
+    """
+    Object found under the cursor by a picking pass.
+    """
+
+    def __init__(self, object_id, obj, x, y, frames, milliseconds):
+        """
+        Constructor.
+
+        :param object_id: Id read back, 0 if there was no object
+        :param obj: Object drawn with the id, None if there was no object
+        :param x: Cursor x position of the request
+        :param y: Cursor y position of the request
+        :param frames: Frames between the request and the readback
+        :param milliseconds: Time between the request and the readback
+        """
+        self.id = object_id
+        self.object = obj
+        self.x = x
+        self.y = y
+        self.frames = frames
+        self.milliseconds = milliseconds
+
+    def __repr__(self):
+        return 'PickResult(id={0}, object={1}, frames={2}, milliseconds={3:.3f})'.format(
+            self.id, getattr(self.object, 'name', self.object), self.frames, self.milliseconds)
+
+
+class GPUPicker(object):
+    """
+    Picking pass. Each frame the objects are drawn into an offscreen integer
+    framebuffer, only within a small rectangle around the cursor, and the
+    rectangle is copied to a pixel buffer. The copy is fenced and read back in
+    a later frame, when the GPU has finished it, so the CPU never waits for
+    glReadPixels.
+
+    Usage, within the main loop::
+
+        picker.begin(x, y, view, projection)
+        picker.draw_advanced_shape(shape)
+        picker.draw_scene_graph(compiled_graph)
+        picker.end()
+        result = picker.poll()
+    """
+
+    def __init__(self, width, height, radius=2):
+        """
+        Constructor.
+
+        :param width: Window width in pixels
+        :param height: Window height in pixels
+        :param radius: Half size of the rectangle read around the cursor, in pixels
+        """
+        self._width = 0
+        self._height = 0
+        self._radius = int(radius)
+        self._fbo = 0
+        self._colorRbo = 0
+        self._depthRbo = 0
+        self._shader = _SimpleIdShaderProgram()
+
+        # Pixel buffers, each one is free or holds a request
+        size = (2 * self._radius + 1) ** 2 * 4
+        self._pbos = []
+        for _ in range(_PICKING_BUFFERS):
+            pbo = _glGenBuffers(1)
+            _get_gl_state().bind_buffer(_GL_PIXEL_PACK_BUFFER, pbo)
+            _glBufferData(_GL_PIXEL_PACK_BUFFER, size, None, _GL_STREAM_READ)
+            self._pbos.append(pbo)
+        _get_gl_state().bind_buffer(_GL_PIXEL_PACK_BUFFER, 0)
+        self._free = list(self._pbos)
+        self._pending = []  # [pbo, fence, frame, time, objects, x, y, width, height]
+
+        self._frame = 0
+        self._objects = [None]  # Objects of the current pass by id
+        self._rect = None
+        self._restore = None  # Framebuffer, viewport and scissor test to restore after the pass
+        self._result = None
+        self._stats = {
+            'requests': 0,
+            'completed': 0,
+            'dropped': 0,
+            'latencyFrames': 0,
+            'latencyMilliseconds': 0.0,
+            'averageMilliseconds': 0.0
+        }
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        """
+        Resize the framebuffer, call when the window is resized.
+
+        :param width: Window width in pixels
+        :param height: Window height in pixels
+        :return:
+        """
+        width, height = int(width), int(height)
+        if width == self._width and height == self._height:
+            return
+        self._release_framebuffer()
+        self._width, self._height = width, height
+
+        self._colorRbo = _glGenRenderbuffers(1)
+        _glBindRenderbuffer(_GL_RENDERBUFFER, self._colorRbo)
+        _glRenderbufferStorage(_GL_RENDERBUFFER, _GL_R32UI, width, height)
+        self._depthRbo = _glGenRenderbuffers(1)
+        _glBindRenderbuffer(_GL_RENDERBUFFER, self._depthRbo)
+        _glRenderbufferStorage(_GL_RENDERBUFFER, _GL_DEPTH_COMPONENT24, width, height)
+        _glBindRenderbuffer(_GL_RENDERBUFFER, 0)
+
+        previous = int(_glGetIntegerv(_GL_FRAMEBUFFER_BINDING))
+        self._fbo = _glGenFramebuffers(1)
+        _glBindFramebuffer(_GL_FRAMEBUFFER, self._fbo)
+        _glFramebufferRenderbuffer(_GL_FRAMEBUFFER, _GL_COLOR_ATTACHMENT0, _GL_RENDERBUFFER, self._colorRbo)
+        _glFramebufferRenderbuffer(_GL_FRAMEBUFFER, _GL_DEPTH_ATTACHMENT, _GL_RENDERBUFFER, self._depthRbo)
+        status = _glCheckFramebufferStatus(_GL_FRAMEBUFFER)
+        _glBindFramebuffer(_GL_FRAMEBUFFER, previous)
+        if status != _GL_FRAMEBUFFER_COMPLETE:
+            raise Exception('Picking framebuffer is not complete, status {0}'.format(status))
+
+    def _release_framebuffer(self):
+        """
+        Delete the framebuffer and its renderbuffers.
+
+        :return:
+        """
+        if self._fbo != 0:
+            _glDeleteFramebuffers(1, [self._fbo])
+            _glDeleteRenderbuffers(2, [self._colorRbo, self._depthRbo])
+        self._fbo = 0
+        self._colorRbo = 0
+        self._depthRbo = 0
+
+    def begin(self, x, y, view=None, projection=None):
+        """
+        Start a picking pass. Only the rectangle around the cursor is cleared
+        and drawn.
+
+        :param x: Cursor x position in window pixels, from the left
+        :param y: Cursor y position in window pixels, from the top as reported by GLFW
+        :param view: View matrix, if None the current one is kept
+        :param projection: Projection matrix, if None the current one is kept
+        :return:
+        """
+        self._frame += 1
+        self._objects = [None]
+
+        # OpenGL rows start at the bottom of the window
+        r = self._radius
+        x0 = min(max(int(x) - r, 0), self._width - 1)
+        y0 = min(max(self._height - 1 - int(y) - r, 0), self._height - 1)
+        self._rect = (x0, y0, min(2 * r + 1, self._width - x0), min(2 * r + 1, self._height - y0), x, y)
+
+        self._restore = (int(_glGetIntegerv(_GL_FRAMEBUFFER_BINDING)), _glGetIntegerv(_GL_VIEWPORT),
+                         _glIsEnabled(_GL_SCISSOR_TEST), _glIsEnabled(_GL_DEPTH_TEST))
+        _glBindFramebuffer(_GL_FRAMEBUFFER, self._fbo)
+        _glViewport(0, 0, self._width, self._height)
+        _glEnable(_GL_SCISSOR_TEST)
+        _glScissor(*self._rect[0:4])
+        _glEnable(_GL_DEPTH_TEST)
+        _glClearBufferuiv(_GL_COLOR, 0, _np.zeros(4, dtype=_np.uint32))
+        _glClear(_GL_DEPTH_BUFFER_BIT)
+
+        frame = _get_frame_uniforms()
+        if view is not None:
+            frame.set_view(view)
+        if projection is not None:
+            frame.set_projection(projection)
+
+    def _add_object(self, obj):
+        """
+        Assign the next id to an object and select it in the program.
+
+        :param obj: Object
+        :return: Id
+        :rtype: int
+        """
+        self._objects.append(obj)
+        object_id = len(self._objects) - 1
+        self._shader.set_object_id(object_id)
+        return object_id
+
+    def draw_shape(self, shape, model=_tr.identity(), obj=None, mode=_GL_TRIANGLES):
+        """
+        Draw a GPUShape.
+
+        :param shape: GPUShape
+        :param model: Model matrix
+        :param obj: Object reported when picked, the shape if None
+        :param mode: Draw mode
+        :return: Id
+        :rtype: int
+        """
+        object_id = self._add_object(shape if obj is None else obj)
+        self._shader.set_uniform_matrix4(self._shader.keyModel, model)
+        self._shader.draw_shape(shape, mode)
+        return object_id
+
+    def draw_advanced_shape(self, shape, obj=None, frustum=None):
+        """
+        Draw an AdvancedGPUShape.
+
+        :param shape: AdvancedGPUShape
+        :param obj: Object reported when picked, the shape if None
+        :param frustum: bounds.Frustum, if given the shapes outside of it are not drawn
+        :return: Id
+        :rtype: int
+        """
+        object_id = self._add_object(shape if obj is None else obj)
+        shape.draw(shader=self._shader, frustum=frustum)
+        return object_id
+
+    def draw_scene_graph(self, graph, parent_transform=_tr.identity()):
+        """
+        Draw the leaves of a compiled scene graph, each leaf node gets its own
+        id. The world transforms computed for drawing are reused.
+
+        :param graph: CompiledSceneGraph
+        :param parent_transform: Transform applied to the whole graph
+        :return:
+        """
+        graph.update(parent_transform)
+        location = self._shader.get_uniform_location(self._shader.keyModel)
+        for node, leaf, world in graph.get_leaves():
+            self._add_object(node)
+            _get_gl_state().uniform_matrix4(location, world)
+            self._shader.draw_shape(leaf)
+
+    def end(self):
+        """
+        Finish the pass, the rectangle around the cursor is copied to a pixel
+        buffer. If all the buffers are still in flight the request is dropped,
+        so the pass never waits for the GPU.
+
+        :return:
+        """
+        previous, viewport, scissor, depth = self._restore
+        if len(self._free) > 0:
+            x0, y0, w, h, x, y = self._rect
+            pbo = self._free.pop(0)
+            _get_gl_state().bind_buffer(_GL_PIXEL_PACK_BUFFER, pbo)
+            _glReadPixels(x0, y0, w, h, _GL_RED_INTEGER, _GL_UNSIGNED_INT, _ctypes.c_void_p(0))
+            _get_gl_state().bind_buffer(_GL_PIXEL_PACK_BUFFER, 0)
+            fence = _glFenceSync(_GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+            self._pending.append([pbo, fence, self._frame, _time.perf_counter(), self._objects, x, y, w, h])
+            self._stats['requests'] += 1
+        else:
+            self._stats['dropped'] += 1
+
+        _glBindFramebuffer(_GL_FRAMEBUFFER, previous)
+        _glViewport(*[int(i) for i in viewport])
+        if not scissor:
+            _glDisable(_GL_SCISSOR_TEST)
+        if not depth:
+            _glDisable(_GL_DEPTH_TEST)
+
+    def poll(self):
+        """
+        Read back the requests the GPU has finished, without waiting.
+
+        :return: Newest result read back, None if no request finished
+        :rtype: PickResult
+        """
+        result = None
+        while len(self._pending) > 0:
+            pbo, fence, frame, start, objects, x, y, w, h = self._pending[0]
+            status = _glClientWaitSync(fence, _GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+            if status != _GL_ALREADY_SIGNALED and status != _GL_CONDITION_SATISFIED:
+                break
+            self._pending.pop(0)
+            _glDeleteSync(fence)
+            _get_gl_state().bind_buffer(_GL_PIXEL_PACK_BUFFER, pbo)
+            ids = _np.frombuffer(_glGetBufferSubData(_GL_PIXEL_PACK_BUFFER, 0, w * h * 4),
+                                 dtype=_np.uint32).reshape(h, w)
+            _get_gl_state().bind_buffer(_GL_PIXEL_PACK_BUFFER, 0)
+            self._free.append(pbo)
+
+            # The id nearest to the center of the rectangle
+            object_id = 0
+            rows, cols = _np.nonzero(ids)
+            if len(rows) > 0:
+                distance = (rows - h // 2) ** 2 + (cols - w // 2) ** 2
+                i = int(_np.argmin(distance))
+                object_id = int(ids[rows[i], cols[i]])
+            obj = objects[object_id] if object_id < len(objects) else None
+            result = PickResult(object_id, obj, x, y, self._frame - frame, 1000 * (_time.perf_counter() - start))
+            self._stats['completed'] += 1
+            self._stats['latencyFrames'] = result.frames
+            self._stats['latencyMilliseconds'] = result.milliseconds
+            self._stats['averageMilliseconds'] += (result.milliseconds - self._stats['averageMilliseconds']) / \
+                self._stats['completed']
+        if result is not None:
+            self._result = result
+        return result
+
+    def get_result(self):
+        """
+        Return the newest result read back.
+
+        :return: Result, None if no request has finished yet
+        :rtype: PickResult
+        """
+        return self._result
+
+    def get_stats(self):
+        """
+        Return the number of requests, completed and dropped, the latency of
+        the last readback in frames and milliseconds, and the average latency.
+
+        :return: Statistics
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        stats['pending'] = len(self._pending)
+        return stats
+
+    def release(self):
+        """
+        Release the GPU resources.
+
+        :return:
+        """
+        for request in self._pending:
+            _glDeleteSync(request[1])
+        self._pending = []
+        if len(self._pbos) > 0:
+            for pbo in self._pbos:
+                _get_gl_state().forget_buffer(pbo)
+            _glDeleteBuffers(len(self._pbos), self._pbos)
+        self._pbos = []
+        self._free = []
+        self._release_framebuffer()
@@ -0,0 +1,330 @@
+# coding=utf-8
+"""
+QUATERNION
+Unit quaternions for rotations. Quaternions are arrays of shape (4,) stored as
+(x, y, z, w), and every function also works on stacks of shape (N, 4).
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+import numpy as np
+
+# Dot product above which slerp falls back to nlerp, the angle is too small to divide by its sine
+_SLERP_THRESHOLD = 0.9995
+
+
+def _empty(shape, out):
+    """
+    Return the output array, allocating it if not given.
+
+    :param shape: Shape
+    :param out: Output array or None
+    :return:
+    """
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    return out
+
+
+def identity(n=None):
+    """
+    Identity quaternion.
+
+    :param n: If given, a stack of n identity quaternions of shape (n, 4) is returned
+    :return:
+    """
+    q = np.zeros((4,) if n is None else (n, 4), dtype=np.float32)
+    q[..., 3] = 1
+    return q
+
+
+def from_axis_angle(theta, axis, out=None):
+    """
+    Rotation around axis, same as transformations.rotation_a.
+
+    :param theta: Angle in radians, scalar or array of shape (N,)
+    :param axis: Unit axis of shape (3,) or (N, 3)
+    :param out: Output quaternion, written in place
+    :return:
+    """
+    half = np.asarray(theta) * 0.5
+    axis = np.asarray(axis)
+    out = _empty(np.broadcast_shapes(half.shape, axis.shape[:-1]) + (4,), out)
+    out[..., 0:3] = axis * np.sin(half)[..., None]
+    out[..., 3] = np.cos(half)
+    return out
+
+
+def to_axis_angle(q):
+    """
+    Angle and axis of a rotation. The axis of the identity is x.
+
+    :param q: Unit quaternion
+    :return: Angle in radians and unit axis
+    :rtype: tuple
+    """
+    q = np.asarray(q, dtype=np.float32)
+    w = np.clip(q[..., 3], -1, 1)
+    theta = 2 * np.arccos(w)
+    s = np.sqrt(1 - w * w)[..., None]
+    small = s < 1e-6
+    axis = np.where(small, np.array([1, 0, 0], dtype=np.float32), q[..., 0:3] / np.where(small, 1, s))
+    return theta, axis
+
+
+def multiply(a, b, out=None):
+    """
+    Hamilton product, the rotation b followed by a. Same as the product of
+    the rotation matrices of a and b.
+
+    :param a: Quaternion
+    :param b: Quaternion
+    :param out: Output quaternion, written in place, may be a or b
+    :return:
+
+    >>> multiply([0, 0, 0, 1], (0, 0, 1, 0)).tolist()
+    [0.0, 0.0, 1.0, 0.0]
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    ax, ay, az, aw = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bx, by, bz, bw = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    x = aw * bx + ax * bw + ay * bz - az * by
+    y = aw * by - ax * bz + ay * bw + az * bx
+    z = aw * bz + ax * by - ay * bx + az * bw
+    w = aw * bw - ax * bx - ay * by - az * bz
+    out = _empty(np.broadcast_shapes(np.shape(a), np.shape(b)), out)
+    out[..., 0] = x
+    out[..., 1] = y
+    out[..., 2] = z
+    out[..., 3] = w
+    return out
+
+
+def conjugate(q, out=None):
+    """
+    Conjugate, the inverse rotation of a unit quaternion.
+
+    :param q: Quaternion
+    :param out: Output quaternion, written in place
+    :return:
+    """
+    q = np.asarray(q, dtype=np.float32)
+    out = _empty(q.shape, out)
+    out[..., 0:3] = q[..., 0:3]
+    out[..., 0:3] *= -1
+    out[..., 3] = q[..., 3]
+    return out
+
+
+def dot(a, b):
+    """
+    Dot product.
+
+    :param a: Quaternion
+    :param b: Quaternion
+    :return:
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return np.sum(np.multiply(a, b), axis=-1)
+
+
+def normalize(q, out=None):
+    """
+    Scale to unit length, rotations accumulated by many products drift away
+    from it.
+
+    :param q: Quaternion
+    :param out: Output quaternion, written in place, may be q
+    :return:
+    """
+    q = np.asarray(q, dtype=np.float32)
+    out = _empty(q.shape, out)
+    np.divide(q, np.sqrt(dot(q, q))[..., None], out=out)
+    return out
+
+
+def nlerp(a, b, t, out=None):
+    """
+    Normalized linear interpolation along the shortest path. Faster than slerp
+    but the angular velocity is not constant.
+
+    :param a: Quaternion at t=0
+    :param b: Quaternion at t=1
+    :param t: Interpolation parameter, scalar or array of shape (N,)
+    :param out: Output quaternion, written in place
+    :return:
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    t = np.asarray(t, dtype=np.float32)[..., None]
+
+    # q and -q are the same rotation, b is flipped to the side of a
+    sign = np.where(dot(a, b) < 0, -1, 1)[..., None].astype(np.float32)
+    out = _empty(np.broadcast_shapes(np.shape(a), np.shape(b), t.shape), out)
+    out[...] = a * (1 - t) + b * (sign * t)
+    return normalize(out, out)
+
+
+def slerp(a, b, t, out=None):
+    """
+    Spherical linear interpolation along the shortest path, at constant
+    angular velocity.
+
+    :param a: Quaternion at t=0
+    :param b: Quaternion at t=1
+    :param t: Interpolation parameter, scalar or array of shape (N,)
+    :param out: Output quaternion, written in place
+    :return:
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    t = np.asarray(t, dtype=np.float32)
+    d = dot(a, b)
+    sign = np.where(d < 0, -1, 1).astype(np.float32)
+    d = np.minimum(np.abs(d), 1)
+    theta = np.arccos(d)
+    sin_theta = np.sin(theta)
+
+    # Nearly equal quaternions are interpolated linearly
+    linear = d > _SLERP_THRESHOLD
+    sin_theta = np.where(linear, 1, sin_theta)
+    wa = np.where(linear, 1 - t, np.sin((1 - t) * theta) / sin_theta)
+    wb = np.where(linear, t, np.sin(t * theta) / sin_theta) * sign
+    out = _empty(np.broadcast_shapes(np.shape(a), np.shape(b), t.shape + (4,)), out)
+    out[...] = a * wa[..., None] + b * wb[..., None]
+    return normalize(out, out)
+
+
+def rotate(q, v):
+    """
+    Rotate vectors.
+
+    :param q: Unit quaternion
+    :param v: Vector of shape (3,) or (N, 3)
+    :return:
+    """
+    q = np.asarray(q, dtype=np.float32)
+    v = np.asarray(v)
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    vx, vy, vz = v[..., 0], v[..., 1], v[..., 2]
+
+    # v + 2w (u x v) + 2u x (u x v), with u the vector part of q
+    cx = 2 * (y * vz - z * vy)
+    cy = 2 * (z * vx - x * vz)
+    cz = 2 * (x * vy - y * vx)
+    return np.stack([vx + w * cx + y * cz - z * cy,
+                     vy + w * cy + z * cx - x * cz,
+                     vz + w * cz + x * cy - y * cx], axis=-1)
+
+
+def to_matrix(q, out=None):
+    """
+    Rotation matrix of a unit quaternion.
+
+    :param q: Unit quaternion of shape (4,) or (N, 4)
+    :param out: Output matrix of shape (4, 4) or (N, 4, 4), written in place
+    :return:
+
+    >>> to_matrix((0, 0, 1, 0))[0:3, 0:3].tolist()
+    [[-1.0, 0.0, 0.0], [0.0, -1.0, 0.0], [0.0, 0.0, 1.0]]
+    """
+    q = np.asarray(q, dtype=np.float32)
+    out = _empty(q.shape[:-1] + (4, 4), out)
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+
+    # First row
+    out[..., 0, 0] = 1 - 2 * (yy + zz)
+    out[..., 0, 1] = 2 * (xy - wz)
+    out[..., 0, 2] = 2 * (xz + wy)
+    # Second row
+    out[..., 1, 0] = 2 * (xy + wz)
+    out[..., 1, 1] = 1 - 2 * (xx + zz)
+    out[..., 1, 2] = 2 * (yz - wx)
+    # Third row
+    out[..., 2, 0] = 2 * (xz - wy)
+    out[..., 2, 1] = 2 * (yz + wx)
+    out[..., 2, 2] = 1 - 2 * (xx + yy)
+    # Fourth row and column
+    out[..., 0:3, 3] = 0
+    out[..., 3, 0:3] = 0
+    out[..., 3, 3] = 1
+    return out
+
+
+def from_matrix(m):
+    """
+    Quaternion of a rotation matrix, the matrix must not be scaled.
+
+    :param m: Rotation matrix of shape (3, 3), (4, 4) or stacks of them
+    :return:
+    """
+    m = np.asarray(m, dtype=np.float32)
+    m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+    m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+    m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+
+    # Each candidate divides by its largest component, the largest one is kept to stay accurate
+    diagonal = np.stack([m00 + m11 + m22, m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11], axis=-1)
+    s = 2 * np.sqrt(np.maximum(1 + diagonal, 1e-12))
+    candidates = np.stack([
+        np.stack([m21 - m12, m02 - m20, m10 - m01, s[..., 0] * s[..., 0] / 4], axis=-1) / s[..., 0, None],
+        np.stack([s[..., 1] * s[..., 1] / 4, m01 + m10, m02 + m20, m21 - m12], axis=-1) / s[..., 1, None],
+        np.stack([m01 + m10, s[..., 2] * s[..., 2] / 4, m12 + m21, m02 - m20], axis=-1) / s[..., 2, None],
+        np.stack([m02 + m20, m12 + m21, s[..., 3] * s[..., 3] / 4, m10 - m01], axis=-1) / s[..., 3, None]
+    ], axis=-2)
+    best = np.argmax(diagonal, axis=-1)[..., None, None]
+    q = np.take_along_axis(candidates, best, axis=-2)[..., 0, :]
+    return normalize(q)
+
+
+def compose_trs(translation=(0, 0, 0), rotation=None, scale=1, out=None):
+    """
+    Affine matrix translation * rotation * scale from a quaternion, written
+    directly without the intermediate products. Same as
+    transformations.compose_trs, with the rotation given as a quaternion.
+
+    :param translation: Translation of shape (3,) or (N, 3)
+    :param rotation: Unit quaternion of shape (4,) or (N, 4), None for no rotation
+    :param scale: Scalar, vector of shape (3,) or stack of shape (N, 3), use (N, 1) for uniform scales
+    :param out: Output matrix, written in place
+    :return:
+    """
+    rotation = identity() if rotation is None else np.asarray(rotation, dtype=np.float32)
+    if out is None:
+        shape = np.broadcast_shapes(np.shape(translation)[:-1], np.shape(rotation)[:-1], np.shape(scale)[:-1])
+        out = np.empty(shape + (4, 4), dtype=np.float32)
+    to_matrix(rotation, out)
+    if np.ndim(scale) == 0:
+        out[..., 0:3, 0:3] *= scale
+    else:
+        out[..., 0:3, 0:3] *= np.asarray(scale)[..., None, :]
+    out[..., 0:3, 3] = translation
+    return out
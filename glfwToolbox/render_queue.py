@@ -0,0 +1,245 @@
+# coding=utf-8
+"""
+RENDER QUEUE
+Collects the draws of a frame and submits them sorted by state and depth.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from OpenGL.GL import GL_FALSE as _GL_FALSE
+from OpenGL.GL import GL_TRIANGLES as _GL_TRIANGLES
+from OpenGL.GL import GL_TRUE as _GL_TRUE
+from OpenGL.GL import glDepthMask as _glDepthMask
+import numpy as _np
+
+from glfwToolbox.frame_uniforms import get_frame_uniforms as _get_frame_uniforms
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+
+# Sort key layout, from the most significant bit:
+# opaque:      [transparent 1][program 8][texture 16][vao 16][depth 23], front to back within a state
+# transparent: [transparent 1][depth 23][program 8][texture 16][vao 16], back to front
+_RENDER_QUEUE_DEPTH_BITS = 23
+_RENDER_QUEUE_PROGRAM_BITS = 8
+_RENDER_QUEUE_TEXTURE_BITS = 16
+_RENDER_QUEUE_VAO_BITS = 16
+_RENDER_QUEUE_STATE_BITS = _RENDER_QUEUE_PROGRAM_BITS + _RENDER_QUEUE_TEXTURE_BITS + _RENDER_QUEUE_VAO_BITS
+_RENDER_QUEUE_DEPTH_MAX = (1 << _RENDER_QUEUE_DEPTH_BITS) - 1
+
+
+def pack_depth(depth):
+    """
+    Quantize non negative depths to sortable integers. The bits of a positive
+    float32 are ordered as its value, so the exponent and the leading bits of
+    the mantissa are kept.
+
+    :param depth: Depth array
+    :return: Quantized depth, uint64 array
+    :rtype: numpy.ndarray
+    """
+    depth = _np.maximum(_np.asarray(depth, dtype=_np.float32), 0)
+    bits = depth.view(_np.uint32) >> (32 - 1 - _RENDER_QUEUE_DEPTH_BITS)
+    return bits.astype(_np.uint64)
+
+
+class RenderQueue(object):
+    """
+    Draws submitted during a frame are sorted by a 64-bit key when flushed.
+    Opaque draws are grouped by program, texture and VAO and drawn front to
+    back; transparent draws are drawn afterwards back to front, without depth
+    writes. Blending must be enabled by the caller.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._items = []  # (shader, shape, mode, instances)
+        self._models = []
+        self._transparent = []
+        self._ids = [{}, {}, {}]  # Compact ids of programs, textures and VAOs, rebuilt for each set of keys
+        self._stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """
+        Reset the statistics.
+
+        :return:
+        """
+        self._stats = {
+            'draws': 0,
+            'opaque': 0,
+            'transparent': 0,
+            'programChanges': 0,
+            'textureChanges': 0,
+            'vaoChanges': 0
+        }
+
+    def _get_id(self, kind, name, bits):
+        """
+        Return the compact id of a program, texture or VAO name. Ids are
+        unique within the keys of one frame.
+
+        :param kind: 0 program, 1 texture, 2 VAO
+        :param name: OpenGL name
+        :param bits: Bits of the id within the key
+        :return: Id
+        :rtype: int
+        """
+        ids = self._ids[kind]
+        if name not in ids:
+            if len(ids) == 1 << bits:
+                raise Exception('Render queue supports up to {0} different {1} per frame'.format(
+                    1 << bits, ('programs', 'textures', 'VAOs')[kind]))
+            ids[name] = len(ids)
+        return ids[name]
+
+    def submit(self, shader, shape, model, mode=_GL_TRIANGLES, transparent=False, instances=None):
+        """
+        Add a draw to the queue.
+
+        :param shader: Shader program
+        :param shape: GPUShape
+        :param model: Model matrix, its translation gives the depth
+        :param mode: Draw mode
+        :param transparent: Transparent draws are sorted back to front after the opaque ones
+        :param instances: GPUInstances, the shape is drawn instanced
+        :return:
+        """
+        if shape.vao == 0:
+            return
+        self._items.append((shader, shape, mode, instances))
+        self._models.append(model)
+        self._transparent.append(transparent)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_keys(self, view):
+        """
+        Return the sort keys of the submitted draws.
+
+        :param view: View matrix
+        :return: Keys, uint64 array
+        :rtype: numpy.ndarray
+        """
+        n = len(self._items)
+        if n == 0:
+            return _np.zeros(0, dtype=_np.uint64)
+
+        # Distance along the view direction of each model origin
+        positions = _np.asarray(self._models, dtype=_np.float32).reshape(n, 4, 4)[:, :, 3]
+        view = _np.asarray(view, dtype=_np.float32)
+        depth = pack_depth(-_np.dot(positions, view[2]))
+
+        state = _np.empty(n, dtype=_np.uint64)
+        self._ids = [{}, {}, {}]
+        for i in range(n):
+            shader, shape = self._items[i][0], self._items[i][1]
+            program = self._get_id(0, shader.shaderProgram, _RENDER_QUEUE_PROGRAM_BITS)
+            texture = self._get_id(1, shape.texture, _RENDER_QUEUE_TEXTURE_BITS)
+            vao = self._get_id(2, shape.vao, _RENDER_QUEUE_VAO_BITS)
+            state[i] = (((program << _RENDER_QUEUE_TEXTURE_BITS) | texture) << _RENDER_QUEUE_VAO_BITS) | vao
+
+        transparent = _np.asarray(self._transparent, dtype=bool)
+        opaque_keys = (state << _np.uint64(_RENDER_QUEUE_DEPTH_BITS)) | depth
+        transparent_keys = (_np.uint64(1) << _np.uint64(63)) | \
+                           ((_RENDER_QUEUE_DEPTH_MAX - depth) << _np.uint64(_RENDER_QUEUE_STATE_BITS)) | state
+        return _np.where(transparent, transparent_keys, opaque_keys)
+
+    def flush(self, view, projection=None):
+        """
+        Sort and draw the submitted draws, then clear the queue.
+
+        :param view: View matrix
+        :param projection: Projection matrix, if None the current one is kept
+        :return:
+        """
+        self._reset_stats()
+        if len(self._items) == 0:
+            return
+        frame = _get_frame_uniforms()
+        frame.set_view(view)
+        if projection is not None:
+            frame.set_projection(projection)
+
+        state = _get_gl_state()
+        keys = self.get_keys(view)
+        order = _np.argsort(keys, kind='stable')
+        program, texture, vao = None, None, None
+        depth_writes = True
+        for i in order:
+            shader, shape, mode, instances = self._items[i]
+            if self._transparent[i]:
+                if depth_writes:
+                    _glDepthMask(_GL_FALSE)
+                    depth_writes = False
+                self._stats['transparent'] += 1
+            else:
+                self._stats['opaque'] += 1
+
+            if program != shader.shaderProgram:
+                program = shader.shaderProgram
+                self._stats['programChanges'] += 1
+            if texture != shape.texture:
+                texture = shape.texture
+                self._stats['textureChanges'] += 1
+            if vao != shape.vao:
+                vao = shape.vao
+                self._stats['vaoChanges'] += 1
+
+            shader.use()
+            if shader.keyModel != '':
+                state.uniform_matrix4(shader.get_uniform_location(shader.keyModel), self._models[i])
+            if instances is not None:
+                shader.draw_shape_instanced(shape, instances, mode)
+            else:
+                shader.draw_shape(shape, mode)
+            self._stats['draws'] += 1
+
+        if not depth_writes:
+            _glDepthMask(_GL_TRUE)
+        self.clear()
+
+    def clear(self):
+        """
+        Remove the submitted draws.
+
+        :return:
+        """
+        self._items = []
+        self._models = []
+        self._transparent = []
+
+    def get_stats(self):
+        """
+        Return the statistics of the last flush, the number of draws and of
+        program, texture and VAO changes.
+
+        :return: Statistics
+        :rtype: dict
+        """
+        return dict(self._stats)
@@ -0,0 +1,272 @@
+# coding=utf-8
+"""
+RESOURCES
+GPU resources accounting and buffer pooling.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from OpenGL.GL import glBufferData as _glBufferData
+from OpenGL.GL import glBufferSubData as _glBufferSubData
+from OpenGL.GL import glDeleteBuffers as _glDeleteBuffers
+from OpenGL.GL import glDeleteTextures as _glDeleteTextures
+from OpenGL.GL import glDeleteVertexArrays as _glDeleteVertexArrays
+from OpenGL.GL import glGenBuffers as _glGenBuffers
+from OpenGL.GL import glGenVertexArrays as _glGenVertexArrays
+
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+
+# Constants
+_RESOURCES_MIN_CAPACITY = 256  # Smallest buffer capacity class in bytes
+_RESOURCES_POOL_CLASSES = 2  # Larger capacity classes that can serve a buffer request
+_RESOURCES_POOL_SIZE = 64 * 1024 * 1024  # Default bytes kept within the buffer pool
+
+
+def capacity_class(nbytes):
+    """
+    Return the capacity class of a buffer. There are four classes for each power
+    of two, so at most 25% of the buffer storage is unused.
+
+    :param nbytes: Required size in bytes
+    :type nbytes: int
+    :return: Capacity in bytes
+    :rtype: int
+    """
+    if nbytes <= _RESOURCES_MIN_CAPACITY:
+        return _RESOURCES_MIN_CAPACITY
+    step = 1 << ((nbytes - 1).bit_length() - 3)
+    return ((nbytes + step - 1) // step) * step
+
+
+class ResourceRegistry(object):
+    """
+    Tracks the VAO, buffers and textures allocated on the GPU and their size.
+    Released buffers are kept in a pool indexed by capacity class and usage,
+    so creating a new buffer of similar size reuses the storage.
+    """
+
+    def __init__(self, pool_size=_RESOURCES_POOL_SIZE):
+        """
+        Constructor.
+
+        :param pool_size: Maximum bytes kept within the buffer pool
+        :type pool_size: int
+        """
+        self._buffers = {}  # name: capacity
+        self._pool = {}  # (capacity, usage): names
+        self._poolBytes = 0
+        self._poolSize = pool_size
+        self._reused = 0
+        self._textures = {}  # name: bytes
+        self._vaos = 0
+
+    def create_vao(self):
+        """
+        Create a vertex array object.
+
+        :return: VAO name
+        :rtype: int
+        """
+        self._vaos += 1
+        return _glGenVertexArrays(1)
+
+    def delete_vao(self, vao):
+        """
+        Delete a vertex array object.
+
+        :param vao: VAO name
+        :return:
+        """
+        _glDeleteVertexArrays(1, [vao])
+        _get_gl_state().forget_vertex_array(vao)
+        self._vaos -= 1
+
+    def create_buffer(self, target, data, usage):
+        """
+        Create a buffer and upload the data, the buffer is left bound to the
+        target. Pooled buffers with the same usage and the same capacity class,
+        or a slightly larger one, are reused.
+
+        :param target: Buffer target, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER
+        :param data: Contiguous numpy array
+        :param usage: Buffer usage
+        :return: Buffer name, capacity in bytes
+        :rtype: tuple
+        """
+        capacity = capacity_class(data.nbytes)
+        name = 0
+        pool_capacity = capacity
+        for _ in range(_RESOURCES_POOL_CLASSES + 1):
+            names = self._pool.get((pool_capacity, usage))
+            if names:
+                name = names.pop()
+                self._poolBytes -= pool_capacity
+                self._reused += 1
+                capacity = pool_capacity
+                _get_gl_state().bind_buffer(target, name)
+                break
+            pool_capacity = capacity_class(pool_capacity + 1)
+        if name == 0:
+            name = _glGenBuffers(1)
+            _get_gl_state().bind_buffer(target, name)
+            _glBufferData(target, capacity, None, usage)
+        _glBufferSubData(target, 0, data.nbytes, data)
+        self._buffers[name] = (capacity, usage)
+        return name, capacity
+
+    def resize_buffer(self, target, name, capacity, usage):
+        """
+        Reallocate the storage of a buffer, the buffer is left bound to the target.
+
+        :param target: Buffer target
+        :param name: Buffer name
+        :param capacity: New capacity in bytes
+        :param usage: Buffer usage
+        :return:
+        """
+        _get_gl_state().bind_buffer(target, name)
+        _glBufferData(target, capacity, None, usage)
+        self._buffers[name] = (capacity, usage)
+
+    def release_buffer(self, name):
+        """
+        Release a buffer. It is kept within the pool if there is room,
+        otherwise it is deleted.
+
+        :param name: Buffer name
+        :return:
+        """
+        capacity, usage = self._buffers.pop(name)
+        if self._poolBytes + capacity <= self._poolSize:
+            self._pool.setdefault((capacity, usage), []).append(name)
+            self._poolBytes += capacity
+        else:
+            _glDeleteBuffers(1, [name])
+            _get_gl_state().forget_buffer(name)
+
+    def register_texture(self, name, nbytes):
+        """
+        Register the size of a texture.
+
+        :param name: Texture name
+        :param nbytes: Texture size in bytes
+        :return:
+        """
+        self._textures[name] = nbytes
+
+    def delete_texture(self, name):
+        """
+        Delete a texture.
+
+        :param name: Texture name
+        :return:
+        """
+        _glDeleteTextures([name])
+        _get_gl_state().forget_texture(name)
+        self._textures.pop(name, None)
+
+    def clear_pool(self):
+        """
+        Delete all buffers kept within the pool.
+
+        :return:
+        """
+        for names in self._pool.values():
+            if len(names) > 0:
+                _glDeleteBuffers(len(names), names)
+                for name in names:
+                    _get_gl_state().forget_buffer(name)
+        self._pool = {}
+        self._poolBytes = 0
+
+    def get_buffer_bytes(self):
+        """
+        Return the bytes allocated by buffers in use.
+
+        :return:
+        :rtype: int
+        """
+        return sum(i[0] for i in self._buffers.values())
+
+    def get_texture_bytes(self):
+        """
+        Return the bytes allocated by textures.
+
+        :return:
+        :rtype: int
+        """
+        return sum(self._textures.values())
+
+    def get_pool_bytes(self):
+        """
+        Return the bytes allocated by buffers within the pool.
+
+        :return:
+        :rtype: int
+        """
+        return self._poolBytes
+
+    def get_total_bytes(self):
+        """
+        Return all bytes allocated on the GPU, including the pool.
+
+        :return:
+        :rtype: int
+        """
+        return self.get_buffer_bytes() + self.get_texture_bytes() + self._poolBytes
+
+    def get_stats(self):
+        """
+        Return the registry totals.
+
+        :return:
+        :rtype: dict
+        """
+        return {
+            'buffers': len(self._buffers),
+            'bufferBytes': self.get_buffer_bytes(),
+            'poolBuffers': sum(len(i) for i in self._pool.values()),
+            'poolBytes': self._poolBytes,
+            'reusedBuffers': self._reused,
+            'textures': len(self._textures),
+            'textureBytes': self.get_texture_bytes(),
+            'totalBytes': self.get_total_bytes(),
+            'vaos': self._vaos
+        }
+
+
+# Default registry
+_RESOURCES_REGISTRY = ResourceRegistry()
+
+
+def get_registry():
+    """
+    Return the default resource registry.
+
+    :return:
+    :rtype: ResourceRegistry
+    """
+    return _RESOURCES_REGISTRY
@@ -6,43 +6,483 @@ v2.0 - Enhanced to work on 3D environments
 """
 
 from OpenGL.GL import *
+import itertools as _itertools
 import numpy as np
+import weakref as _weakref
 
+import glfwToolbox.bounds as _bounds
+import glfwToolbox.quaternion as _quat
 import glfwToolbox.transformations as _tr
 from glfwToolbox.easy_shaders import GPUShape as _GPUShape
 
 
+# Name index, each name maps the ids of the nodes that have it to weak references, nodes are dropped when collected
+_SCENE_GRAPH_INDEX = {}
+
+# Separator of the names within a path, e.g. 'scaled_car3/wheel_rotation'
+_SCENE_GRAPH_PATH_SEPARATOR = '/'
+
+# Each world transform cache entry gets a unique token, the entries of a child are keyed by the token of its parent entry
+_SCENE_GRAPH_TOKENS = _itertools.count(1)
+
+
+class _WorldTransform:
+    """
+    World matrix of a node along one path of the graph. A node shared by many
+    parents has one entry per path.
+    """
+
+    def __init__(self, matrix=None):
+        self.token = next(_SCENE_GRAPH_TOKENS)
+        self.matrix = matrix
+        self.version = 0  # Incremented each time the matrix changes
+        self.parentVersion = -1
+        self.localVersion = -1
+        self.bounds = None  # World bounds of the subtree
+        self.boundsSource = None  # Node bounds the world bounds were computed from
+        self.boundsVersion = -1
+
+
+def _unindex_node(_name, key, ref=None):
+    """
+    Remove a node from the name index.
+
+    :param _name: Name of the node
+    :param key: Id of the node
+    :param ref: If given, the entry is removed only if it is this reference
+    :return:
+    """
+    nodes = _SCENE_GRAPH_INDEX.get(_name)
+    if nodes is None or key not in nodes or (ref is not None and nodes[key] is not ref):
+        return
+    del nodes[key]
+    if len(nodes) == 0:
+        del _SCENE_GRAPH_INDEX[_name]
+
+
+class _ChildList(list):
+    """
+    List of the childs of a node, it keeps the parents of the childs updated.
+    """
+
+    def __init__(self, owner, childs=()):
+        super(_ChildList, self).__init__()
+        self._owner = owner
+        if childs:
+            self.extend(childs)
+
+    def append(self, child):
+        super(_ChildList, self).append(child)
+        self._owner._attach(child)
+
+    def extend(self, childs):
+        childs = list(childs)
+        super(_ChildList, self).extend(childs)
+        for child in childs:
+            self._owner._attach(child)
+
+    def insert(self, index, child):
+        super(_ChildList, self).insert(index, child)
+        self._owner._attach(child)
+
+    def remove(self, child):
+        super(_ChildList, self).remove(child)
+        self._owner._detach(child)
+
+    def pop(self, index=-1):
+        child = super(_ChildList, self).pop(index)
+        self._owner._detach(child)
+        return child
+
+    def clear(self):
+        for child in self:
+            self._owner._detach(child)
+        super(_ChildList, self).clear()
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            old, new = self[index], list(value)
+            super(_ChildList, self).__setitem__(index, new)
+        else:
+            old, new = [self[index]], [value]
+            super(_ChildList, self).__setitem__(index, value)
+        for child in old:
+            self._owner._detach(child)
+        for child in new:
+            self._owner._attach(child)
+
+    def __delitem__(self, index):
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        super(_ChildList, self).__delitem__(index)
+        for child in old:
+            self._owner._detach(child)
+
+    def __iadd__(self, childs):
+        self.extend(childs)
+        return self
+
+    def __imul__(self, n):
+        childs = list(self)
+        for _ in range(max(n, 1) - 1):
+            self.extend(childs)
+        if n <= 0:
+            self.clear()
+        return self
+
+
 # A simple class to handle a scene graph
 # Each node represents a group of objects
 # Each leaf represents a basic figure (GPUShape)
 # To identify each node properly, it MUST have a unique name
+# The nodes are indexed by name and know their parents, so a node is found walking up from it
+# The world transforms are cached, assigning a new transform marks the node as dirty
+# and only the subtrees below dirty nodes are recomputed
 class SceneGraphNode:
     def __init__(self, _name):
+        self._name = None
+        self._parents = {}  # Parent node -> number of times this node is its child
+        self._childs = _ChildList(self)
+        self._transform = _tr.identity()
+        self._version = 0
+        self._worlds = {}
+        self._compiled = None  # Id -> weak reference of the compiled graphs that contain the node
+        self._bounds = None  # Bounds of the subtree in the frame of the node
+        self._boundsValid = False
+        self._leafCount = 0  # Number of shapes drawn by the subtree
         self.name = _name
-        self.transform = _tr.identity()
-        self.childs = []
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, _name):
+        if self._name is not None:
+            _unindex_node(self._name, id(self))
+        self._name = _name
+        key = id(self)
+
+        def forget(ref):
+            _unindex_node(_name, key, ref)
+
+        if _name not in _SCENE_GRAPH_INDEX:
+            _SCENE_GRAPH_INDEX[_name] = {}
+        _SCENE_GRAPH_INDEX[_name][key] = _weakref.ref(self, forget)
+
+    @property
+    def childs(self):
+        return self._childs
+
+    @childs.setter
+    def childs(self, childs):
+        # childs += [...] assigns back the same list
+        if childs is self._childs:
+            return
+        self._childs.clear()
+        self._childs.extend(childs)
+
+    def _attach(self, child):
+        """
+        Register this node as a parent of a child.
+
+        :param child: Child node or GPUShape
+        :return:
+        """
+        if isinstance(child, SceneGraphNode):
+            child._parents[self] = child._parents.get(self, 0) + 1
+        self.invalidate_bounds()
+        if self._compiled:
+            self._notify_compiled(False)
+
+    def _detach(self, child):
+        """
+        Unregister this node as a parent of a child.
+
+        :param child: Child node or GPUShape
+        :return:
+        """
+        if isinstance(child, SceneGraphNode):
+            count = child._parents.get(self, 0) - 1
+            if count > 0:
+                child._parents[self] = count
+            else:
+                child._parents.pop(self, None)
+                child._drop_worlds([world.token for world in self._worlds.values()])
+        self.invalidate_bounds()
+        if self._compiled:
+            self._notify_compiled(False)
+
+    def _drop_worlds(self, tokens):
+        """
+        Remove the cached world transforms below the given parent entries,
+        and the ones of the descendants that were reached through them.
+
+        :param tokens: Tokens of the parent entries
+        :return:
+        """
+        removed = []
+        for token in tokens:
+            world = self._worlds.pop(token, None)
+            if world is not None:
+                removed.append(world.token)
+        if len(removed) == 0:
+            return
+        for child in self._childs:
+            if isinstance(child, SceneGraphNode):
+                child._drop_worlds(removed)
+
+    def _notify_compiled(self, transform):
+        """
+        Notify the compiled graphs that contain the node of a change.
+
+        :param transform: True if the transform changed, False if the childs changed and the graphs must be compiled again
+        :return:
+        """
+        for key, ref in list(self._compiled.items()):
+            graph = ref()
+            if graph is None:
+                del self._compiled[key]
+            elif transform:
+                graph._dirty.add(self)
+            else:
+                graph._valid = False
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, transform):
+        self._transform = transform
+        self.set_dirty()
+
+    def set_trs(self, translation=(0, 0, 0), rotation=None, scale=1):
+        """
+        Set the transform from a translation, rotation and scale.
+
+        :param translation: Translation vector
+        :param rotation: Rotation matrix or quaternion of shape (4,), None for no rotation
+        :param scale: Scalar or vector
+        :return:
+        """
+        if rotation is not None and np.shape(rotation) == (4,):
+            self.transform = _quat.compose_trs(translation, rotation, scale)
+        else:
+            self.transform = _tr.compose_trs(translation, rotation, scale)
+
+    def set_dirty(self):
+        """
+        Mark the transform as changed. Needed only if the transform matrix is
+        modified in place.
+
+        :return:
+        """
+        self._version += 1
+        for parent in self._parents:
+            parent.invalidate_bounds()
+        if self._compiled:
+            self._notify_compiled(True)
+
+    def invalidate_bounds(self):
+        """
+        Mark the bounds of the node and its ancestors as outdated. Needed only
+        if the vertices of a shape of the subtree are updated.
+
+        :return:
+        """
+        # If the bounds are outdated, the bounds of the ancestors are outdated too
+        if not self._boundsValid:
+            return
+        self._boundsValid = False
+        for parent in self._parents:
+            parent.invalidate_bounds()
+
+    def get_bounds(self):
+        """
+        Return the bounds of the subtree in the frame of the node, that is,
+        before the transform of the node is applied. The bounds are cached
+        until a transform or the childs of the subtree change.
+
+        :return: Bounds, None if a shape of the subtree has no bounds
+        :rtype: glfwToolbox.bounds.Bounds
+        """
+        if self._boundsValid:
+            return self._bounds
+        if len(self.childs) == 1 and isinstance(self.childs[0], _GPUShape):
+            self._bounds = self.childs[0].bounds
+            self._leafCount = 1
+        else:
+            childs_bounds = []
+            self._leafCount = 0
+            for child in self.childs:
+                if isinstance(child, _GPUShape):
+                    self._leafCount += 1
+                    childs_bounds.append(child.bounds)
+                    continue
+                child_bounds = child.get_bounds()
+                self._leafCount += child._leafCount
+                childs_bounds.append(None if child_bounds is None else child_bounds.transform(child.transform))
+
+            # A subtree without bounds is never culled
+            if len(childs_bounds) == 0 or None in childs_bounds:
+                self._bounds = None
+            else:
+                self._bounds = _bounds.merge_bounds(childs_bounds)
+        self._boundsValid = True
+        return self._bounds
+
+    def _get_world_bounds(self, world):
+        """
+        Return the world bounds of the subtree along a path of the graph.
+
+        :param world: World transform of the node
+        :type world: _WorldTransform
+        :return: Bounds, None if the subtree has no bounds
+        :rtype: glfwToolbox.bounds.Bounds
+        """
+        local_bounds = self.get_bounds()
+        if local_bounds is None:
+            return None
+        if world.boundsSource is not local_bounds or world.boundsVersion != world.version:
+            world.bounds = local_bounds.transform(world.matrix)
+            world.boundsSource = local_bounds
+            world.boundsVersion = world.version
+        return world.bounds
+
+    def _get_root_world(self, parent_transform):
+        """
+        Return the cached world transform of the node drawn as a root.
+
+        :param parent_transform: Transform applied to the whole graph
+        :return: World transform
+        :rtype: _WorldTransform
+        """
+        parent = self._worlds.get(None)
+        if parent is None:
+            parent = _WorldTransform()
+            self._worlds[None] = parent
+        if parent.matrix is not parent_transform and not np.array_equal(parent.matrix, parent_transform):
+            parent.matrix = np.array(parent_transform, dtype=np.float32)
+            parent.version += 1
+        return self._get_world(parent)
+
+    def _get_world(self, parent):
+        """
+        Return the cached world transform of the node below a parent, the
+        matrix is recomputed only if the node or its parent changed.
+
+        :param parent: World transform of the parent
+        :type parent: _WorldTransform
+        :return: World transform
+        :rtype: _WorldTransform
+        """
+        world = self._worlds.get(parent.token)
+        if world is None:
+            world = _WorldTransform()
+            self._worlds[parent.token] = world
+        if world.parentVersion != parent.version or world.localVersion != self._version:
+            world.matrix = np.matmul(parent.matrix, self._transform)
+            world.parentVersion = parent.version
+            world.localVersion = self._version
+            world.version += 1
+        return world
+
+
+def _find_path_up(root, node):
+    """
+    Return the nodes from the root to a node, walking up the parents of the
+    node. The cost depends on the depth of the node, not on the graph size.
+
+    :param root:
+    :param node:
+    :return: List of nodes, None if the node is not below the root, False if it is reached by more than one path
+    """
+    path = [node]
+    while node is not root:
+        if len(node._parents) == 0:
+            return None
+        if len(node._parents) > 1:
+            return False
+        parent, count = next(iter(node._parents.items()))
+        if count > 1:
+            return False
+        node = parent
+        path.append(node)
+    path.reverse()
+    return path
+
+
+def _find_path_down(node, _name):
+    """
+    Return the nodes from a node to the first node below it with the requested
+    name, searched depth first in the order of the childs.
+
+    :param node:
+    :param _name: Name
+    :return: List of nodes, None if the name was not found
+    """
+    for child in node.childs:
+        if not isinstance(child, SceneGraphNode):
+            continue
+        if child.name == _name:
+            return [node, child]
+        path = _find_path_down(child, _name)
+        if path is not None:
+            return [node] + path
+    return None
+
+
+def _find_path(node, _name):
+    """
+    Return the nodes from a node to the node with the requested name. The name
+    may be a path of names separated by '/', each one is searched below the
+    previous one, so the instances of shared subtrees can be told apart. If a
+    name is repeated below the node, the first one found depth first is chosen.
+
+    :param node:
+    :param _name: Name or path
+    :return: List of nodes, None if the name was not found
+    """
+    parts = _name.split(_SCENE_GRAPH_PATH_SEPARATOR)
+
+    # A name held by a single node reached by a single path is found walking up from it,
+    # otherwise the graph is searched depth first as the first match depends on the order of the childs
+    refs = _SCENE_GRAPH_INDEX.get(parts[0])
+    if not refs:
+        return None
+    path = False
+    if len(refs) == 1:
+        candidate = next(iter(refs.values()))()
+        if candidate is None:
+            return None
+        path = _find_path_up(node, candidate)
+    if path is False:
+        path = [node] if node.name == parts[0] else _find_path_down(node, parts[0])
+    if path is None:
+        return None
+
+    # The rest of the path is searched below the node already found
+    for part in parts[1:]:
+        found = _find_path_down(path[-1], part)
+        if found is None:
+            return None
+        path += found[1:]
+    return path
 
 
 def find_node(node, _name):
     """
     :param node:
-    :param _name:
+    :param _name: Name, or path of names separated by '/'
     :return:
     """
     # The name was not found in this path
     if isinstance(node, _GPUShape):
         return None
 
-    # This is the requested node
-    if node.name == _name:
-        return node
-
-    # All childs are checked for the requested name
-    else:
-        for child in node.childs:
-            found_node = find_node(child, _name)
-            if found_node is not None:
-                return found_node
+    path = _find_path(node, _name)
+    if path is not None:
+        return path[-1]
 
     # No child of this node had the requested name
     return None
@@ -51,7 +491,7 @@ def find_node(node, _name):
 def find_transform(node, _name, parent_transform=_tr.identity()):
     """
     :param node:
-    :param _name:
+    :param _name: Name, or path of names separated by '/'
     :param parent_transform:
     :return:
     """
@@ -59,61 +499,338 @@ def find_transform(node, _name, parent_transform=_tr.identity()):
     if isinstance(node, _GPUShape):
         return None
 
-    new_transform = np.matmul(parent_transform, node.transform)
-
-    # This is the requested node
-    if node.name == _name:
-        return new_transform
-
-    # All childs are checked for the requested name
-    else:
-        for child in node.childs:
-            found_transform = find_transform(child, _name, new_transform)
-            if isinstance(found_transform, (np.ndarray, np.generic)):
-                return found_transform
+    path = _find_path(node, _name)
+    if path is None:
+        return None
 
-    # No child of this node had the requested name
-    return None
+    # The world transforms along the path are cached, only dirty nodes are recomputed
+    world = node._get_root_world(parent_transform)
+    for child in path[1:]:
+        world = child._get_world(world)
+    return world.matrix.copy()
 
 
 def find_position(node, _name, parent_transform=_tr.identity()):
     """
     :param node:
-    :param _name:
+    :param _name: Name, or path of names separated by '/'
     :param parent_transform:
     :return:
     """
     found_transform = find_transform(node, _name, parent_transform)
 
+    # The position is the transformed origin, the last column of the transform
     if isinstance(found_transform, (np.ndarray, np.generic)):
-        zero = np.array([[0, 0, 0, 1]], dtype=np.float32).T
-        found_position = np.matmul(found_transform, zero)
-        return found_position
+        return found_transform[:, 3:4]
 
     return None
 
 
-def draw_scene_graph_node(node, pipeline, parent_transform=_tr.identity()):
+def draw_scene_graph_node(node, pipeline, parent_transform=_tr.identity(), frustum=None):
     """
     :param node:
     :param pipeline:
     :param parent_transform:
+    :param frustum: bounds.Frustum, if given the subtrees outside of it are not drawn
     :return:
     """
     assert (isinstance(node, SceneGraphNode))
+    _draw_scene_graph_node(node, pipeline, node._get_root_world(parent_transform), frustum)
 
-    # Composing the transformations through this path
-    new_transform = np.matmul(parent_transform, node.transform)
+
+def _draw_scene_graph_node(node, pipeline, world, frustum):
+    """
+    :param node:
+    :param pipeline:
+    :param world: Cached world transform of the node
+    :param frustum:
+    :return:
+    """
+    # The whole subtree is skipped if its bounds are outside the view
+    if frustum is not None:
+        world_bounds = node._get_world_bounds(world)
+        if not frustum.is_visible(world_bounds, node._leafCount):
+            return
 
     # If the child node is a leaf, it should be a GPUShape.
     # Hence, it can be drawn with drawShape
     if len(node.childs) == 1 and isinstance(node.childs[0], _GPUShape):
         leaf = node.childs[0]
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, 'model'), 1, GL_TRUE, new_transform)
+        pipeline.set_uniform_matrix4(pipeline.keyModel, world.matrix)
         pipeline.draw_shape(leaf)
 
     # If the child node is not a leaf, it MUST be a SceneGraphNode,
     # so this draw function is called recursively
     else:
         for child in node.childs:
-            draw_scene_graph_node(child, pipeline, new_transform)
+            _draw_scene_graph_node(child, pipeline, child._get_world(world), frustum)
+
+
+def draw_scene_graph_node_instanced(node, pipeline, instances, parent_transform=_tr.identity()):
+    """
+    Draw many copies of a node, each leaf is drawn once for all the instances.
+    The node transforms place each leaf within the instance.
+
+    :param node:
+    :param pipeline: Instanced shader program
+    :param instances: GPUInstances
+    :param parent_transform:
+    :return:
+    """
+    assert (isinstance(node, SceneGraphNode))
+    _draw_scene_graph_node_instanced(node, pipeline, instances, node._get_root_world(parent_transform))
+
+
+def _draw_scene_graph_node_instanced(node, pipeline, instances, world):
+    """
+    :param node:
+    :param pipeline:
+    :param instances:
+    :param world: Cached world transform of the node
+    :return:
+    """
+    if len(node.childs) == 1 and isinstance(node.childs[0], _GPUShape):
+        leaf = node.childs[0]
+        pipeline.set_uniform_matrix4(pipeline.keyModel, world.matrix)
+        pipeline.draw_shape_instanced(leaf, instances)
+
+    else:
+        for child in node.childs:
+            _draw_scene_graph_node_instanced(child, pipeline, instances, child._get_world(world))
+
+
+class CompiledSceneGraph:
+    """
+    Scene graph flattened into arrays, so drawing does not walk the graph node
+    by node. Shared subtrees get one entry per path. The world transforms are
+    computed level by level with batched products, only from the shallowest
+    changed level, and the graph is compiled again only if the childs of a
+    node change.
+
+    A node shared at different depths is recomputed from its shallowest entry:
+
+    >>> root, a, s = SceneGraphNode('root'), SceneGraphNode('a'), SceneGraphNode('s')
+    >>> root.childs = [a, s]
+    >>> a.childs = [s]
+    >>> graph = compile_scene_graph(root)
+    >>> graph.update()
+    >>> s.transform = _tr.translate(0, 5, 0)
+    >>> graph.update()
+    >>> graph.get_world_transforms()[:, 1, 3].tolist()
+    [0.0, 0.0, 5.0, 5.0]
+    """
+
+    def __init__(self, root):
+        """
+        Constructor.
+
+        :param root: Root node
+        :type root: SceneGraphNode
+        """
+        assert (isinstance(root, SceneGraphNode))
+        self._root = root
+        self._valid = False
+        self._dirty = set()  # Nodes whose transform changed
+        self._nodes = []  # Unique nodes
+        self._nodeIds = {}  # Id of a node -> index in the unique nodes
+        self._entries = []  # Entries of each unique node
+        self._parents = np.zeros(0, dtype=np.int32)  # Parent entry, -1 for the root
+        self._locals = np.zeros((0, 4, 4), dtype=np.float32)
+        self._worlds = np.zeros((0, 4, 4), dtype=np.float32)
+        self._levels = []  # Entries of each depth
+        self._nodeLevels = []  # Shallowest depth of each unique node
+        self._leaves = []  # (entry, GPUShape) in drawing order
+        self._entryNodes = []  # Unique node index of each entry
+        self._leafBounds = None  # Box centers and extents of the leaf shapes, NaN if a shape has no bounds
+        self._parentTransform = None
+        self._dirtyLevel = 0  # Shallowest level whose world transforms are outdated
+        self._compile()
+
+    def _compile(self):
+        """
+        Flatten the graph.
+
+        :return:
+        """
+        for node in self._nodes:
+            node._compiled.pop(id(self), None)
+
+        nodes, node_ids, entries = [], {}, []
+        entry_nodes, parents, depths, leaves = [], [], [], []
+        stack = [(self._root, -1, 0)]
+        while len(stack) > 0:
+            node, parent, depth = stack.pop()
+            if not isinstance(node, SceneGraphNode):
+                raise Exception('Scene graph node childs must be nodes, or a single GPUShape')
+            i = node_ids.get(id(node))
+            if i is None:
+                i = len(nodes)
+                node_ids[id(node)] = i
+                nodes.append(node)
+                entries.append([])
+            entry = len(parents)
+            entries[i].append(entry)
+            entry_nodes.append(i)
+            parents.append(parent)
+            depths.append(depth)
+
+            # A node with a single GPUShape is drawn with its world transform
+            if len(node.childs) == 1 and isinstance(node.childs[0], _GPUShape):
+                leaves.append((entry, node.childs[0]))
+            else:
+                for child in reversed(node.childs):
+                    stack.append((child, entry, depth + 1))
+
+        # The nodes reach the graph through a weak reference, so they do not keep it alive
+        ref = _weakref.ref(self)
+        for node in nodes:
+            if node._compiled is None:
+                node._compiled = {}
+            node._compiled[id(self)] = ref
+
+        self._nodes = nodes
+        self._nodeIds = node_ids
+        self._entryNodes = entry_nodes
+        self._entries = entries
+        # A shared node may be reached at many depths, its changes are recomputed from the shallowest one
+        self._nodeLevels = [min(depths[j] for j in e) for e in entries]
+        self._parents = np.array(parents, dtype=np.int32)
+        depths = np.array(depths, dtype=np.int32)
+        self._levels = [np.nonzero(depths == d)[0] for d in range(int(depths.max()) + 1)]
+        self._leaves = leaves
+        self._leafBounds = np.full((len(leaves), 2, 3), np.nan, dtype=np.float32)
+        for i in range(len(leaves)):
+            leaf_bounds = leaves[i][1].bounds
+            if leaf_bounds is not None:
+                self._leafBounds[i] = (leaf_bounds.aabbMin + leaf_bounds.aabbMax) / 2, leaf_bounds.get_extent()
+        local = np.array([node.transform for node in nodes], dtype=np.float32)
+        self._locals = local[np.array(entry_nodes, dtype=np.int32)]
+        self._worlds = np.empty_like(self._locals)
+        self._dirty = set()
+        self._dirtyLevel = 0
+        self._valid = True
+
+    def update(self, parent_transform=_tr.identity()):
+        """
+        Update the world transforms. The graph is compiled again if its
+        topology changed.
+
+        :param parent_transform: Transform applied to the whole graph
+        :return:
+        """
+        if not self._valid:
+            self._compile()
+        if self._parentTransform is not parent_transform and not np.array_equal(self._parentTransform,
+                                                                                 parent_transform):
+            self._parentTransform = np.array(parent_transform, dtype=np.float32)
+            self._dirtyLevel = 0
+        for node in self._dirty:
+            i = self._nodeIds[id(node)]
+            self._locals[self._entries[i]] = node.transform
+            self._dirtyLevel = min(self._dirtyLevel, self._nodeLevels[i])
+        self._dirty = set()
+        if self._dirtyLevel >= len(self._levels):
+            return
+
+        # The levels are computed in order, each one reads the world transforms of the previous one
+        for d in range(self._dirtyLevel, len(self._levels)):
+            level = self._levels[d]
+            if d == 0:
+                self._worlds[level] = np.matmul(self._parentTransform, self._locals[level])
+            else:
+                self._worlds[level] = np.matmul(self._worlds[self._parents[level]], self._locals[level])
+        self._dirtyLevel = len(self._levels)
+
+    def set_trs(self, nodes, translations=(0, 0, 0), rotations=None, scales=1):
+        """
+        Set the transforms of many nodes at once, the matrices are built with a
+        single batched call, e.g. from interpolated quaternions.
+
+        :param nodes: List of N nodes
+        :param translations: Translations of shape (3,) or (N, 3)
+        :param rotations: Quaternions of shape (N, 4), None for no rotation
+        :param scales: Scalar, vector of shape (3,) or stack of shape (N, 3)
+        :return:
+        """
+        transforms = _quat.compose_trs(translations, rotations, scales,
+                                       out=np.empty((len(nodes), 4, 4), dtype=np.float32))
+        for i in range(len(nodes)):
+            nodes[i].transform = transforms[i]
+
+    def get_world_transforms(self):
+        """
+        Return the world transform of each entry, in depth first order.
+
+        :return: World transforms, (N, 4, 4) array
+        :rtype: numpy.ndarray
+        """
+        return self._worlds
+
+    def get_leaves(self):
+        """
+        Return the shapes drawn by the graph with their nodes and world
+        transforms, as computed by the last update.
+
+        :return: List of (node, GPUShape, world transform)
+        :rtype: list
+        """
+        return [(self._nodes[self._entryNodes[entry]], leaf, self._worlds[entry]) for entry, leaf in self._leaves]
+
+    def get_visible_leaves(self, frustum):
+        """
+        Test the world bounds of all the leaves against a frustum at once.
+        The bounds of the shapes are read when the graph is compiled.
+
+        :param frustum: Frustum
+        :type frustum: glfwToolbox.bounds.Frustum
+        :return: Visibility of each leaf, (L,) bool array
+        :rtype: numpy.ndarray
+        """
+        if len(self._leaves) == 0:
+            return np.zeros(0, dtype=bool)
+        worlds = self._worlds[[entry for entry, _ in self._leaves]]
+        linear = worlds[:, 0:3, 0:3]
+        centers = np.einsum('nij,nj->ni', linear, self._leafBounds[:, 0]) + worlds[:, 0:3, 3]
+        extents = np.einsum('nij,nj->ni', np.abs(linear), self._leafBounds[:, 1])
+        bounded = ~np.isnan(self._leafBounds[:, 0, 0])
+
+        # Shapes without bounds are always visible
+        visible = ~bounded
+        visible[bounded] = frustum.test_boxes(centers[bounded], extents[bounded])
+        frustum.count(np.count_nonzero(bounded), np.count_nonzero(~visible))
+        return visible
+
+    def draw(self, pipeline, parent_transform=_tr.identity(), instances=None, frustum=None):
+        """
+        Draw the leaves of the graph.
+
+        :param pipeline: Shader program
+        :param parent_transform: Transform applied to the whole graph
+        :param instances: GPUInstances, if given the graph is drawn instanced
+        :param frustum: bounds.Frustum, if given the leaves outside of it are not drawn
+        :return:
+        """
+        self.update(parent_transform)
+        visible = None
+        if frustum is not None and instances is None:
+            visible = self.get_visible_leaves(frustum)
+        for i in range(len(self._leaves)):
+            if visible is not None and not visible[i]:
+                continue
+            entry, leaf = self._leaves[i]
+            pipeline.set_uniform_matrix4(pipeline.keyModel, self._worlds[entry])
+            if instances is not None:
+                pipeline.draw_shape_instanced(leaf, instances)
+            else:
+                pipeline.draw_shape(leaf)
+
+
+def compile_scene_graph(node):
+    """
+    Flatten a scene graph to draw it without walking its nodes.
+
+    :param node: Root node
+    :return: Compiled graph
+    :rtype: CompiledSceneGraph
+    """
+    return CompiledSceneGraph(node)
@@ -33,14 +33,335 @@ SOFTWARE.
 
 # Library imports
 from glfwToolbox.mathlib import _normal_3_points as _normal3
+import numpy as _np
 
 
-# A simple class container to store vertices and indices that define a shape
+# Vertex attributes
+VERTEX_COLOR = 'color'
+VERTEX_NORMAL = 'normal'
+VERTEX_POSITION = 'position'
+VERTEX_TEXTURE = 'texture'
+
+# Vertex data is stored as 32 bits floats
+_FLOAT_BYTES = 4
+
+
+class VertexFormat(object):
+    """
+    Vertex format descriptor. Describes the attributes of an interleaved vertex,
+    each attribute stores its number of components and its offset in bytes.
+    """
+
+    def __init__(self, *attributes):
+        """
+        Constructor.
+
+        :param attributes: (attribute, components) pairs, in the order they are stored in the vertex
+        """
+        self.attributes = []
+        offset = 0
+        for attribute, components in attributes:
+            self.attributes.append((attribute, components, offset))
+            offset += components * _FLOAT_BYTES
+        self.stride = offset
+        self.components = offset // _FLOAT_BYTES
+
+    def has(self, attribute):
+        """
+        Check if the format contains an attribute.
+
+        :param attribute: Attribute name
+        :return:
+        :rtype: bool
+        """
+        for i in self.attributes:
+            if i[0] == attribute:
+                return True
+        return False
+
+    def get_offset(self, attribute):
+        """
+        Return the offset of an attribute in components, -1 if the format does not contain it.
+
+        :param attribute: Attribute name
+        :return:
+        :rtype: int
+        """
+        for i in self.attributes:
+            if i[0] == attribute:
+                return i[2] // _FLOAT_BYTES
+        return -1
+
+    def __eq__(self, other):
+        return isinstance(other, VertexFormat) and self.attributes == other.attributes
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(tuple(self.attributes))
+
+
+# Formats used by the basic shapes
+FORMAT_COLOR = VertexFormat((VERTEX_POSITION, 3), (VERTEX_COLOR, 3))
+FORMAT_COLOR_NORMAL = VertexFormat((VERTEX_POSITION, 3), (VERTEX_COLOR, 3), (VERTEX_NORMAL, 3))
+FORMAT_TEXTURE = VertexFormat((VERTEX_POSITION, 3), (VERTEX_TEXTURE, 2))
+FORMAT_TEXTURE_NORMAL = VertexFormat((VERTEX_POSITION, 3), (VERTEX_TEXTURE, 2), (VERTEX_NORMAL, 3))
+
+
+# A simple class container to store vertices and indices that define a shape.
+# Vertices are stored as a contiguous float32 array and indices as an uint32
+# array (uint16 arrays are kept), lists are converted once on construction.
 class Shape:
-    def __init__(self, vertices, indices, texture_file_name=None):
-        self.vertices = vertices
-        self.indices = indices
+    def __init__(self, vertices, indices, texture_file_name=None, vertex_format=None):
+        self.vertices = _np.ascontiguousarray(vertices, dtype=_np.float32).ravel()
+        if not (isinstance(indices, _np.ndarray) and indices.dtype == _np.uint16):
+            indices = _np.ascontiguousarray(indices, dtype=_np.uint32)
+        self.indices = _np.ascontiguousarray(indices).ravel()
         self.textureFileName = texture_file_name
+        self.vertexFormat = vertex_format
+
+    def get_vertex_count(self):
+        """
+        Return the number of vertices, requires the vertex format.
+
+        :return:
+        :rtype: int
+        """
+        return len(self.vertices) // self.vertexFormat.components
+
+
+class MeshBuilder(object):
+    """
+    Merges many shapes into a single shape. The vertices are concatenated and the
+    indices rebased, so the result is uploaded as one GPUShape and drawn with a
+    single draw call. All shapes must share the vertex format and texture.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._indices = []
+        self._shapes = 0
+        self._textureFileName = None
+        self._vertexCount = 0
+        self._vertexFormat = None
+        self._vertices = []
+
+    def add(self, shape):
+        """
+        Add a shape to the mesh.
+
+        :param shape: Shape
+        :return: Self
+        :rtype: MeshBuilder
+        """
+        assert isinstance(shape, Shape)
+        if shape.vertexFormat is None:
+            raise Exception('Shape vertex format is not defined')
+        if self._shapes == 0:
+            self._vertexFormat = shape.vertexFormat
+            self._textureFileName = shape.textureFileName
+        elif shape.vertexFormat != self._vertexFormat:
+            raise Exception('Shape vertex format does not match the mesh format')
+        elif shape.textureFileName != self._textureFileName:
+            raise Exception('Shape texture does not match the mesh texture')
+
+        self._vertices.append(shape.vertices)
+        self._indices.append(shape.indices.astype(_np.uint32) + self._vertexCount)
+        self._vertexCount += shape.get_vertex_count()
+        self._shapes += 1
+        return self
+
+    def get_vertex_count(self):
+        """
+        Return the number of vertices added to the mesh.
+
+        :return:
+        :rtype: int
+        """
+        return self._vertexCount
+
+    def build(self):
+        """
+        Build the merged shape.
+
+        :return: Shape
+        :rtype: Shape
+        """
+        if self._shapes == 0:
+            raise Exception('Mesh does not contain any shape')
+        return Shape(_np.concatenate(self._vertices), _np.concatenate(self._indices), self._textureFileName,
+                     self._vertexFormat)
+
+    def __len__(self):
+        return self._shapes
+
+
+def merge_shapes(shapes):
+    """
+    Merge a list of shapes into a single shape.
+
+    :param shapes: Shape list
+    :type shapes: list
+    :return: Merged shape
+    :rtype: Shape
+    """
+    builder = MeshBuilder()
+    for shape in shapes:
+        builder.add(shape)
+    return builder.build()
+
+
+class SurfaceGrid(object):
+    """
+    Regular grid over the xy plane, used to create surfaces z = f(x, y) as a
+    single indexed mesh. Vertices store position, color and normal. The
+    topology is computed once, new z grids only rewrite the vertices.
+    """
+
+    def __init__(self, nx, ny, xlim=(-1, 1), ylim=(-1, 1)):
+        """
+        Constructor.
+
+        :param nx: Number of vertices along x
+        :param ny: Number of vertices along y
+        :param xlim: x range
+        :param ylim: y range
+        :type nx: int
+        :type ny: int
+        """
+        assert nx > 1 and ny > 1, 'Grid must have at least 2 vertices on each axis'
+        self.nx = nx
+        self.ny = ny
+        self.xlim = xlim
+        self.ylim = ylim
+
+        # Vertex (i, j) stores x[j], y[i]
+        self.x, self.y = _np.meshgrid(_np.linspace(xlim[0], xlim[1], nx, dtype=_np.float32),
+                                      _np.linspace(ylim[0], ylim[1], ny, dtype=_np.float32))
+
+        # Each quad a, b, c, d is created from two triangles
+        #
+        #    d ---- c
+        #    |      |
+        #    a ---- b
+        if nx * ny <= 65536:
+            index_type = _np.uint16
+        else:
+            index_type = _np.uint32
+        a = (_np.arange(ny - 1, dtype=_np.uint32)[:, None] * nx + _np.arange(nx - 1, dtype=_np.uint32)).ravel()
+        b = a + 1
+        c = a + nx + 1
+        d = a + nx
+        self.indices = _np.stack((a, b, c, c, d, a), axis=1).astype(index_type).ravel()
+
+    def evaluate(self, fn):
+        """
+        Evaluate a function on the grid, fn receives the x and y arrays.
+
+        :param fn: Function z = fn(x, y)
+        :return: z grid, shape (ny, nx)
+        :rtype: numpy.ndarray
+        """
+        return _np.broadcast_to(_np.asarray(fn(self.x, self.y), dtype=_np.float32), self.x.shape)
+
+    def _fill(self, vertices, z, colormap, color, normalize):
+        """
+        Write the vertices of the surface.
+
+        :param vertices: Vertex array, shape (nx * ny, 9)
+        :param z: z grid
+        :param colormap: Colormap
+        :param color: Color used if colormap is None
+        :param normalize: Center the surface and scale it to a maximum height of 1
+        :return:
+        """
+        z = _np.asarray(z, dtype=_np.float32)
+        if z.shape != self.x.shape:
+            raise Exception('z grid must have shape {0}'.format(self.x.shape))
+        zmin, zmax = float(z.min()), float(z.max())
+        if normalize:
+            dzf = min(1.0, 1 / (zmax - zmin + 0.001))
+            z = (z - (zmax + zmin) / 2) * dzf
+            zmin, zmax = float(z.min()), float(z.max())
+
+        # Normals (-dz/dx, -dz/dy, 1) from finite differences
+        dzdy, dzdx = _np.gradient(z, self.y[:, 0], self.x[0, :])
+        norm = _np.sqrt(dzdx * dzdx + dzdy * dzdy + 1)
+
+        vertices[:, 0] = self.x.ravel()
+        vertices[:, 1] = self.y.ravel()
+        vertices[:, 2] = z.ravel()
+        if colormap is not None:
+            vertices[:, 3:6] = _np.asarray(colormap(((z - zmin) / (zmax - zmin + 0.001)).ravel()))[:, 0:3]
+        else:
+            vertices[:, 3:6] = color
+        vertices[:, 6] = (-dzdx / norm).ravel()
+        vertices[:, 7] = (-dzdy / norm).ravel()
+        vertices[:, 8] = (1 / norm).ravel()
+
+    def build(self, z, colormap=None, color=(1, 1, 1), normalize=False):
+        """
+        Create the surface shape from a z grid.
+
+        :param z: z grid, shape (ny, nx)
+        :param colormap: Function that receives the normalized heights (0 to 1) and returns the colors
+        :param color: Color used if colormap is None
+        :param normalize: Center the surface and scale it to a maximum height of 1
+        :return: Shape
+        :rtype: Shape
+        """
+        vertices = _np.empty((self.nx * self.ny, FORMAT_COLOR_NORMAL.components), dtype=_np.float32)
+        self._fill(vertices, z, colormap, color, normalize)
+        return Shape(vertices, self.indices, vertex_format=FORMAT_COLOR_NORMAL)
+
+    def update(self, shape, z, colormap=None, color=(1, 1, 1), normalize=False):
+        """
+        Recompute the heights, colors and normals of a surface created by this
+        grid, in place. Upload the result with GPUShape.update_vertices.
+
+        :param shape: Surface shape
+        :param z: New z grid, shape (ny, nx)
+        :param colormap: Function that receives the normalized heights (0 to 1) and returns the colors
+        :param color: Color used if colormap is None
+        :param normalize: Center the surface and scale it to a maximum height of 1
+        :return: Shape vertices
+        :rtype: numpy.ndarray
+        """
+        assert isinstance(shape, Shape)
+        assert len(shape.vertices) == self.nx * self.ny * FORMAT_COLOR_NORMAL.components, \
+            'Shape was not created by this grid'
+        self._fill(shape.vertices.reshape(-1, FORMAT_COLOR_NORMAL.components), z, colormap, color, normalize)
+        return shape.vertices
+
+
+def create_surface(fn_or_zgrid, nx=None, ny=None, colormap=None, color=(1, 1, 1), xlim=(-1, 1), ylim=(-1, 1),
+                   normalize=False):
+    """
+    Create a surface z = f(x, y) as a single indexed mesh. The function is
+    evaluated over the whole grid at once, so it must work on NumPy arrays.
+    For surfaces updated on every frame use SurfaceGrid.build/update.
+
+    :param fn_or_zgrid: Function z = fn(x, y) or z grid of shape (ny, nx)
+    :param nx: Number of vertices along x, not required if a z grid is given
+    :param ny: Number of vertices along y, not required if a z grid is given
+    :param colormap: Function that receives the normalized heights (0 to 1) and returns the colors
+    :param color: Color used if colormap is None
+    :param xlim: x range
+    :param ylim: y range
+    :param normalize: Center the surface and scale it to a maximum height of 1
+    :return: Shape
+    :rtype: Shape
+    """
+    if callable(fn_or_zgrid):
+        grid = SurfaceGrid(nx, ny, xlim, ylim)
+        z = grid.evaluate(fn_or_zgrid)
+    else:
+        z = _np.asarray(fn_or_zgrid, dtype=_np.float32)
+        grid = SurfaceGrid(z.shape[1], z.shape[0], xlim, ylim)
+    return grid.build(z, colormap, color, normalize)
 
 
 def create_axis(length=1.0, use_neg=True):
@@ -70,7 +391,7 @@ def create_axis(length=1.0, use_neg=True):
         2, 3,
         4, 5]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_rainbow_triangle():
@@ -88,7 +409,7 @@ def create_rainbow_triangle():
     # We have a triangle every 3 indices specified
     indices = [0, 1, 2]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_rainbow_quad():
@@ -109,7 +430,7 @@ def create_rainbow_quad():
         0, 1, 2,
         2, 3, 0]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_color_quad(r, g, b):
@@ -133,7 +454,7 @@ def create_color_quad(r, g, b):
         0, 1, 2,
         2, 3, 0]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_texture_quad(image_filename, nx=1, ny=1):
@@ -159,7 +480,7 @@ def create_texture_quad(image_filename, nx=1, ny=1):
 
     texture_file_name = image_filename
 
-    return Shape(vertices, indices, texture_file_name)
+    return Shape(vertices, indices, texture_file_name, FORMAT_TEXTURE)
 
 
 def create_rainbow_cube():
@@ -189,7 +510,7 @@ def create_rainbow_cube():
         5, 6, 2, 2, 1, 5,
         7, 4, 0, 0, 3, 7]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_color_cube(r, g, b):
@@ -222,7 +543,7 @@ def create_color_cube(r, g, b):
         5, 6, 2, 2, 1, 5,
         7, 4, 0, 0, 3, 7]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_texture_cube(image_filename):
@@ -280,7 +601,7 @@ def create_texture_cube(image_filename):
         19, 18, 17, 17, 16, 19,  # Y+
         20, 21, 22, 22, 23, 20]  # Y-
 
-    return Shape(vertices, indices, image_filename)
+    return Shape(vertices, indices, image_filename, FORMAT_TEXTURE)
 
 
 def create_rainbow_normals_cube():
@@ -310,7 +631,7 @@ def create_rainbow_normals_cube():
                5, 6, 2, 2, 1, 5,
                7, 4, 0, 0, 3, 7]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR_NORMAL)
 
 
 def create_color_normals_cube(r, g, b):
@@ -370,7 +691,7 @@ def create_color_normals_cube(r, g, b):
         19, 18, 17, 17, 16, 19,  # Y+
         20, 21, 22, 22, 23, 20]  # Y-
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR_NORMAL)
 
 
 def create_texture_normals_cube(image_filename):
@@ -424,7 +745,7 @@ def create_texture_normals_cube(image_filename):
         19, 18, 17, 17, 16, 19,  # Y+
         20, 21, 22, 22, 23, 20]  # Y-
 
-    return Shape(vertices, indices, image_filename)
+    return Shape(vertices, indices, image_filename, FORMAT_TEXTURE_NORMAL)
 
 
 def __vertex_unpack3(vertex):
@@ -478,7 +799,7 @@ def create4_vertex_texture(image_filename, p1, p2, p3, p4, nx=1, ny=1):
         0, 1, 2,
         2, 3, 0]
 
-    return Shape(vertices, indices, image_filename)
+    return Shape(vertices, indices, image_filename, FORMAT_TEXTURE)
 
 
 def create4_vertex_texture_normal(image_filename, p1, p2, p3, p4, nx=1, ny=1):
@@ -523,7 +844,7 @@ def create4_vertex_texture_normal(image_filename, p1, p2, p3, p4, nx=1, ny=1):
         0, 1, 2,
         2, 3, 0]
 
-    return Shape(vertices, indices, image_filename)
+    return Shape(vertices, indices, image_filename, FORMAT_TEXTURE_NORMAL)
 
 
 def create4_vertex_color(p1, p2, p3, p4, r, g, b):
@@ -567,7 +888,7 @@ def create4_vertex_color(p1, p2, p3, p4, r, g, b):
         2, 3, 0
     ]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create4_vertex_color_normal(p1, p2, p3, p4, r, g, b):
@@ -614,7 +935,7 @@ def create4_vertex_color_normal(p1, p2, p3, p4, r, g, b):
         2, 3, 0
     ]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR_NORMAL)
 
 
 def create_triangle_texture(image_filename, p1, p2, p3, nx=1, ny=1):
@@ -648,7 +969,7 @@ def create_triangle_texture(image_filename, p1, p2, p3, nx=1, ny=1):
         0, 1, 2
     ]
 
-    return Shape(vertices, indices, image_filename)
+    return Shape(vertices, indices, image_filename, FORMAT_TEXTURE)
 
 
 def create_triangle_texture_normal(image_filename, p1, p2, p3, nx=1, ny=1):
@@ -685,7 +1006,7 @@ def create_triangle_texture_normal(image_filename, p1, p2, p3, nx=1, ny=1):
         0, 1, 2
     ]
 
-    return Shape(vertices, indices, image_filename)
+    return Shape(vertices, indices, image_filename, FORMAT_TEXTURE_NORMAL)
 
 
 def create_triangle_color(p1, p2, p3, r, g, b):
@@ -724,7 +1045,7 @@ def create_triangle_color(p1, p2, p3, r, g, b):
         0, 1, 2
     ]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR)
 
 
 def create_triangle_color_normal(p1, p2, p3, r, g, b):
@@ -766,4 +1087,4 @@ def create_triangle_color_normal(p1, p2, p3, r, g, b):
         0, 1, 2
     ]
 
-    return Shape(vertices, indices)
+    return Shape(vertices, indices, vertex_format=FORMAT_COLOR_NORMAL)
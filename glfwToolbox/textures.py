@@ -0,0 +1,377 @@
+# coding=utf-8
+"""
+TEXTURES
+Texture decoding, uploading and caching.
+
+GLFW-TOOLBOX
+Toolbox for GLFW Graphic Library.
+
+MIT License
+Copyright (c) 2019-2020 Pablo Pizarro R.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Library imports
+from collections import OrderedDict as _OrderedDict
+import os as _os
+
+from OpenGL.GL import GL_LINEAR as _GL_LINEAR
+from OpenGL.GL import GL_LINEAR_MIPMAP_LINEAR as _GL_LINEAR_MIPMAP_LINEAR
+from OpenGL.GL import GL_LINEAR_MIPMAP_NEAREST as _GL_LINEAR_MIPMAP_NEAREST
+from OpenGL.GL import GL_NEAREST as _GL_NEAREST
+from OpenGL.GL import GL_NEAREST_MIPMAP_LINEAR as _GL_NEAREST_MIPMAP_LINEAR
+from OpenGL.GL import GL_NEAREST_MIPMAP_NEAREST as _GL_NEAREST_MIPMAP_NEAREST
+from OpenGL.GL import GL_RGB as _GL_RGB
+from OpenGL.GL import GL_RGBA as _GL_RGBA
+from OpenGL.GL import GL_TEXTURE_2D as _GL_TEXTURE_2D
+from OpenGL.GL import GL_TEXTURE_MAG_FILTER as _GL_TEXTURE_MAG_FILTER
+from OpenGL.GL import GL_TEXTURE_MAX_LEVEL as _GL_TEXTURE_MAX_LEVEL
+from OpenGL.GL import GL_TEXTURE_MIN_FILTER as _GL_TEXTURE_MIN_FILTER
+from OpenGL.GL import GL_TEXTURE_WRAP_S as _GL_TEXTURE_WRAP_S
+from OpenGL.GL import GL_TEXTURE_WRAP_T as _GL_TEXTURE_WRAP_T
+from OpenGL.GL import GL_UNPACK_ALIGNMENT as _GL_UNPACK_ALIGNMENT
+from OpenGL.GL import GL_UNSIGNED_BYTE as _GL_UNSIGNED_BYTE
+from OpenGL.GL import glGenerateMipmap as _glGenerateMipmap
+from OpenGL.GL import glGenTextures as _glGenTextures
+from OpenGL.GL import glGetFloatv as _glGetFloatv
+from OpenGL.GL import glPixelStorei as _glPixelStorei
+from OpenGL.GL import glTexImage2D as _glTexImage2D
+from OpenGL.GL import glTexParameterf as _glTexParameterf
+from OpenGL.GL import glTexParameteri as _glTexParameteri
+from OpenGL.GL.EXT.texture_filter_anisotropic import GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT as \
+    _GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT
+from OpenGL.GL.EXT.texture_filter_anisotropic import GL_TEXTURE_MAX_ANISOTROPY_EXT as _GL_TEXTURE_MAX_ANISOTROPY_EXT
+from OpenGL.GL.EXT.texture_filter_anisotropic import glInitTextureFilterAnisotropicEXT as \
+    _glInitTextureFilterAnisotropicEXT
+from PIL import Image as _Image
+import numpy as _np
+
+from glfwToolbox.gl_state import get_gl_state as _get_gl_state
+import glfwToolbox.resources as _resources
+
+# Constants
+_TEXTURES_BUDGET = 256 * 1024 * 1024  # Default bytes of unused textures kept in VRAM
+_TEXTURES_MIPMAP_FILTERS = {  # Minification filters using mipmaps, and their magnification filter
+    _GL_LINEAR_MIPMAP_LINEAR: _GL_LINEAR,
+    _GL_LINEAR_MIPMAP_NEAREST: _GL_LINEAR,
+    _GL_NEAREST_MIPMAP_LINEAR: _GL_NEAREST,
+    _GL_NEAREST_MIPMAP_NEAREST: _GL_NEAREST
+}
+
+# Mipmap options, anisotropy level and CPU mipmap generation
+_TEXTURES_CONFIG = {'anisotropy': 1.0, 'cpuMipmaps': False}
+
+
+def set_anisotropy(level):
+    """
+    Set the anisotropic filtering level of the mipmapped textures uploaded later.
+    The level is clamped to the driver maximum, and ignored if the extension is
+    not available.
+
+    :param level: Anisotropy level, 1 disables anisotropic filtering
+    :type level: float
+    :return:
+    """
+    if level < 1:
+        raise Exception('Anisotropy level must be greater or equal than 1')
+    _TEXTURES_CONFIG['anisotropy'] = float(level)
+
+
+def set_cpu_mipmaps(enabled):
+    """
+    Generate the mipmaps on the CPU instead of glGenerateMipmap. The CPU path
+    is always used if the driver lacks glGenerateMipmap.
+
+    :param enabled: Enable CPU mipmaps
+    :type enabled: bool
+    :return:
+    """
+    _TEXTURES_CONFIG['cpuMipmaps'] = enabled
+
+
+def generate_mipmaps(img_data):
+    """
+    Generate the mipmap chain of an image with a box filter, down to 1x1.
+
+    :param img_data: Image data (height, width, channels)
+    :return: List of levels, not including the image
+    :rtype: list
+    """
+    levels = []
+    image = _Image.fromarray(img_data)
+    width, height = image.size
+    while width > 1 or height > 1:
+        width = max(1, width // 2)
+        height = max(1, height // 2)
+        image = image.resize((width, height), _Image.BOX)
+        levels.append(_np.asarray(image, dtype=_np.uint8))
+    return levels
+
+
+def decode_image(img_name):
+    """
+    Decode an image file into a contiguous array ready to be uploaded to OpenGL.
+    The rows are flipped as OpenGL expects the first row at the bottom of the
+    texture. Grayscale, paletted and other modes are converted to RGB/RGBA.
+
+    :param img_name: Image file name
+    :return: Image data (height, width, channels), width, height, OpenGL format
+    :rtype: tuple
+    """
+    image = _Image.open(img_name)
+    if image.mode not in ('RGB', 'RGBA'):
+        if image.mode in ('LA', 'PA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+        else:
+            image = image.convert('RGB')
+    image = image.transpose(_Image.FLIP_TOP_BOTTOM)
+    img_data = _np.asarray(image, dtype=_np.uint8)
+    if image.mode == 'RGBA':
+        formatf = _GL_RGBA
+    else:
+        formatf = _GL_RGB
+    return img_data, image.size[0], image.size[1], formatf
+
+
+def texture_simple_setup(texture, img_name, wrap_mode, filter_mode, image=None):
+    """
+    Decode an image and upload it to a texture.
+
+    :param texture: Texture name
+    :param img_name: Image file name
+    :param wrap_mode: GL_REPEAT, GL_CLAMP_TO_EDGE
+    :param filter_mode: GL_LINEAR, GL_NEAREST, or a mipmap filter as GL_LINEAR_MIPMAP_LINEAR
+    :param image: Image already decoded by decode_image, if None the file is decoded
+    :return: Texture size in bytes
+    :rtype: int
+    """
+    _get_gl_state().bind_texture(_GL_TEXTURE_2D, texture)
+
+    # texture wrapping params
+    _glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_WRAP_S, wrap_mode)
+    _glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_WRAP_T, wrap_mode)
+
+    # texture filtering params, mipmap filters are only valid for minification
+    mipmaps = filter_mode in _TEXTURES_MIPMAP_FILTERS
+    _glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_MIN_FILTER, filter_mode)
+    _glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_MAG_FILTER, _TEXTURES_MIPMAP_FILTERS.get(filter_mode, filter_mode))
+
+    if image is None:
+        image = decode_image(img_name)
+    img_data, img_width, img_height, formatf = image
+
+    # RGB rows are not 4-byte aligned unless the width is a multiple of 4
+    _glPixelStorei(_GL_UNPACK_ALIGNMENT, 1)
+    _glTexImage2D(_GL_TEXTURE_2D, 0, formatf, img_width, img_height, 0, formatf, _GL_UNSIGNED_BYTE, img_data)
+    nbytes = img_data.nbytes
+
+    if mipmaps:
+        if _TEXTURES_CONFIG['cpuMipmaps'] or not bool(_glGenerateMipmap):
+            levels = generate_mipmaps(img_data)
+            for i in range(len(levels)):
+                level = levels[i]
+                _glTexImage2D(_GL_TEXTURE_2D, i + 1, formatf, level.shape[1], level.shape[0], 0, formatf,
+                              _GL_UNSIGNED_BYTE, level)
+            _glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_MAX_LEVEL, len(levels))
+        else:
+            _glGenerateMipmap(_GL_TEXTURE_2D)
+
+        # The mipmap chain takes a third of the base level
+        nbytes += nbytes // 3
+
+        anisotropy = _TEXTURES_CONFIG['anisotropy']
+        if anisotropy > 1 and _glInitTextureFilterAnisotropicEXT():
+            anisotropy = min(anisotropy, float(_glGetFloatv(_GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT)))
+            _glTexParameterf(_GL_TEXTURE_2D, _GL_TEXTURE_MAX_ANISOTROPY_EXT, anisotropy)
+
+    _resources.get_registry().register_texture(texture, nbytes)
+    return nbytes
+
+
+class TextureManager(object):
+    """
+    Texture cache. Textures are shared by all shapes using the same image file,
+    wrap and filter modes, and are reference counted. Textures that are no
+    longer used are kept until the bytes of unused textures exceed the budget,
+    then the least recently used are deleted.
+    """
+
+    def __init__(self, budget=_TEXTURES_BUDGET):
+        """
+        Constructor.
+
+        :param budget: Bytes of unused textures kept in VRAM
+        :type budget: int
+        """
+        self._budget = budget
+        self._entries = _OrderedDict()  # key: [name, references, bytes]
+        self._keys = {}  # name: key
+        self._unusedBytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+
+    @staticmethod
+    def get_key(img_name, wrap_mode, filter_mode):
+        """
+        Return the cache key of a texture. Mipmapped textures also depend on the
+        anisotropy level.
+
+        :param img_name: Image file name
+        :param wrap_mode: Texture wrap mode
+        :param filter_mode: Texture filter mode
+        :return: Key
+        :rtype: tuple
+        """
+        path = _os.path.abspath(img_name)
+        anisotropy = 1.0
+        if filter_mode in _TEXTURES_MIPMAP_FILTERS:
+            anisotropy = _TEXTURES_CONFIG['anisotropy']
+        return path, _os.path.getmtime(path), wrap_mode, filter_mode, anisotropy
+
+    def has(self, img_name, wrap_mode, filter_mode):
+        """
+        Return true if the texture is cached.
+
+        :param img_name: Image file name
+        :param wrap_mode: Texture wrap mode
+        :param filter_mode: Texture filter mode
+        :return: True if cached
+        :rtype: bool
+        """
+        return self.get_key(img_name, wrap_mode, filter_mode) in self._entries
+
+    def acquire(self, img_name, wrap_mode, filter_mode, image=None):
+        """
+        Return a texture for the image, it is uploaded only if not cached. Each
+        call must be paired with a release.
+
+        :param img_name: Image file name
+        :param wrap_mode: Texture wrap mode
+        :param filter_mode: Texture filter mode
+        :param image: Image already decoded by decode_image, if None the file is decoded
+        :return: Texture name
+        :rtype: int
+        """
+        key = self.get_key(img_name, wrap_mode, filter_mode)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._hits += 1
+            if entry[1] == 0:
+                self._unusedBytes -= entry[2]
+            entry[1] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        self._misses += 1
+        texture = _glGenTextures(1)
+        nbytes = texture_simple_setup(texture, img_name, wrap_mode, filter_mode, image)
+        self._entries[key] = [texture, 1, nbytes]
+        self._keys[texture] = key
+        return texture
+
+    def release(self, texture):
+        """
+        Release a texture. Textures not created by the manager are deleted.
+
+        :param texture: Texture name
+        :return:
+        """
+        key = self._keys.get(texture)
+        if key is None:
+            _resources.get_registry().delete_texture(texture)
+            return
+        entry = self._entries[key]
+        if entry[1] == 0:
+            raise Exception('Texture {0} has already been released'.format(texture))
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._unusedBytes += entry[2]
+            self._entries.move_to_end(key)
+            self._evict(self._budget)
+
+    def _evict(self, budget):
+        """
+        Delete the least recently used unused textures until their bytes fit within the budget.
+
+        :param budget: Bytes
+        :return:
+        """
+        if self._unusedBytes <= budget:
+            return
+        registry = _resources.get_registry()
+        for key in list(self._entries.keys()):
+            if self._unusedBytes <= budget:
+                break
+            texture, references, nbytes = self._entries[key]
+            if references > 0:
+                continue
+            del self._entries[key]
+            del self._keys[texture]
+            registry.delete_texture(texture)
+            self._unusedBytes -= nbytes
+            self._evicted += 1
+
+    def set_budget(self, budget):
+        """
+        Set the bytes of unused textures kept in VRAM.
+
+        :param budget: Bytes
+        :type budget: int
+        :return:
+        """
+        self._budget = budget
+        self._evict(budget)
+
+    def clear(self):
+        """
+        Delete all unused textures.
+
+        :return:
+        """
+        self._evict(0)
+
+    def get_stats(self):
+        """
+        Return the cache statistics.
+
+        :return: Statistics
+        :rtype: dict
+        """
+        return {
+            'textures': len(self._entries),
+            'textureBytes': sum(entry[2] for entry in self._entries.values()),
+            'unusedBytes': self._unusedBytes,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evicted': self._evicted
+        }
+
+
+_TEXTURES_MANAGER = TextureManager()
+
+
+def get_texture_manager():
+    """
+    Return the texture manager.
+
+    :return: Texture manager
+    :rtype: TextureManager
+    """
+    return _TEXTURES_MANAGER
@@ -29,151 +29,208 @@ SOFTWARE.
 """
 import numpy as np
 
+_IDENTITY = np.identity(4, dtype=np.float32)
+_SCRATCH = {}
 
-def identity():
+
+def _is_batch(*params):
+    """
+    Check if any of the parameters is an array, in which case a stack of
+    matrices is built.
+
+    :param params: Parameters
+    :return:
+    :rtype: bool
+    """
+    for p in params:
+        # Checked by type, np.ndim is slow compared to building a matrix
+        if isinstance(p, (list, tuple)) or (isinstance(p, np.ndarray) and p.ndim > 0):
+            return True
+    return False
+
+
+def _prepare(out, *params):
+    """
+    Reset the output matrix to the identity, allocating it if not given. If any
+    parameter is an array the parameters are broadcast to flat float32 arrays
+    of the same length, and the output is a stack of shape (N, 4, 4).
+
+    :param out: Output matrix or stack, None to allocate it
+    :param params: Scalars or arrays of shape (N,)
+    :return: Output and the parameters
+    :rtype: tuple
+    """
+    if _is_batch(*params):
+        params = np.broadcast_arrays(*[np.asarray(p, dtype=np.float32) for p in params])
+        params = [p.reshape(-1) for p in params]
+        if out is None:
+            out = np.empty((len(params[0]), 4, 4), dtype=np.float32)
+    elif out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+    out[...] = _IDENTITY
+    return out, params
+
+
+def _get_scratch(shape, dtype):
+    """
+    Return a scratch buffer, buffers are allocated once per shape.
+
+    :param shape: Shape
+    :param dtype: Data type
+    :return:
+    """
+    key = (shape, dtype)
+    if key not in _SCRATCH:
+        _SCRATCH[key] = np.empty(shape, dtype=dtype)
+    return _SCRATCH[key]
+
+
+def identity(n=None, out=None):
     """
     Identity matrix.
 
+    :param n: If given, a stack of n identity matrices of shape (n, 4, 4) is returned
+    :param out: Output matrix, written in place
     :return:
     """
-    return np.identity(4, dtype=np.float32)
+    if out is None:
+        if n is None:
+            return np.identity(4, dtype=np.float32)
+        out = np.empty((n, 4, 4), dtype=np.float32)
+    out[...] = _IDENTITY
+    return out
 
 
-def uniform_scale(s):
+def uniform_scale(s, out=None):
     """
     Uniform scale transformation.
 
     :param s:
+    :param out: Output matrix, written in place
     :return:
     """
-    return np.array([
-        [s, 0, 0, 0],
-        [0, s, 0, 0],
-        [0, 0, s, 0],
-        [0, 0, 0, 1]], dtype=np.float32)
+    return scale(s, s, s, out)
 
 
-def scale(sx, sy, sz):
+def scale(sx, sy, sz, out=None):
     """
     Scale matrix.
 
     :param sx:
     :param sy:
     :param sz:
+    :param out: Output matrix, written in place
     :return:
     """
-    return np.array([
-        [sx, 0, 0, 0],
-        [0, sy, 0, 0],
-        [0, 0, sz, 0],
-        [0, 0, 0, 1]], dtype=np.float32)
+    out, (sx, sy, sz) = _prepare(out, sx, sy, sz)
+    out[..., 0, 0] = sx
+    out[..., 1, 1] = sy
+    out[..., 2, 2] = sz
+    return out
 
 
-def rotation_x(theta):
+def rotation_x(theta, out=None):
     """
     Rotation around x.
 
     :param theta:
+    :param out: Output matrix, written in place
     :return:
     """
+    out, (theta,) = _prepare(out, theta)
     sin_theta = np.sin(theta)
     cos_theta = np.cos(theta)
-
-    return np.array([
-        [1, 0, 0, 0],
-        [0, cos_theta, -sin_theta, 0],
-        [0, sin_theta, cos_theta, 0],
-        [0, 0, 0, 1]], dtype=np.float32)
+    out[..., 1, 1] = cos_theta
+    out[..., 1, 2] = -sin_theta
+    out[..., 2, 1] = sin_theta
+    out[..., 2, 2] = cos_theta
+    return out
 
 
-def rotation_y(theta):
+def rotation_y(theta, out=None):
     """
     Rotation around y.
 
     :param theta:
+    :param out: Output matrix, written in place
     :return:
     """
+    out, (theta,) = _prepare(out, theta)
     sin_theta = np.sin(theta)
     cos_theta = np.cos(theta)
-
-    return np.array([
-        [cos_theta, 0, sin_theta, 0],
-        [0, 1, 0, 0],
-        [-sin_theta, 0, cos_theta, 0],
-        [0, 0, 0, 1]], dtype=np.float32)
+    out[..., 0, 0] = cos_theta
+    out[..., 0, 2] = sin_theta
+    out[..., 2, 0] = -sin_theta
+    out[..., 2, 2] = cos_theta
+    return out
 
 
-def rotation_z(theta):
+def rotation_z(theta, out=None):
     """
     Rotation around z.
 
     :param theta:
+    :param out: Output matrix, written in place
     :return:
     """
+    out, (theta,) = _prepare(out, theta)
     sin_theta = np.sin(theta)
     cos_theta = np.cos(theta)
-
-    return np.array([
-        [cos_theta, -sin_theta, 0, 0],
-        [sin_theta, cos_theta, 0, 0],
-        [0, 0, 1, 0],
-        [0, 0, 0, 1]], dtype=np.float32)
+    out[..., 0, 0] = cos_theta
+    out[..., 0, 1] = -sin_theta
+    out[..., 1, 0] = sin_theta
+    out[..., 1, 1] = cos_theta
+    return out
 
 
-def rotation_a(theta, axis):
+def rotation_a(theta, axis, out=None):
     """
     Rotation around axis.
 
     :param theta:
-    :param axis:
+    :param axis: Unit axis of shape (3,), or (N, 3) to build a stack
+    :param out: Output matrix, written in place
     :return:
     """
+    axis = np.asarray(axis)
+    out, (theta, x, y, z) = _prepare(out, theta, axis[..., 0], axis[..., 1], axis[..., 2])
     s = np.sin(theta)
     c = np.cos(theta)
-
-    assert axis.shape == (3,)
-
-    x = axis[0]
-    y = axis[1]
-    z = axis[2]
-
-    return np.array([
-        # First row
-        [c + (1 - c) * x * x,
-         (1 - c) * x * y - s * z,
-         (1 - c) * x * z + s * y,
-         0],
-        # Second row
-        [(1 - c) * x * y + s * z,
-         c + (1 - c) * y * y,
-         (1 - c) * y * z - s * x,
-         0],
-        # Third row
-        [(1 - c) * x * z - s * y,
-         (1 - c) * y * z + s * x,
-         c + (1 - c) * z * z,
-         0],
-        # Fourth row
-        [0, 0, 0, 1]], dtype=np.float32)
+    t = 1 - c
+
+    # First row
+    out[..., 0, 0] = c + t * x * x
+    out[..., 0, 1] = t * x * y - s * z
+    out[..., 0, 2] = t * x * z + s * y
+    # Second row
+    out[..., 1, 0] = t * x * y + s * z
+    out[..., 1, 1] = c + t * y * y
+    out[..., 1, 2] = t * y * z - s * x
+    # Third row
+    out[..., 2, 0] = t * x * z - s * y
+    out[..., 2, 1] = t * y * z + s * x
+    out[..., 2, 2] = c + t * z * z
+    return out
 
 
-def translate(tx, ty, tz):
+def translate(tx, ty, tz, out=None):
     """
     Translate matrix.
 
     :param tx:
     :param ty:
     :param tz:
+    :param out: Output matrix, written in place
     :return:
     """
-    return np.array([
-        [1, 0, 0, tx],
-        [0, 1, 0, ty],
-        [0, 0, 1, tz],
-        [0, 0, 0, 1]], dtype=np.float32)
+    out, (tx, ty, tz) = _prepare(out, tx, ty, tz)
+    out[..., 0, 3] = tx
+    out[..., 1, 3] = ty
+    out[..., 2, 3] = tz
+    return out
 
 
-def shearing(xy, yx, xz, zx, yz, zy):
+def shearing(xy, yx, xz, zx, yz, zy, out=None):
     """
     Shearing matrix.
 
@@ -183,29 +240,80 @@ def shearing(xy, yx, xz, zx, yz, zy):
     :param zx:
     :param yz:
     :param zy:
+    :param out: Output matrix, written in place
     :return:
     """
-    return np.array([
-        [1, xy, xz, 0],
-        [yx, 1, yz, 0],
-        [zx, zy, 1, 0],
-        [0, 0, 0, 1]], dtype=np.float32)
+    out, (xy, yx, xz, zx, yz, zy) = _prepare(out, xy, yx, xz, zx, yz, zy)
+    out[..., 0, 1] = xy
+    out[..., 0, 2] = xz
+    out[..., 1, 0] = yx
+    out[..., 1, 2] = yz
+    out[..., 2, 0] = zx
+    out[..., 2, 1] = zy
+    return out
+
+
+def compose_trs(translation=(0, 0, 0), rotation=None, scale=1, out=None):
+    """
+    Affine matrix translation * rotation * scale, written directly without the
+    intermediate products. The parameters may be stacks, then a stack of
+    matrices is returned.
+
+    :param translation: Translation of shape (3,) or (N, 3)
+    :param rotation: Rotation matrix of shape (3, 3), (4, 4) or stacks of them, None for no rotation
+    :param scale: Scalar, vector of shape (3,) or stack of shape (N, 3), use (N, 1) for uniform scales
+    :param out: Output matrix, written in place
+    :return:
+    """
+    if out is None:
+        shape = np.broadcast_shapes(np.shape(translation)[:-1],
+                                    () if rotation is None else np.shape(rotation)[:-2],
+                                    np.shape(scale)[:-1])
+        out = np.empty(shape + (4, 4), dtype=np.float32)
+    if rotation is None:
+        out[..., 0:3, 0:3] = _IDENTITY[0:3, 0:3]
+    else:
+        out[..., 0:3, 0:3] = rotation[..., 0:3, 0:3]
+
+    # Scaling first multiplies the columns of the rotation
+    if np.ndim(scale) == 0:
+        out[..., 0:3, 0:3] *= scale
+    else:
+        out[..., 0:3, 0:3] *= np.asarray(scale)[..., None, :]
+    out[..., 0:3, 3] = translation
+    out[..., 3, 0:3] = 0
+    out[..., 3, 3] = 1
+    return out
 
 
-def matmul(mats):
+def matmul(mats, out=None):
     """
-    Matrix multiplication.
+    Matrix multiplication. Stacks of shape (N, 4, 4) are composed element
+    wise, and broadcast against single matrices.
 
     :param mats:
+    :param out: Output matrix, written in place, must not be one of the multiplied matrices
     :return:
     """
-    out = mats[0]
-    for i in range(1, len(mats)):
-        out = np.matmul(out, mats[i])
+    if out is None:
+        out = mats[0]
+        for i in range(1, len(mats)):
+            out = np.matmul(out, mats[i])
+        return out
+    if len(mats) == 1:
+        out[...] = mats[0]
+        return out
+
+    # Products alternate between the output and a scratch buffer, ending in the output
+    scratch = _get_scratch(out.shape, out.dtype)
+    buffers = (out, scratch) if len(mats) % 2 == 0 else (scratch, out)
+    current = np.matmul(mats[0], mats[1], out=buffers[0])
+    for i in range(2, len(mats)):
+        current = np.matmul(current, mats[i], out=buffers[(i - 1) % 2])
     return out
 
 
-def frustum(left, right, bottom, top, near, far):
+def frustum(left, right, bottom, top, near, far, out=None):
     """
     Frustrum viewing matrix.
 
@@ -215,12 +323,15 @@ def frustum(left, right, bottom, top, near, far):
     :param top:
     :param near:
     :param far:
+    :param out: Output matrix, written in place
     :return:
     """
     r_l = right - left
     t_b = top - bottom
     f_n = far - near
-    return np.array([
+    if out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+    out[...] = [
         [2 * near / r_l,
          0,
          (right + left) / r_l,
@@ -236,10 +347,11 @@ def frustum(left, right, bottom, top, near, far):
         [0,
          0,
          -1,
-         0]], dtype=np.float32)
+         0]]
+    return out
 
 
-def perspective(fovy, aspect, near, far):
+def perspective(fovy, aspect, near, far, out=None):
     """
     Perspective viewing matrix.
 
@@ -247,14 +359,15 @@ def perspective(fovy, aspect, near, far):
     :param aspect:
     :param near:
     :param far:
+    :param out: Output matrix, written in place
     :return:
     """
     half_height = np.tan(np.pi * fovy / 360) * near
     half_width = half_height * aspect
-    return frustum(-half_width, half_width, -half_height, half_height, near, far)
+    return frustum(-half_width, half_width, -half_height, half_height, near, far, out)
 
 
-def ortho(left, right, bottom, top, near, far):
+def ortho(left, right, bottom, top, near, far, out=None):
     """
     Orthographic viewing matrix.
 
@@ -264,12 +377,15 @@ def ortho(left, right, bottom, top, near, far):
     :param top:
     :param near:
     :param far:
+    :param out: Output matrix, written in place
     :return:
     """
     r_l = right - left
     t_b = top - bottom
     f_n = far - near
-    return np.array([
+    if out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+    out[...] = [
         [2 / r_l,
          0,
          0,
@@ -285,16 +401,18 @@ def ortho(left, right, bottom, top, near, far):
         [0,
          0,
          0,
-         1]], dtype=np.float32)
+         1]]
+    return out
 
 
-def look_at(eye, at, up):
+def look_at(eye, at, up, out=None):
     """
     Look at operator.
 
     :param eye:
     :param at:
     :param up:
+    :param out: Output matrix, written in place
     :return:
     """
     forward = (at - eye)
@@ -306,9 +424,12 @@ def look_at(eye, at, up):
     new_up = np.cross(side, forward)
     new_up = new_up / np.linalg.norm(new_up)
 
-    return np.array([
+    if out is None:
+        out = np.empty((4, 4), dtype=np.float32)
+    out[...] = [
         [side[0], side[1], side[2], -np.dot(side, eye)],
         [new_up[0], new_up[1], new_up[2], -np.dot(new_up, eye)],
         [-forward[0], -forward[1], -forward[2], np.dot(forward, eye)],
         [0, 0, 0, 1]
-    ], dtype=np.float32)
+    ]
+    return out